@@ -102,16 +102,101 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=23, minute=0, day_of_week=0),  # Sunday 6pm Toronto (11pm UTC during EST)
         'options': {'timezone': 'America/Toronto'}
     },
+    'refresh-expiring-google-tokens': {
+        'task': 'playground.tasks.refresh_expiring_google_tokens',
+        'schedule': crontab(minute='*/10'),
+    },
+    'sync-stale-google-calendars': {
+        'task': 'playground.tasks.sync_stale_google_calendars',
+        'schedule': crontab(minute='*/5'),
+    },
+    'reconcile-mapulus-markers': {
+        'task': 'playground.tasks.reconcile_mapulus_markers_async',
+        'schedule': crontab(minute=20),
+    },
+    'refresh-tutor-match-features': {
+        'task': 'playground.tasks.refresh_tutor_match_features',
+        'schedule': crontab(minute='*/10'),
+    },
+    'archive-old-email-logs': {
+        'task': 'playground.tasks.archive_email_logs_async',
+        'schedule': crontab(hour=7, minute=30),  # 2:30am Toronto (7:30am UTC during EST)
+    },
 }
 
+# EmailLog retention: rows older than this many days are moved nightly into
+# gzipped NDJSON files under MEDIA_ROOT/EMAIL_LOG_ARCHIVE_DIR
+EMAIL_LOG_RETENTION_DAYS = int(os.getenv('EMAIL_LOG_RETENTION_DAYS', '90'))
+EMAIL_LOG_ARCHIVE_DIR = os.getenv('EMAIL_LOG_ARCHIVE_DIR', 'email_log_archive')
+
+# Accounting exports (hours, payouts, invoices) read rows from the database in
+# chunks of this size while streaming, so memory doesn't grow with the export
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Admin batch hours upload: most rows accepted per request, and rows per INSERT
+HOURS_IMPORT_MAX_ROWS = int(os.getenv('HOURS_IMPORT_MAX_ROWS', '5000'))
+HOURS_IMPORT_BATCH_SIZE = int(os.getenv('HOURS_IMPORT_BATCH_SIZE', '500'))
+
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URL = os.getenv('GOOGLE_REDIRECT_URL', "https://egstutoring-portal.ca/api/google/oauth2callback")
 FERNET_SECRET = os.getenv('FERNET_SECRET')
 
+# Google access tokens are refreshed by a beat task once they are within this
+# many minutes of expiry, and treated as expired this many seconds early
+GOOGLE_TOKEN_REFRESH_WINDOW_MINUTES = int(os.getenv('GOOGLE_TOKEN_REFRESH_WINDOW_MINUTES', '15'))
+GOOGLE_TOKEN_EXPIRY_SKEW_SECONDS = int(os.getenv('GOOGLE_TOKEN_EXPIRY_SKEW_SECONDS', '120'))
+
+# Local calendar copies older than this are re-synced (incrementally) in the background
+GOOGLE_CALENDAR_SYNC_MAX_AGE_MINUTES = int(os.getenv('GOOGLE_CALENDAR_SYNC_MAX_AGE_MINUTES', '15'))
+# Off PostgreSQL, a user's calendar sync holds a cache lock for at most this
+# long, so a crashed worker can't block their syncs for good
+GOOGLE_CALENDAR_SYNC_LOCK_SECONDS = int(os.getenv('GOOGLE_CALENDAR_SYNC_LOCK_SECONDS', '600'))
+
+# Google events.list responses proxied before the first sync are reused for
+# this long per user and parameter set, then revalidated with If-None-Match
+GOOGLE_EVENTS_CACHE_TTL_SECONDS = int(os.getenv('GOOGLE_EVENTS_CACHE_TTL_SECONDS', '60'))
+
+# Queued RSVP changes for the same event within this window go out as one patch
+GOOGLE_RSVP_COALESCE_SECONDS = int(os.getenv('GOOGLE_RSVP_COALESCE_SECONDS', '10'))
+
+# Mapulus geocodes are cached per normalized address in the GeocodeCache table
+# (re-geocoded after this many days) with an in-process LRU in front of it
+GEOCODE_CACHE_TTL_DAYS = int(os.getenv('GEOCODE_CACHE_TTL_DAYS', '180'))
+GEOCODE_LRU_SIZE = int(os.getenv('GEOCODE_LRU_SIZE', '2048'))
+
+# The hourly Mapulus reconcile saves marker IDs after every this many API calls
+MAPULUS_SYNC_BATCH_SIZE = int(os.getenv('MAPULUS_SYNC_BATCH_SIZE', '50'))
+
+# Each process rebuilds its in-memory tutor spatial index at least this often,
+# besides whenever a tutor's location changes
+TUTOR_INDEX_MAX_AGE_SECONDS = int(os.getenv('TUTOR_INDEX_MAX_AGE_SECONDS', '300'))
+
+# Realtime event stream (/api/events/stream/). The site itself stays on the
+# WSGI app; the stream is served by a separate ASGI service running the same
+# image and settings:
+#   gunicorn egstutorting.asgi:application -k uvicorn.workers.UvicornWorker
+# Route /api/events/stream/ to it (or point VITE_EVENTS_URL at it). Tickets
+# are issued by the main app and signed with SECRET_KEY, so both services need
+# the same one. Events are raised in the web app and Celery, so they only
+# reach that service through Redis; without a URL they stay in the process
+# that raised them, which only works under runserver.
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL', '')
+# Stream tickets are only accepted this long after being issued
+REALTIME_TICKET_MAX_AGE_SECONDS = int(os.getenv('REALTIME_TICKET_MAX_AGE_SECONDS', '60'))
+REALTIME_HEARTBEAT_SECONDS = int(os.getenv('REALTIME_HEARTBEAT_SECONDS', '25'))
+# Streams are closed after this long so clients re-authenticate periodically
+REALTIME_STREAM_MAX_SECONDS = int(os.getenv('REALTIME_STREAM_MAX_SECONDS', '3600'))
+REALTIME_RETRY_MS = int(os.getenv('REALTIME_RETRY_MS', '3000'))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
+# Warn if the realtime stream can't receive events in production
+if not DEBUG and not REALTIME_REDIS_URL:
+    import warnings
+    warnings.warn("REALTIME_REDIS_URL is not set - realtime events from web workers and Celery will never reach the event stream!")
+
 # Auto-detect Railway domain or use environment variable
 if os.getenv('RAILWAY_ENVIRONMENT_NAME'):
     SECURE_SSL_REDIRECT = True
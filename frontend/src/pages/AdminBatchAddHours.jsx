@@ -28,6 +28,8 @@ export default function AdminBatchAddHours() {
   const [submitting, setSubmitting] = useState(false);
   const [results, setResults] = useState(null);
   const [error, setError] = useState("");
+  const [dryRun, setDryRun] = useState(false);
+  const [csvFile, setCsvFile] = useState(null);
 
   // Early return if user is not loaded yet
   if (!user) {
@@ -133,13 +135,14 @@ export default function AdminBatchAddHours() {
 
     try {
       const response = await api.post('/api/admin/batch-add-hours/', {
-        hours: hours
+        hours: hours,
+        dry_run: dryRun
       });
 
       setResults(response.data);
 
       // If all successful, reset form
-      if (response.data.results.failed.length === 0) {
+      if (!dryRun && response.data.results.failed.length === 0) {
         setHours([{
           tutor_id: "",
           student_id: "",
@@ -161,6 +164,33 @@ export default function AdminBatchAddHours() {
     }
   };
 
+  const handleCsvUpload = async () => {
+    if (!csvFile) return;
+    setSubmitting(true);
+    setError("");
+    setResults(null);
+
+    const formData = new FormData();
+    formData.append('file', csvFile);
+    formData.append('dry_run', dryRun ? 'true' : 'false');
+
+    try {
+      const response = await api.post('/api/admin/batch-add-hours/', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+      });
+      setResults(response.data);
+    } catch (err) {
+      console.error("Error uploading hours CSV:", err);
+      if (err.response?.data?.results) {
+        setResults(err.response.data);
+      } else {
+        setError(err.response?.data?.error || err.response?.data?.detail || err.message || "Failed to upload CSV");
+      }
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
   const clearResults = () => {
     setResults(null);
     setError("");
@@ -183,6 +213,32 @@ export default function AdminBatchAddHours() {
         }}>
           <strong>Note:</strong> Hours added here will be marked as "Eligible" if within current week, or "Late" if outside current week. All hours are auto-accepted.
         </div>
+        <div style={{ marginTop: '1rem', display: 'flex', gap: '1rem', alignItems: 'center', flexWrap: 'wrap' }}>
+          <label>
+            <input
+              type="checkbox"
+              checked={dryRun}
+              onChange={(e) => setDryRun(e.target.checked)}
+            />{' '}
+            Dry run (check rows without saving)
+          </label>
+          <input
+            type="file"
+            accept=".csv,text/csv"
+            onChange={(e) => setCsvFile(e.target.files[0] || null)}
+          />
+          <button
+            type="button"
+            onClick={handleCsvUpload}
+            className="btn-submit"
+            disabled={submitting || !csvFile}
+          >
+            {submitting ? 'Submitting...' : 'Upload CSV'}
+          </button>
+        </div>
+        <p style={{ fontSize: '0.85rem', color: '#666' }}>
+          CSV columns: tutor_id, student_id, date (YYYY-MM-DD), start_time, end_time (HH:MM), total_time, location (Online or In-Person), subject, notes
+        </p>
       </div>
 
       {error && (
@@ -194,7 +250,7 @@ export default function AdminBatchAddHours() {
       {results && (
         <div className="admin-batch-hours-results">
           <div className="results-header">
-            <h2>Batch Processing Results</h2>
+            <h2>{results.results.dry_run ? 'Dry Run Results (nothing saved)' : 'Batch Processing Results'}</h2>
             <button onClick={clearResults} className="btn-close-results">✕ Close</button>
           </div>
 
@@ -203,7 +259,7 @@ export default function AdminBatchAddHours() {
               <strong>Total Submitted:</strong> {results.results.total_submitted}
             </div>
             <div className="summary-item summary-success">
-              <strong>Successful:</strong> {results.results.successful.length}
+              <strong>{results.results.dry_run ? 'Would Be Added' : 'Successful'}:</strong> {results.results.successful.length}
             </div>
             <div className="summary-item summary-failed">
               <strong>Failed:</strong> {results.results.failed.length}
@@ -228,7 +284,7 @@ export default function AdminBatchAddHours() {
                   <tbody>
                     {results.results.successful.map((item, idx) => (
                       <tr key={idx}>
-                        <td>{item.hour_id}</td>
+                        <td>{item.hour_id ?? '—'}</td>
                         <td>{item.tutor}</td>
                         <td>{item.student}</td>
                         <td>{item.date}</td>
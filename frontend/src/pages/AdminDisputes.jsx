@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useTranslation } from 'react-i18next';
 import { useUser } from '../components/UserProvider';
 import api from '../api';
+import { subscribeToEvents } from '../utils/realtimeEvents';
 
 const AdminDisputes = () => {
   const { t } = useTranslation();
@@ -23,6 +24,7 @@ const AdminDisputes = () => {
 
   useEffect(() => {
     fetchDisputes();
+    return subscribeToEvents(['dispute.created', 'dispute.updated'], fetchDisputes);
   }, [filter]);
 
   const fetchDisputes = async () => {
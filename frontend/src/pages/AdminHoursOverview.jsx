@@ -12,8 +12,9 @@ export default function AdminHoursOverview() {
   const navigate = useNavigate();
 
   const [hours, setHours] = useState([]);
-  const [filteredHours, setFilteredHours] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
 
   // Filter states
@@ -46,17 +47,23 @@ export default function AdminHoursOverview() {
     return null;
   }
 
-  const fetchHours = async () => {
-    setLoading(true);
+  // Pages come newest first; pass the previous page's cursor to append the next one
+  const fetchHours = async (cursor = null) => {
+    cursor ? setLoadingMore(true) : setLoading(true);
     setError("");
 
     try {
       const params = {};
       if (startDate) params.start = startDate;
       if (endDate) params.end = endDate;
+      if (statusFilter !== "all") params.eligible = statusFilter;
+      if (invoiceFilter !== "all") params.invoice_status = invoiceFilter;
+      if (cursor) params.cursor = cursor;
 
       const response = await api.get('/api/admin/all-hours/', { params });
-      setHours(response.data.hours || []);
+      const page = response.data.hours || [];
+      setHours((prev) => (cursor ? [...prev, ...page] : page));
+      setNextCursor(response.data.next_cursor || null);
       setStats(response.data.stats || {
         total: 0,
         eligible: 0,
@@ -69,29 +76,14 @@ export default function AdminHoursOverview() {
       setError("Failed to load hours data");
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  // Filters are applied by the server, so changing one refetches from the first page
   useEffect(() => {
     fetchHours();
-  }, []);
-
-  // Apply filters
-  useEffect(() => {
-    let filtered = [...hours];
-
-    // Status filter (Eligible/Late)
-    if (statusFilter !== "all") {
-      filtered = filtered.filter(h => h.eligible === statusFilter);
-    }
-
-    // Invoice status filter
-    if (invoiceFilter !== "all") {
-      filtered = filtered.filter(h => h.invoice_status === invoiceFilter);
-    }
-
-    setFilteredHours(filtered);
-  }, [hours, statusFilter, invoiceFilter]);
+  }, [statusFilter, invoiceFilter]);
 
   const handleSearch = () => {
     fetchHours();
@@ -187,7 +179,7 @@ export default function AdminHoursOverview() {
           </select>
         </div>
         <div className="filter-summary">
-          Showing {filteredHours.length} of {hours.length} hours
+          Showing {hours.length} hours{nextCursor ? ' (more available)' : ''}
         </div>
       </div>
 
@@ -198,7 +190,7 @@ export default function AdminHoursOverview() {
       )}
 
       {/* Hours Table */}
-      {!loading && filteredHours.length > 0 && (
+      {!loading && hours.length > 0 && (
         <div className="hours-table-section">
           <div className="table-wrapper">
             <table className="hours-table">
@@ -220,7 +212,7 @@ export default function AdminHoursOverview() {
                 </tr>
               </thead>
               <tbody>
-                {filteredHours.map((hour) => (
+                {hours.map((hour) => (
                   <tr key={hour.id}>
                     <td>{hour.id}</td>
                     <td>{hour.date}</td>
@@ -254,18 +246,17 @@ export default function AdminHoursOverview() {
               </tbody>
             </table>
           </div>
-        </div>
-      )}
-
-      {!loading && filteredHours.length === 0 && hours.length > 0 && (
-        <div className="no-results">
-          <p>No hours match the current filters.</p>
+          {nextCursor && (
+            <button onClick={() => fetchHours(nextCursor)} className="btn-search" disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       )}
 
       {!loading && hours.length === 0 && (
         <div className="no-results">
-          <p>No hours found for the selected date range.</p>
+          <p>No hours match the current filters.</p>
         </div>
       )}
 
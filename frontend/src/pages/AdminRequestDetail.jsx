@@ -23,9 +23,13 @@ const AdminRequestDetail = () => {
   const fetchRequestDetail = async () => {
     try {
       setLoading(true);
-      const response = await api.get(`/api/requests/list/`);
-      const allRequests = response.data || [];
-      const foundRequest = allRequests.find(req => req.id.toString() === requestId);
+      let foundRequest = null;
+      try {
+        const response = await api.get(`/api/requests/${requestId}/`);
+        foundRequest = response.data;
+      } catch (fetchError) {
+        if (fetchError.response?.status !== 404) throw fetchError;
+      }
 
       if (!foundRequest) {
         setError(t('admin.requestNotFound', 'Request not found'));
@@ -16,6 +16,8 @@ export default function AdminUserSearch() {
   const [selectedUser, setSelectedUser] = useState(null);
   const [userInfo, setUserInfo] = useState(null);
   const [userHours, setUserHours] = useState([]);
+  const [hoursCursor, setHoursCursor] = useState(null);
+  const [loadingMoreHours, setLoadingMoreHours] = useState(false);
   const [userStats, setUserStats] = useState(null);
   const [relationships, setRelationships] = useState(null);
   const [documents, setDocuments] = useState([]);
@@ -108,6 +110,7 @@ export default function AdminUserSearch() {
       setUserInfo(response.data.user_info);
       setUserStats(response.data.stats);
       setUserHours(response.data.hours);
+      setHoursCursor(response.data.hours_next_cursor || null);
       setRelationships(response.data.relationships || null);
       setDocuments(response.data.documents || []);
       setCurrentRequests(response.data.current_requests || []);
@@ -143,6 +146,7 @@ export default function AdminUserSearch() {
     setSelectedUser(null);
     setUserInfo(null);
     setUserHours([]);
+    setHoursCursor(null);
     setUserStats(null);
     setRelationships(null);
     setDocuments([]);
@@ -151,6 +155,23 @@ export default function AdminUserSearch() {
     setError("");
   };
 
+  const loadMoreHours = async () => {
+    if (!selectedUser || !hoursCursor) return;
+
+    setLoadingMoreHours(true);
+    try {
+      const response = await api.get(`/api/admin/users/${selectedUser.id}/hours/`, {
+        params: { cursor: hoursCursor }
+      });
+      setUserHours(prev => [...prev, ...response.data.hours]);
+      setHoursCursor(response.data.hours_next_cursor || null);
+    } catch (err) {
+      console.error("Error loading more hours:", err);
+    } finally {
+      setLoadingMoreHours(false);
+    }
+  };
+
   const handleDeleteUser = async () => {
     if (!selectedUser) return;
 
@@ -813,7 +834,7 @@ export default function AdminUserSearch() {
       {/* Hours List */}
       {userHours.length > 0 && (
         <div className="hours-section">
-          <h3>{t('admin.allSessions')} ({userHours.length})</h3>
+          <h3>{t('admin.allSessions')} ({userStats ? userStats.total_sessions : userHours.length})</h3>
           <p style={{ color: '#666', fontSize: '0.9rem', marginBottom: '1rem' }}>
             Showing all sessions involving this user as student, parent, or tutor
           </p>
@@ -874,6 +895,11 @@ export default function AdminUserSearch() {
               </div>
             ))}
           </div>
+          {hoursCursor && (
+            <button onClick={loadMoreHours} className="btn-search" disabled={loadingMoreHours}>
+              {loadingMoreHours ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       )}
 
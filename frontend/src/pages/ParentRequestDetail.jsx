@@ -29,9 +29,13 @@ const ParentRequestDetail = () => {
   const fetchRequestDetail = async () => {
     try {
       setLoading(true);
-      const response = await api.get(`/api/requests/list/`);
-      const allRequests = response.data || [];
-      const foundRequest = allRequests.find(req => req.id.toString() === requestId);
+      let foundRequest = null;
+      try {
+        const response = await api.get(`/api/requests/${requestId}/`);
+        foundRequest = response.data;
+      } catch (fetchError) {
+        if (fetchError.response?.status !== 404) throw fetchError;
+      }
 
       console.log('Found request:', foundRequest);
       console.log('User:', user);
@@ -4,6 +4,7 @@ import { useTranslation } from "react-i18next";
 import { useUser } from "../components/UserProvider";
 import { useNavigate } from "react-router-dom";
 import RequestTutorModal from "../components/RequestTutorModal";
+import { subscribeToEvents } from "../utils/realtimeEvents";
 import "../styles/ViewReply.css";
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
@@ -55,6 +56,8 @@ const ViewReply = () => {
       }
     };
     fetchRequests();
+    // Refresh when a tutor replies or a match changes instead of polling
+    return subscribeToEvents(["reply.created", "match.created", "match.updated"], fetchRequests);
   }, [parent]);
 
   /* fetch tutor documents */
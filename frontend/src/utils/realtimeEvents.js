@@ -0,0 +1,57 @@
+// Server-Sent Events from /api/events/stream/. The stream is authenticated
+// with a short-lived ticket (EventSource can't send the bearer header), so a
+// fresh ticket is fetched for every (re)connect.
+import api from '../api';
+
+const BASE_URL = import.meta.env.VITE_API_URL || '';
+// The stream is served by its own ASGI service; defaults to the API host
+const EVENTS_URL = import.meta.env.VITE_EVENTS_URL || BASE_URL;
+const MAX_BACKOFF_MS = 60 * 1000;
+
+export function subscribeToEvents(eventTypes, onEvent) {
+  let source = null;
+  let timer = null;
+  let closed = false;
+  let backoff = 1000;
+
+  const connect = async () => {
+    if (closed || typeof EventSource === 'undefined') return;
+    try {
+      const { data } = await api.post('/api/events/ticket/');
+      if (closed) return;
+      source = new EventSource(`${EVENTS_URL}/api/events/stream/?ticket=${encodeURIComponent(data.ticket)}`);
+      source.onopen = () => { backoff = 1000; };
+      eventTypes.forEach((type) => {
+        source.addEventListener(type, (e) => {
+          try {
+            onEvent(type, JSON.parse(e.data));
+          } catch (err) {
+            console.error('Bad realtime event:', err);
+          }
+        });
+      });
+      // The browser would retry with the same (by then expired) ticket, so
+      // reconnect ourselves instead
+      source.onerror = () => {
+        source.close();
+        retry();
+      };
+    } catch (err) {
+      retry();
+    }
+  };
+
+  const retry = () => {
+    if (closed) return;
+    timer = setTimeout(connect, backoff);
+    backoff = Math.min(backoff * 2, MAX_BACKOFF_MS);
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+}
@@ -6,4 +6,14 @@ class PlaygroundConfig(AppConfig):
     name = 'playground'
 
     def ready(self):
-        import playground.signals
\ No newline at end of file
+        import playground.signals
+        from django.db.models.signals import post_migrate
+        post_migrate.connect(ensure_request_search_index, sender=self)
+
+
+def ensure_request_search_index(using, verbosity=1, **kwargs):
+    """Restore the SQLite search triggers if a migration rebuilt the requests table."""
+    from playground.request_search import ensure_search_index
+    restored = ensure_search_index(using=using)
+    if restored and verbosity:
+        print(f"Restored request search triggers: {', '.join(restored)}")
\ No newline at end of file
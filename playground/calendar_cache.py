@@ -0,0 +1,107 @@
+# playground/calendar_cache.py
+import hashlib
+import json
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+
+# Entries outlive their TTL by this much so they can still be revalidated
+# with If-None-Match instead of being downloaded again
+REVALIDATE_WINDOW_SECONDS = 15 * 60
+
+
+def _generation_key(user_id):
+    return f"gcal_events_gen:{user_id}"
+
+
+def _entry_key(user_id, params):
+    generation = cache.get(_generation_key(user_id), 0)
+    canonical = json.dumps(
+        {k: sorted(v) if isinstance(v, list) else v for k, v in params.items()},
+        sort_keys=True, default=str,
+    )
+    digest = hashlib.sha1(canonical.encode()).hexdigest()
+    return f"gcal_events:{user_id}:{generation}:{digest}"
+
+
+def invalidate_events_cache(user_id):
+    """Forget every cached listing for the user, e.g. after we wrote to their calendar."""
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        cache.set(_generation_key(user_id), 1, None)
+
+
+def compute_etag(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def etag_response(request, data, etag=None):
+    """
+    Return data with an ETag header, or an empty 304 when the client already
+    holds that version (If-None-Match).
+    """
+    etag = etag or compute_etag(data)
+    client_etags = [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+    if etag in client_etags or "*" in client_etags:
+        response = Response(status=304)
+    else:
+        response = Response(data)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def fetch_events(user_id, access_token, params):
+    """
+    events.list through a short-TTL per-user cache.
+
+    Fresh entries are served without contacting Google. Expired ones are
+    revalidated with Google's ETag; a 304 from Google just renews the entry.
+    Only successful responses are cached.
+
+    Returns (status_code, json_body, our_etag); our_etag is None for errors.
+    Raises requests.exceptions.RequestException like requests.get.
+    """
+    key = _entry_key(user_id, params)
+    entry = cache.get(key)
+    now = time.time()
+    ttl = settings.GOOGLE_EVENTS_CACHE_TTL_SECONDS
+
+    if entry and now - entry["fetched_at"] < ttl:
+        return 200, entry["body"], entry["etag"]
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    if entry and entry.get("google_etag"):
+        headers["If-None-Match"] = entry["google_etag"]
+
+    response = requests.get(EVENTS_URL, headers=headers, params=params, timeout=10)
+
+    if response.status_code == 304 and entry:
+        entry["fetched_at"] = now
+        cache.set(key, entry, ttl + REVALIDATE_WINDOW_SECONDS)
+        return 200, entry["body"], entry["etag"]
+
+    body = response.json()
+    if response.status_code not in (200, 201):
+        return response.status_code, body, None
+
+    if "items" not in body:
+        body["items"] = []
+    entry = {
+        "body": body,
+        "etag": compute_etag(body),
+        "google_etag": response.headers.get("ETag") or body.get("etag"),
+        "fetched_at": now,
+    }
+    cache.set(key, entry, ttl + REVALIDATE_WINDOW_SECONDS)
+    return response.status_code, body, entry["etag"]
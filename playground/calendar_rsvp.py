@@ -0,0 +1,314 @@
+# playground/calendar_rsvp.py
+import logging
+from datetime import datetime
+
+import googleapiclient.errors
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from playground.google_tokens import google_token_manager, RECONNECT_GOOGLE
+
+logger = logging.getLogger(__name__)
+
+EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events/{event_id}"
+
+# RSVP choices from the app -> Google attendee responseStatus
+STATUS_MAP = {
+    "accept": "accepted",
+    "accepted": "accepted",
+    "cant_attend": "declined",
+    "decline": "declined",
+    "disputed": "declined",        # custom => decline on GCal
+    "tentative": "tentative",
+    "needs_action": "needsAction",
+}
+
+# Another writer changing the event between our GET and PATCH makes Google
+# answer 412; re-read and try again this many times in total
+PATCH_ATTEMPTS = 3
+
+
+def with_attendee_status(attendees, email, response_status, add_if_missing=True):
+    """Return the attendee list with email's responseStatus set."""
+    email = email.lower()
+    attendees = [dict(attendee) for attendee in attendees or []]
+    for attendee in attendees:
+        if attendee.get("email", "").lower() == email:
+            attendee["responseStatus"] = response_status
+            return attendees
+    if add_if_missing:
+        attendees.append({"email": email, "responseStatus": response_status})
+    return attendees
+
+
+def patch_attendee_status(access_token, event_id, email, response_status,
+                          calendar_id="primary", add_if_missing=True):
+    """
+    Set one attendee's responseStatus with events.patch.
+
+    Only the attendees list and ETag are read, only the attendees list is
+    written, and the write is conditional on the ETag (If-Match), so a
+    concurrent edit is re-read instead of being overwritten.
+    """
+    url = EVENTS_URL.format(calendar_id=calendar_id, event_id=event_id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    for attempt in range(PATCH_ATTEMPTS):
+        current = requests.get(url, headers=headers, params={"fields": "attendees,etag"}, timeout=10)
+        if current.status_code != 200:
+            return {'success': False, 'error': f'Could not fetch event: {current.text}'}
+        event = current.json()
+
+        attendees = event.get("attendees", [])
+        mine = [a for a in attendees if a.get("email", "").lower() == email.lower()]
+        if mine and mine[0].get("responseStatus") == response_status:
+            return {'success': True, 'unchanged': True}
+
+        response = requests.patch(
+            url,
+            headers={**headers, "If-Match": event["etag"]},
+            params={"fields": "id,etag"},
+            json={"attendees": with_attendee_status(attendees, email, response_status, add_if_missing)},
+            timeout=10,
+        )
+        if response.status_code == 412 and attempt < PATCH_ATTEMPTS - 1:
+            logger.info(f"Event {event_id} changed during RSVP update, retrying")
+            continue
+        if response.status_code == 200:
+            return {'success': True, 'etag': response.json().get("etag")}
+        return {
+            'success': False,
+            'error': f"Google Calendar API error updating RSVP: {response.status_code} - {response.text}",
+        }
+
+
+def build_calendar_service(user):
+    """Calendar API client for the user; raises ValueError if Google needs reconnecting."""
+    access_token = google_token_manager.get_access_token(user)
+    if access_token in (None, RECONNECT_GOOGLE):
+        raise ValueError("Google account needs to be reconnected")
+    creds = Credentials(
+        token=access_token,
+        refresh_token=user.refresh_token,
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id=settings.GOOGLE_CLIENT_ID,
+        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        scopes=["https://www.googleapis.com/auth/calendar"]
+    )
+    return build("calendar", "v3", credentials=creds, cache_discovery=False)
+
+
+def patch_event(service, calendar_id, event_id, build_patch, fields, send_updates):
+    """
+    Read only `fields` of the event, then events.patch just the body
+    build_patch(event) returns, conditional on the ETag we read. If the event
+    changed in between (412), re-read and try again.
+    """
+    for attempt in range(PATCH_ATTEMPTS):
+        event = service.events().get(calendarId=calendar_id, eventId=event_id, fields=fields).execute()
+        body = build_patch(event)
+        request = service.events().patch(
+            calendarId=calendar_id,
+            eventId=event_id,
+            body=body,
+            sendUpdates=send_updates,
+            fields="id,etag",
+        )
+        request.headers["If-Match"] = event["etag"]
+        try:
+            return event, body, request.execute()
+        except googleapiclient.errors.HttpError as e:
+            if e.resp.status != 412 or attempt == PATCH_ATTEMPTS - 1:
+                raise
+
+
+def apply_rsvp(user, event_id, status_str, calendar_id="primary", cancel_reason="",
+               send_emails=False, cancellation=False):
+    """
+    Patch the user's attendee status on the event. Raises ValueError if
+    Google needs reconnecting and HttpError if the patch fails. Returns the
+    patched event's id/etag.
+
+    The two RSVP entry points mark the event differently, as they always have:
+    - cancellation=False (the GET link): "disputed" is flagged in
+      extendedProperties, and Google notifies the other attendees.
+    - cancellation=True (the POST cancel dialog): "cant_attend" stores who
+      cancelled and why, "accepted" clears that again, and Google sends no
+      notifications for cant_attend. send_emails sends our own instead.
+    """
+    from playground.calendar_cache import invalidate_events_cache
+    from playground.calendar_sync import schedule_calendar_sync
+
+    service = build_calendar_service(user)
+    me = user.email.lower()
+    g_status = STATUS_MAP[status_str]
+
+    def build_patch(event):
+        # add self as attendee with the new status if missing
+        body = {"attendees": with_attendee_status(event.get("attendees", []), me, g_status)}
+        if not cancellation:
+            if status_str == "disputed":
+                body["extendedProperties"] = {"private": {"disputed": "true"}}
+                body["colorId"] = "11"  # red-ish
+        elif status_str == "cant_attend":
+            private = {"cant_attend": "true", "cancelled_by": user.email}
+            if cancel_reason:
+                private["cancel_reason"] = cancel_reason
+            body["extendedProperties"] = {"private": private}
+            body["colorId"] = "11"  # red color for cancelled
+        elif status_str == "accepted":
+            # Clear cancellation data when re-accepting (null removes a key in a patch)
+            if event.get("extendedProperties", {}).get("private"):
+                body["extendedProperties"] = {"private": {
+                    "cant_attend": None,
+                    "cancelled_by": None,
+                    "cancel_reason": None,
+                }}
+            body["colorId"] = None  # remove color
+        return body
+
+    if cancellation:
+        # sendUpdates="none" for cancellations since we send custom emails,
+        # "all" for everything else so Google notifies attendees
+        fields = "id,etag,attendees,extendedProperties,summary,start"
+        send_updates = "none" if status_str == "cant_attend" else "all"
+    else:
+        fields = "id,etag,attendees"
+        send_updates = "all"
+
+    event, body, updated = patch_event(
+        service, calendar_id, event_id, build_patch, fields=fields, send_updates=send_updates,
+    )
+
+    invalidate_events_cache(user.id)
+    schedule_calendar_sync(user.id)
+
+    if cancellation and send_emails and status_str == "cant_attend":
+        send_cancellation_emails(user, event, cancel_reason, body["attendees"])
+    return updated
+
+
+def send_cancellation_emails(cancelling_user, event, cancel_reason, attendees):
+    """Send email notifications for cancellations"""
+    try:
+        from playground.email_utils import send_mailgun_email
+
+        event_title = event.get("summary", "Tutoring Session")
+        event_start = event.get("start", {}).get("dateTime", event.get("start", {}).get("date", ""))
+
+        # Format date nicely
+        if event_start:
+            try:
+                if "T" in event_start:  # datetime format
+                    event_datetime = datetime.fromisoformat(event_start.replace('Z', '+00:00'))
+                    formatted_date = event_datetime.strftime("%B %d, %Y at %I:%M %p")
+                else:  # date only format
+                    event_date = datetime.fromisoformat(event_start).date()
+                    formatted_date = event_date.strftime("%B %d, %Y")
+            except:
+                formatted_date = event_start
+        else:
+            formatted_date = "Unknown date"
+
+        # Send confirmation email to cancelling user
+        confirmation_subject = f"Cancellation Confirmation - {event_title}"
+        confirmation_message = f"""
+Hello,
+
+You have successfully cancelled the following tutoring session:
+
+Session: {event_title}
+Date: {formatted_date}
+Reason: {cancel_reason}
+
+Both you and the other participant have been notified of this cancellation.
+
+Best regards,
+EGS Tutoring Team
+        """
+
+        send_mailgun_email(
+            [cancelling_user.email],
+            confirmation_subject,
+            confirmation_message.strip()
+        )
+
+        # Send notification emails to other attendees
+        for attendee in attendees:
+            attendee_email = attendee.get("email", "").lower()
+            if attendee_email != cancelling_user.email.lower():
+                # Determine role for better messaging
+                canceller_role = "tutor" if cancelling_user.roles == "tutor" else "student"
+
+                notification_subject = f"Session Cancelled - {event_title}"
+                notification_message = f"""
+Hello,
+
+The {canceller_role} has cancelled the following tutoring session:
+
+Session: {event_title}
+Date: {formatted_date}
+Cancelled by: {cancelling_user.first_name} {cancelling_user.last_name} ({cancelling_user.email})
+Reason: {cancel_reason}
+
+Please contact the {canceller_role} if you need to reschedule or have any questions.
+
+Best regards,
+EGS Tutoring Team
+                """
+
+                send_mailgun_email(
+                    [attendee_email],
+                    notification_subject,
+                    notification_message.strip()
+                )
+
+    except Exception as e:
+        # Log error but don't fail the request
+        logger.error(f"Error sending cancellation emails: {e}")
+
+
+def _pending_key(user_id, event_id):
+    return f"rsvp_pending:{user_id}:{event_id}"
+
+
+def _status_key(user_id, event_id):
+    return f"rsvp_status:{user_id}:{event_id}"
+
+
+def queue_rsvp_update(user_id, event_id, status, **options):
+    """
+    Record the RSVP the user wants and make sure one update task is queued.
+
+    Further changes for the same event within GOOGLE_RSVP_COALESCE_SECONDS
+    only overwrite the recorded status (and options such as cancel_reason),
+    so the task sends a single patch carrying whatever the user picked last.
+    Returns False if no task could be queued, so the caller can apply the
+    change itself.
+    """
+    window = settings.GOOGLE_RSVP_COALESCE_SECONDS
+    cache.set(_status_key(user_id, event_id), {"status": status, **options}, window * 10)
+    if not cache.add(_pending_key(user_id, event_id), True, window * 10):
+        return True
+    try:
+        from playground.tasks import update_google_calendar_rsvp_async
+        update_google_calendar_rsvp_async.apply_async(args=[user_id, event_id], countdown=window)
+    except Exception as e:
+        cache.delete(_pending_key(user_id, event_id))
+        cache.delete(_status_key(user_id, event_id))
+        logger.warning(f"Could not queue RSVP update for user {user_id}, event {event_id}: {e}")
+        return False
+    return True
+
+
+def take_queued_status(user_id, event_id):
+    """
+    Latest RSVP recorded by queue_rsvp_update, as a dict with status and its
+    options, or None. Clears the pending flag first so a change made while
+    the task runs queues a new one.
+    """
+    cache.delete(_pending_key(user_id, event_id))
+    return cache.get(_status_key(user_id, event_id))
@@ -0,0 +1,264 @@
+# playground/calendar_sync.py
+import logging
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from playground.google_tokens import google_token_manager, RECONNECT_GOOGLE
+
+logger = logging.getLogger(__name__)
+
+EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+
+# Google rejects these alongside syncToken, so the full sync can't use them
+# either; EGS filtering is done locally instead of via sharedExtendedProperty.
+SYNC_PARAMS = {
+    "singleEvents": True,
+    "maxResults": 2500,
+    "showDeleted": True,
+}
+
+
+# Extended property names accepted from clients when filtering the local store
+PROPERTY_KEY_RE = re.compile(r'[A-Za-z0-9_]+')
+
+
+class CalendarSyncError(Exception):
+    pass
+
+
+class SyncTokenExpired(CalendarSyncError):
+    """Google answered 410 Gone: the sync token is no longer valid."""
+
+
+def is_egs_event(event):
+    return event.get("extendedProperties", {}).get("shared", {}).get("egs_tutoring") == "true"
+
+
+def _parse_event_time(value):
+    if not value:
+        return None
+    if value.get("dateTime"):
+        return parse_datetime(value["dateTime"])
+    if value.get("date"):
+        day = parse_date(value["date"])
+        return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc) if day else None
+    return None
+
+
+def _fetch_pages(access_token, sync_token=None):
+    """Yield events.list pages; the last page carries nextSyncToken."""
+    params = dict(SYNC_PARAMS)
+    if sync_token:
+        params["syncToken"] = sync_token
+
+    while True:
+        response = requests.get(
+            EVENTS_URL,
+            headers={"Authorization": f"Bearer {access_token}"},
+            params=params,
+            timeout=20,
+        )
+        if response.status_code == 410:
+            raise SyncTokenExpired()
+        if response.status_code != 200:
+            raise CalendarSyncError(f"Google Calendar API error: {response.status_code} - {response.text[:500]}")
+
+        page = response.json()
+        yield page
+
+        next_page = page.get("nextPageToken")
+        if not next_page:
+            return
+        params["pageToken"] = next_page
+
+
+def _apply_page(user, items, full):
+    from playground.models import CalendarEvent
+
+    to_delete = []
+    for event in items:
+        event_id = event.get("id")
+        if not event_id:
+            continue
+        if event.get("status") == "cancelled" or not is_egs_event(event):
+            if not full:
+                to_delete.append(event_id)
+            continue
+
+        CalendarEvent.objects.update_or_create(
+            user=user,
+            google_event_id=event_id,
+            defaults={
+                "status": event.get("status", ""),
+                "summary": (event.get("summary") or "")[:1024],
+                "start": _parse_event_time(event.get("start")),
+                "end": _parse_event_time(event.get("end")),
+                "etag": event.get("etag", ""),
+                "google_updated": parse_datetime(event["updated"]) if event.get("updated") else None,
+                "data": event,
+            },
+        )
+
+    if to_delete:
+        CalendarEvent.objects.filter(user=user, google_event_id__in=to_delete).delete()
+
+
+# Namespace for the per-user advisory lock (first argument of the two-key form)
+SYNC_ADVISORY_LOCK_CLASS = 7201
+
+
+@contextmanager
+def _sync_lock(user_id):
+    """
+    Hold the user's sync lock outside any transaction; yields False if another
+    sync has it. PostgreSQL uses a session-level advisory lock, which is
+    released even if the worker dies; elsewhere a cache key with a timeout.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", [SYNC_ADVISORY_LOCK_CLASS, user_id])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [SYNC_ADVISORY_LOCK_CLASS, user_id])
+        return
+
+    key = f"calendar_sync_lock:{user_id}"
+    acquired = cache.add(key, True, settings.GOOGLE_CALENDAR_SYNC_LOCK_SECONDS)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def sync_user_calendar(user, full=False):
+    """
+    Bring the user's local CalendarEvent rows up to date with Google.
+
+    Uses the stored nextSyncToken for an incremental sync; falls back to a full
+    resync when there is no token yet, Google answers 410 Gone, or full=True.
+
+    Syncs for the same user are serialised with an advisory (or cache) lock
+    rather than a row lock, so no transaction or DB lock is held open across
+    the Google requests. Each page is committed as it arrives; the sync token
+    only advances once every page is in, so an interrupted sync replays from
+    the old token next time.
+
+    Returns a dict describing what happened.
+    """
+    from playground.models import CalendarEvent, CalendarSyncState
+
+    with _sync_lock(user.id) as acquired:
+        if not acquired:
+            return {'success': True, 'skipped': 'Sync already running'}
+        access_token = google_token_manager.get_access_token(user)
+        if access_token == RECONNECT_GOOGLE or not access_token:
+            return {'success': False, 'error': 'Google account needs to be reconnected'}
+
+        state, _ = CalendarSyncState.objects.get_or_create(user=user)
+
+        full = full or not state.sync_token
+        try:
+            next_sync_token = _run_sync(user, access_token, None if full else state.sync_token, full)
+        except SyncTokenExpired:
+            logger.info(f"Calendar sync token expired for user {user.id}, running full resync")
+            full = True
+            next_sync_token = _run_sync(user, access_token, None, full)
+        except CalendarSyncError as e:
+            state.last_error = str(e)
+            state.save(update_fields=['last_error'])
+            logger.error(f"Calendar sync failed for user {user.id}: {e}")
+            return {'success': False, 'error': str(e)}
+
+        now = timezone.now()
+        state.sync_token = next_sync_token or ''
+        state.last_synced_at = now
+        state.last_error = ''
+        update_fields = ['sync_token', 'last_synced_at', 'last_error']
+        if full:
+            state.last_full_sync_at = now
+            update_fields.append('last_full_sync_at')
+        state.save(update_fields=update_fields)
+
+    return {'success': True, 'full': full, 'events': CalendarEvent.objects.filter(user=user).count()}
+
+
+def _run_sync(user, access_token, sync_token, full):
+    from playground.models import CalendarEvent
+
+    seen_ids = set()
+    next_sync_token = None
+    for page in _fetch_pages(access_token, sync_token):
+        items = page.get("items", [])
+        with transaction.atomic():
+            _apply_page(user, items, full)
+        if full:
+            seen_ids.update(e["id"] for e in items if e.get("id") and e.get("status") != "cancelled" and is_egs_event(e))
+        next_sync_token = page.get("nextSyncToken") or next_sync_token
+
+    if full:
+        # Anything we hold locally that a full listing didn't return is gone
+        CalendarEvent.objects.filter(user=user).exclude(google_event_id__in=seen_ids).delete()
+
+    return next_sync_token
+
+
+def schedule_calendar_sync(user_id, full=False):
+    """Queue a sync for the user; never raises."""
+    try:
+        from playground.tasks import sync_google_calendar_async
+        sync_google_calendar_async.delay(user_id, full=full)
+    except Exception as e:
+        logger.warning(f"Could not queue calendar sync for user {user_id}: {e}")
+
+
+def get_sync_state(user):
+    from playground.models import CalendarSyncState
+    return CalendarSyncState.objects.filter(user=user, last_synced_at__isnull=False).first()
+
+
+def is_stale(state):
+    max_age = timedelta(minutes=settings.GOOGLE_CALENDAR_SYNC_MAX_AGE_MINUTES)
+    return state.last_synced_at < timezone.now() - max_age
+
+
+def local_events_response(user, time_min=None, time_max=None, max_results=250,
+                          order_by='startTime', shared_props=None, private_props=None):
+    """
+    Build an events.list-shaped response from the local store.
+
+    shared_props / private_props are lists of 'key=value' strings and, as in
+    Google's API, every one of them must match. Keys are plain property names
+    (letters, digits, underscore); anything else raises ValueError, since the
+    key becomes part of a JSON lookup.
+    """
+    from playground.models import CalendarEvent
+
+    qs = CalendarEvent.objects.filter(user=user).exclude(status='cancelled')
+    if time_min:
+        qs = qs.filter(end__gt=time_min)
+    if time_max:
+        qs = qs.filter(start__lt=time_max)
+    for prop_kind, props in (('shared', shared_props), ('private', private_props)):
+        for prop in props or []:
+            key, sep, value = prop.partition('=')
+            if sep:
+                if not PROPERTY_KEY_RE.fullmatch(key) or '__' in key:
+                    raise ValueError(f"Invalid extended property name '{key}'")
+                qs = qs.filter(**{f'data__extendedProperties__{prop_kind}__{key}': value})
+
+    qs = qs.order_by('google_updated') if order_by == 'updated' else qs.order_by('start', 'id')
+    items = list(qs.values_list('data', flat=True)[:max_results])
+    return {"kind": "calendar#events", "items": items}
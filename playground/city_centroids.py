@@ -0,0 +1,86 @@
+# playground/city_centroids.py
+
+# Approximate centre coordinates for every User.CITY_CHOICES entry. Used as an
+# instant, offline location when the Mapulus geocoder is unavailable or hasn't
+# run yet; users placed this way are flagged location_is_approximate until a
+# precise geocode replaces it.
+
+CITY_CENTROIDS = {
+    'Ajax': (43.850900, -79.020400),
+    'Aurora': (44.006500, -79.450400),
+    'Barrie': (44.389400, -79.690300),
+    'Belleville': (44.162800, -77.383200),
+    'Brampton': (43.731500, -79.762400),
+    'Brantford': (43.139400, -80.264400),
+    'Burlington': (43.325500, -79.799000),
+    'Cambridge': (43.361600, -80.314400),
+    'Chatham-Kent': (42.404800, -82.191000),
+    'Clarington': (43.935000, -78.608300),
+    'Collingwood': (44.500100, -80.216900),
+    'Cornwall': (45.021300, -74.730300),
+    'Dryden': (49.783300, -92.837700),
+    'Georgina': (44.296000, -79.436300),
+    'Grimsby': (43.200100, -79.566300),
+    'Guelph': (43.544800, -80.248200),
+    'Hamilton': (43.255700, -79.871100),
+    'Huntsville': (45.326900, -79.216800),
+    'Innisfil': (44.300100, -79.583300),
+    'Kawartha Lakes': (44.356000, -78.740300),
+    'Kenora': (49.767000, -94.489400),
+    'Kingston': (44.231200, -76.486000),
+    'Kitchener': (43.451600, -80.492500),
+    'Leamington': (42.053100, -82.599800),
+    'London': (42.984900, -81.245300),
+    'Markham': (43.856100, -79.337000),
+    'Midland': (44.750100, -79.883300),
+    'Milton': (43.518300, -79.877400),
+    'Mississauga': (43.589000, -79.644100),
+    'Newmarket': (44.059200, -79.461300),
+    'Niagara Falls': (43.089600, -79.084900),
+    'Niagara-on-the-Lake': (43.255000, -79.077300),
+    'North Bay': (46.309100, -79.460800),
+    'Oakville': (43.467500, -79.687700),
+    'Orangeville': (43.920000, -80.094300),
+    'Orillia': (44.608200, -79.419700),
+    'Oshawa': (43.897100, -78.865800),
+    'Ottawa': (45.421500, -75.697200),
+    'Peterborough': (44.309100, -78.319700),
+    'Pickering': (43.838400, -79.086800),
+    'Quinte West': (44.100100, -77.576800),
+    'Richmond Hill': (43.882800, -79.440300),
+    'Sarnia': (42.974500, -82.406600),
+    'St. Catharines': (43.159400, -79.246900),
+    'St. Thomas': (42.779200, -81.192700),
+    'Stratford': (43.370000, -80.982200),
+    'Sudbury': (46.491700, -80.993000),
+    'Tecumseh': (42.299900, -82.883300),
+    'Thunder Bay': (48.380900, -89.247700),
+    'Timmins': (48.475800, -81.330500),
+    'Toronto': (43.653200, -79.383200),
+    'Vaughan': (43.836100, -79.498300),
+    'Wasaga Beach': (44.520900, -80.016700),
+    'Waterloo': (43.464300, -80.520400),
+    'Welland': (42.992200, -79.248300),
+    'Whitby': (43.897500, -78.942900),
+    'Windsor': (42.314900, -83.036400),
+    'Woodstock': (43.131500, -80.747200),
+}
+
+_BY_LOWER = {name.lower(): name for name in CITY_CENTROIDS}
+
+
+def city_centroid(city):
+    """
+    Geocode-shaped result for the centre of a known city, or None.
+    Matches CITY_CHOICES values case-insensitively.
+    """
+    name = _BY_LOWER.get((city or '').strip().lower())
+    if name is None:
+        return None
+    latitude, longitude = CITY_CENTROIDS[name]
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'formatted_address': f"{name}, Ontario, Canada",
+        'approximate': True,
+    }
@@ -0,0 +1,161 @@
+# playground/email_archive.py
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = [
+    'id', 'recipient_email', 'recipient_name', 'subject', 'email_type',
+    'status', 'from_email', 'error_message', 'sent_at',
+]
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + (month.month // 12), month.month % 12 + 1, 1)
+
+
+def _archive_root():
+    return os.path.join(str(settings.MEDIA_ROOT), settings.EMAIL_LOG_ARCHIVE_DIR)
+
+
+def archive_email_logs(retention_days=None, chunk_size=2000):
+    """
+    Move EmailLog rows older than the retention window into gzipped NDJSON files
+    under MEDIA_ROOT, one file per month per run.
+
+    The file is written and closed first; the EmailLogArchive index row and the
+    delete from the hot table then happen in one transaction. If that transaction
+    fails the file is removed again, so a row is never both live and archived.
+
+    Returns a dict with the number of rows and files archived.
+    """
+    from playground.models import EmailLog, EmailLogArchive
+
+    if retention_days is None:
+        retention_days = settings.EMAIL_LOG_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    old_rows = EmailLog.objects.filter(sent_at__lt=cutoff)
+    oldest = old_rows.order_by('sent_at').values_list('sent_at', flat=True).first()
+    if oldest is None:
+        return {'archived_rows': 0, 'archived_files': 0, 'cutoff': cutoff.isoformat()}
+
+    root = _archive_root()
+    run_stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+    tz = timezone.get_current_timezone()
+    archived_rows = 0
+    archived_files = 0
+
+    month = _month_start(timezone.localtime(oldest))
+    while timezone.make_aware(datetime.combine(month, datetime.min.time()), tz) < cutoff:
+        month_start = timezone.make_aware(datetime.combine(month, datetime.min.time()), tz)
+        month_end = min(
+            timezone.make_aware(datetime.combine(_next_month(month), datetime.min.time()), tz),
+            cutoff,
+        )
+        month_qs = EmailLog.objects.filter(sent_at__gte=month_start, sent_at__lt=month_end)
+
+        # Pin the upper id so rows committed while we stream can't be deleted unarchived
+        max_id = month_qs.order_by('-id').values_list('id', flat=True).first()
+        if max_id is None:
+            month = _next_month(month)
+            continue
+        month_qs = month_qs.filter(id__lte=max_id)
+
+        relative_path = os.path.join(
+            settings.EMAIL_LOG_ARCHIVE_DIR,
+            f"{month:%Y-%m}",
+            f"emaillog-{month:%Y-%m}-{run_stamp}.ndjson.gz",
+        )
+        full_path = os.path.join(str(settings.MEDIA_ROOT), relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        row_count = 0
+        first_sent_at = last_sent_at = None
+        with gzip.open(full_path, 'wt', encoding='utf-8') as fh:
+            for row in month_qs.order_by('sent_at', 'id').values(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size):
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder))
+                fh.write('\n')
+                row_count += 1
+                if first_sent_at is None:
+                    first_sent_at = row['sent_at']
+                last_sent_at = row['sent_at']
+
+        try:
+            with transaction.atomic():
+                EmailLogArchive.objects.create(
+                    month=month,
+                    file_path=relative_path,
+                    row_count=row_count,
+                    first_sent_at=first_sent_at,
+                    last_sent_at=last_sent_at,
+                )
+                month_qs.delete()
+        except Exception:
+            os.remove(full_path)
+            raise
+
+        logger.info(f"Archived {row_count} EmailLog rows for {month:%Y-%m} to {relative_path}")
+        archived_rows += row_count
+        archived_files += 1
+        month = _next_month(month)
+
+    logger.info(f"EmailLog archival complete: {archived_rows} rows in {archived_files} files (cutoff {cutoff:%Y-%m-%d})")
+    return {'archived_rows': archived_rows, 'archived_files': archived_files, 'cutoff': cutoff.isoformat()}
+
+
+def iter_archived_email_logs(date_from=None, date_to=None, email_type=None, status=None, search=None):
+    """
+    Yield archived EmailLog rows (as dicts) matching the same filters as the
+    admin email log list. Only archive files whose date span overlaps the
+    requested range are opened, and each is streamed line by line.
+    """
+    from playground.models import EmailLogArchive
+
+    archives = EmailLogArchive.objects.order_by('month', 'created_at')
+    if date_from:
+        archives = archives.filter(last_sent_at__date__gte=date_from)
+    if date_to:
+        archives = archives.filter(first_sent_at__date__lte=date_to)
+
+    search = (search or '').lower()
+    date_from_str = date_from.isoformat() if date_from else None
+    date_to_str = date_to.isoformat() if date_to else None
+
+    for archive in archives.iterator():
+        full_path = os.path.join(str(settings.MEDIA_ROOT), archive.file_path)
+        if not os.path.exists(full_path):
+            logger.warning(f"EmailLog archive file missing: {archive.file_path}")
+            continue
+
+        with gzip.open(full_path, 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                row = json.loads(line)
+                sent_day = row['sent_at'][:10]
+                if date_from_str and sent_day < date_from_str:
+                    continue
+                if date_to_str and sent_day > date_to_str:
+                    continue
+                if email_type and row['email_type'] != email_type:
+                    continue
+                if status and row['status'] != status:
+                    continue
+                if search and not (
+                    search in (row['recipient_email'] or '').lower()
+                    or search in (row['recipient_name'] or '').lower()
+                    or search in (row['subject'] or '').lower()
+                ):
+                    continue
+                yield row
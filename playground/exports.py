@@ -0,0 +1,154 @@
+# playground/exports.py
+import csv
+import json
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def _user_columns(prefix):
+    """Email and name of a related user, as flat columns"""
+    return {
+        f'{prefix}_email': F(f'{prefix}__email'),
+        f'{prefix}_firstName': F(f'{prefix}__firstName'),
+        f'{prefix}_lastName': F(f'{prefix}__lastName'),
+    }
+
+
+def _hours():
+    from playground.models import Hours
+
+    columns = {
+        **_user_columns('tutor'), **_user_columns('parent'), **_user_columns('student'),
+    }
+    fields = [
+        'id', 'date', 'startTime', 'endTime', 'totalTime', 'location', 'subject', 'status',
+        'eligible', 'invoice_status', 'invoice_id', 'tutor_id', 'parent_id', 'student_id', 'created_at',
+    ]
+    queryset = Hours.objects.values(*fields, **columns).order_by('date', 'id')
+    return queryset, fields + list(columns)
+
+
+def _monthly_hours():
+    from playground.models import MonthlyHours
+
+    columns = _user_columns('tutor')
+    fields = ['id', 'tutor_id', 'start_date', 'end_date', 'OnlineHours', 'InPersonHours', 'TotalBeforeTax', 'created_at']
+    queryset = MonthlyHours.objects.values(*fields, **columns).order_by('end_date', 'id')
+    return queryset, fields + list(columns)
+
+
+def _payouts():
+    from playground.models import StripePayout
+
+    columns = {
+        **_user_columns('tutor'),
+        'period_start': F('monthly_hours__start_date'),
+        'period_end': F('monthly_hours__end_date'),
+    }
+    fields = ['id', 'tutor_id', 'monthly_hours_id', 'amount_cents', 'currency', 'stripe_transfer_id', 'status', 'created_at']
+    queryset = StripePayout.objects.values(*fields, **columns).order_by('created_at', 'id')
+    return queryset, fields + list(columns)
+
+
+def _invoices():
+    """One row per Stripe invoice, rolled up from the hours billed on it"""
+    from playground.models import Hours
+
+    columns = _user_columns('parent')
+    totals = {
+        'sessions': Count('id'),
+        'total_hours': Sum('totalTime'),
+        'first_session': Min('date'),
+        'last_session': Max('date'),
+    }
+    fields = ['invoice_id', 'parent_id']
+    queryset = (
+        Hours.objects.filter(invoice_status='invoiced', invoice_id__isnull=False)
+        .values(*fields, **columns).annotate(**totals).order_by('invoice_id')
+    )
+    return queryset, fields + list(columns) + list(totals)
+
+
+# dataset -> (queryset builder, field the date range applies to, role -> user column)
+EXPORTS = {
+    'hours': (_hours, 'date', {'tutor': 'tutor_id', 'parent': 'parent_id', 'student': 'student_id'}),
+    'monthly-hours': (_monthly_hours, 'end_date', {'tutor': 'tutor_id'}),
+    'payouts': (_payouts, 'created_at__date', {'tutor': 'tutor_id'}),
+    # Filtered on the invoice's last session so an invoice is never split across ranges
+    'invoices': (_invoices, 'last_session', {'parent': 'parent_id'}),
+}
+
+
+def export_rows(dataset, date_from=None, date_to=None, user_id=None, role=None):
+    """
+    Return (rows, columns) for an accounting export. rows is a lazy iterator of
+    dicts straight off a values() queryset, fetched chunk by chunk, so memory
+    stays flat however many rows match.
+
+    user_id narrows to one user's rows: as `role` if given, otherwise in any
+    role the dataset has. Raises ValueError for an unknown dataset or role.
+    """
+    if dataset not in EXPORTS:
+        raise ValueError(f"Unknown export '{dataset}', expected one of: {', '.join(EXPORTS)}")
+    build, date_field, roles = EXPORTS[dataset]
+    if role and role not in roles:
+        raise ValueError(f"role must be one of: {', '.join(roles)}")
+    if role and user_id is None:
+        raise ValueError("role needs a user to filter on")
+
+    queryset, columns = build()
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{date_field}__lte': date_to})
+    if user_id is not None:
+        user_filter = Q()
+        for column in ([roles[role]] if role else roles.values()):
+            user_filter |= Q(**{column: user_id})
+        queryset = queryset.filter(user_filter)
+
+    rows = queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    return rows, columns
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def _plain(value):
+    """Dates, times and decimals as the same strings the NDJSON output uses"""
+    if isinstance(value, (date, datetime, time, Decimal)):
+        return _encoder.default(value)
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_export(rows, columns, export_format):
+    """
+    Yield rows as CSV lines (header first) or NDJSON lines. Used by the
+    accounting exports and the email-log archive export.
+    """
+    count = 0
+    if export_format == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=columns)
+        yield writer.writeheader()
+        for row in rows:
+            count += 1
+            yield writer.writerow({key: _plain(value) for key, value in row.items()})
+    else:
+        for row in rows:
+            count += 1
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+    logger.info(f"Streamed {count} rows as {export_format}")
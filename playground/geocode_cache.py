@@ -0,0 +1,126 @@
+# playground/geocode_cache.py
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_lru = OrderedDict()  # normalized address -> (result, expires_at)
+_lock = threading.Lock()
+_stats = {'lru_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _ttl():
+    return timedelta(days=settings.GEOCODE_CACHE_TTL_DAYS)
+
+
+def _lru_get(key):
+    with _lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= timezone.now():
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return value
+
+
+def _lru_put(key, value, expires_at):
+    with _lock:
+        _lru[key] = (value, expires_at)
+        _lru.move_to_end(key)
+        while len(_lru) > settings.GEOCODE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(normalized_address):
+    """
+    Cached geocode for a normalized address, or None on a miss.
+    Checks the in-process LRU first, then the GeocodeCache table; rows older
+    than GEOCODE_CACHE_TTL_DAYS count as misses. LRU entries expire when the
+    row they came from does, so a long-lived worker can't outlast the TTL.
+    """
+    from playground.models import GeocodeCache
+
+    result = _lru_get(normalized_address)
+    if result is not None:
+        _count('lru_hits')
+        return dict(result)
+
+    fresh_after = timezone.now() - _ttl()
+    row = (
+        GeocodeCache.objects.filter(normalized_address=normalized_address, updated_at__gte=fresh_after)
+        .values('id', 'latitude', 'longitude', 'formatted_address', 'updated_at')
+        .first()
+    )
+    if row is None:
+        _count('misses')
+        return None
+
+    GeocodeCache.objects.filter(id=row['id']).update(hit_count=F('hit_count') + 1)
+    result = {
+        'latitude': float(row['latitude']),
+        'longitude': float(row['longitude']),
+        'formatted_address': row['formatted_address'],
+    }
+    _lru_put(normalized_address, result, row['updated_at'] + _ttl())
+    _count('db_hits')
+    return dict(result)
+
+
+def store(normalized_address, result):
+    """Remember a successful API geocode in the table and the LRU."""
+    from playground.models import GeocodeCache
+
+    try:
+        GeocodeCache.objects.update_or_create(
+            normalized_address=normalized_address,
+            defaults={
+                'latitude': round(result['latitude'], 6),
+                'longitude': round(result['longitude'], 6),
+                'formatted_address': (result.get('formatted_address') or '')[:255],
+            },
+        )
+    except Exception as e:
+        # A cache write must never fail the geocode itself
+        logger.warning(f"Could not store geocode for '{normalized_address}': {e}")
+        return
+    _lru_put(normalized_address, result, timezone.now() + _ttl())
+    _count('stores')
+
+
+def geocode_cache_stats():
+    """
+    Hit/miss counters for this process plus table-wide totals. api_calls_saved
+    counts every lookup the Mapulus API didn't have to answer.
+    """
+    from playground.models import GeocodeCache
+
+    with _lock:
+        process = dict(_stats, lru_size=len(_lru))
+    lookups = process['lru_hits'] + process['db_hits'] + process['misses']
+    process['hit_rate'] = round((process['lru_hits'] + process['db_hits']) / lookups, 3) if lookups else None
+
+    totals = GeocodeCache.objects.aggregate(rows=Count('id'), db_hits=Sum('hit_count'))
+    return {
+        'process': process,
+        'table_rows': totals['rows'],
+        'api_calls_saved': (totals['db_hits'] or 0) + process['lru_hits'],
+    }
+
+
+def clear_lru():
+    with _lock:
+        _lru.clear()
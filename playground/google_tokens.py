@@ -0,0 +1,192 @@
+# playground/google_tokens.py
+import logging
+import threading
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+# Returned instead of a token when the user has no usable refresh token
+RECONNECT_GOOGLE = "RECONNECT_GOOGLE"
+
+
+class GoogleTokenManager:
+    """
+    Hands out valid Google access tokens for users.
+
+    - Decrypted tokens are cached in process memory until shortly before expiry,
+      so most calls never touch the database or Google.
+    - Refreshes are single-flight per process: a per-user thread lock collapses
+      concurrent requests, and whoever gets it second re-reads the row and
+      reuses the token the first caller just stored.
+    - No database lock is held while Google is called. The new token is written
+      with a conditional UPDATE that only matches if the row still holds the
+      token we read, so when two workers race the first write wins and the
+      other adopts it.
+    - Only the token fields are written back, never a full user.save().
+    - A refresh token Google reports as invalid_grant (revoked or expired) is
+      cleared, so the user is asked to reconnect and the periodic refresh
+      stops retrying it.
+    """
+
+    def __init__(self, expiry_skew_seconds=None):
+        if expiry_skew_seconds is None:
+            expiry_skew_seconds = getattr(settings, 'GOOGLE_TOKEN_EXPIRY_SKEW_SECONDS', 120)
+        self.expiry_skew = timedelta(seconds=expiry_skew_seconds)
+        self._cache = {}  # user_id -> (access_token, expiry)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, user_id):
+        with self._locks_guard:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = threading.Lock()
+            return lock
+
+    def _is_fresh(self, expiry, margin=None):
+        # Tokens saved before expiry tracking existed are treated as valid, as before
+        return expiry is None or expiry - max(margin or self.expiry_skew, self.expiry_skew) > timezone.now()
+
+    def invalidate(self, user_id):
+        """Drop the cached token, e.g. after the user re-authorises Google."""
+        self._cache.pop(user_id, None)
+
+    def get_access_token(self, user):
+        """
+        Return a valid access token for the user, refreshing it if it is about to expire.
+
+        Returns RECONNECT_GOOGLE when the user must go through OAuth again, or None
+        if Google rejected the refresh for another reason.
+        """
+        cached = self._cache.get(user.id)
+        if cached and self._is_fresh(cached[1]):
+            return cached[0]
+
+        access_token = user.access_token
+        if access_token and self._is_fresh(user.google_token_expiry):
+            self._cache[user.id] = (access_token, user.google_token_expiry)
+            return access_token
+
+        return self.refresh(user)
+
+    def refresh(self, user, force=False, min_valid_for=None):
+        """
+        Refresh the user's access token, single-flight per user.
+
+        With force=False a stored token that is still valid for at least
+        min_valid_for (default: the expiry skew) is reused, which is also how a
+        token refreshed by another caller while we waited for the lock gets
+        picked up. Pass force=True after Google answered 401 for the current token.
+        """
+        from playground.models import User
+
+        stale_token = self._cache.get(user.id, (user.access_token, None))[0]
+
+        with self._lock_for(user.id):
+            current = self._load(user.id)
+            current_token = current.access_token
+
+            if current_token and self._is_fresh(current.google_token_expiry, min_valid_for):
+                if not force or current_token != stale_token:
+                    self._remember(user, current, current_token)
+                    return current_token
+
+            refresh_token = current.refresh_token
+            if not refresh_token:
+                logger.error(f"No Google refresh token found for user {user.id}. User must reconnect Google account.")
+                self.invalidate(user.id)
+                return RECONNECT_GOOGLE
+
+            tokens = self._request_new_token(user.id, refresh_token)
+            if tokens == RECONNECT_GOOGLE:
+                self._forget_refresh_token(current)
+                self.invalidate(user.id)
+                return RECONNECT_GOOGLE
+            if not tokens:
+                self.invalidate(user.id)
+                return None
+
+            access_token = tokens["access_token"]
+            expiry = timezone.now() + timedelta(seconds=int(tokens.get("expires_in", 3600)))
+            updated = User.objects.filter(
+                pk=user.id,
+                _encrypted_google_access_token=current._encrypted_google_access_token,
+                google_token_expiry=current.google_token_expiry,
+            ).update(_encrypted_google_access_token=access_token, google_token_expiry=expiry)
+
+            if not updated:
+                # Another worker stored a token while we were talking to Google; use theirs
+                winner = self._load(user.id)
+                if winner.access_token and self._is_fresh(winner.google_token_expiry):
+                    self._remember(user, winner, winner.access_token)
+                    logger.info(f"Google access token for user {user.id} was refreshed concurrently; reusing it.")
+                    return winner.access_token
+
+            current._encrypted_google_access_token = access_token
+            current.google_token_expiry = expiry
+            self._remember(user, current, access_token)
+            logger.info(f"Google access token refreshed and saved for user {user.id}.")
+            return access_token
+
+    def _load(self, user_id):
+        from playground.models import User
+
+        return (
+            User.objects
+            .only('id', '_encrypted_google_access_token', '_encrypted_google_refresh_token', 'google_token_expiry')
+            .get(pk=user_id)
+        )
+
+    def _forget_refresh_token(self, current):
+        from playground.models import User
+
+        # Conditional so a refresh token saved by a reconnect in the meantime survives
+        User.objects.filter(
+            pk=current.pk, _encrypted_google_refresh_token=current._encrypted_google_refresh_token,
+        ).update(_encrypted_google_refresh_token=None)
+        logger.warning(f"Google refresh token for user {current.pk} was revoked; cleared until the user reconnects.")
+
+    def _remember(self, user, locked, access_token):
+        # Keep the caller's instance in sync so later code sees the new token
+        user._encrypted_google_access_token = locked._encrypted_google_access_token
+        user.google_token_expiry = locked.google_token_expiry
+        self._cache[user.id] = (access_token, locked.google_token_expiry)
+
+    def _request_new_token(self, user_id, refresh_token):
+        """Google's token response, RECONNECT_GOOGLE on invalid_grant, or None on other failures."""
+        data = {
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        }
+        try:
+            response = requests.post(GOOGLE_TOKEN_URL, data=data, timeout=10)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Google token refresh request failed for user {user_id}: {e}")
+            return None
+
+        logger.info(f"Google token refresh response status for user {user_id}: {response.status_code}")
+        try:
+            tokens = response.json()
+        except Exception as e:
+            logger.error(f"Failed to parse token refresh response: {e}")
+            return None
+
+        if response.status_code == 200 and "access_token" in tokens:
+            return tokens
+        if tokens.get("error") == "invalid_grant":
+            return RECONNECT_GOOGLE
+
+        logger.error(f"Google token refresh failed for user {user_id}: {tokens.get('error')}")
+        return None
+
+
+# Shared per-process instance
+google_token_manager = GoogleTokenManager()
@@ -0,0 +1,304 @@
+# playground/group_calendar.py
+import json
+import logging
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+import requests
+
+from playground.google_tokens import google_token_manager, RECONNECT_GOOGLE
+
+logger = logging.getLogger(__name__)
+
+BATCH_URL = "https://www.googleapis.com/batch/calendar/v3"
+EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+
+# Google accepts at most 50 calls in one batch request
+BATCH_LIMIT = 50
+
+CLASS_TIMEZONE = "America/Toronto"
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+RRULE_DAYS = {'monday': 'MO', 'tuesday': 'TU', 'wednesday': 'WE', 'thursday': 'TH',
+              'friday': 'FR', 'saturday': 'SA', 'sunday': 'SU'}
+
+
+def recurrence_until(end_date):
+    """
+    RRULE UNTIL for the last second of end_date in the class timezone. Google
+    wants UNTIL in UTC when the start has a timezone, so the local end of day
+    is converted rather than written as 23:59:59Z.
+    """
+    local_end = datetime.combine(end_date, time(23, 59, 59), tzinfo=ZoneInfo(CLASS_TIMEZONE))
+    return local_end.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def build_class_event(tutoring_class, day, student_names=()):
+    """
+    Event body for the weekly meeting of a class on one weekday, or None when
+    that day has no time set or no meeting falls within the class dates.
+    """
+    day = day.lower()
+    meeting_time = tutoring_class.get_time_for_day(day)
+    if meeting_time is None or day not in WEEKDAYS:
+        return None
+
+    start_date = tutoring_class.start_date
+    first_date = start_date + timedelta(days=(WEEKDAYS.index(day) - start_date.weekday()) % 7)
+    if first_date > tutoring_class.end_date:
+        return None
+
+    start = datetime.combine(first_date, meeting_time)
+    end = start + timedelta(minutes=tutoring_class.duration_minutes)
+    until = recurrence_until(tutoring_class.end_date)
+
+    description = tutoring_class.description or ""
+    if student_names:
+        description = f"Students: {', '.join(student_names)}\n\n{description}".strip()
+    if tutoring_class.location_link:
+        description = f"{description}\n\n{tutoring_class.location_link}".strip()
+
+    return {
+        "summary": f"EGS GROUP CLASS - {tutoring_class.title}",
+        "description": description,
+        "location": tutoring_class.location or "",
+        "start": {"dateTime": start.isoformat(), "timeZone": CLASS_TIMEZONE},
+        "end": {"dateTime": end.isoformat(), "timeZone": CLASS_TIMEZONE},
+        "recurrence": [f"RRULE:FREQ=WEEKLY;BYDAY={RRULE_DAYS[day]};UNTIL={until}"],
+        "extendedProperties": {
+            "shared": {"egs_group_class": str(tutoring_class.id)},
+        },
+    }
+
+
+def _encode_batch(operations, boundary):
+    parts = []
+    for index, op in enumerate(operations):
+        lines = [
+            f"--{boundary}",
+            "Content-Type: application/http",
+            f"Content-ID: <item-{index}>",
+            "",
+            f"{op['method']} {op['path']}",
+            f"Authorization: Bearer {op['token']}",
+        ]
+        if op.get('body') is not None:
+            lines += ["Content-Type: application/json", "", json.dumps(op['body'])]
+        else:
+            lines += [""]
+        parts.append("\r\n".join(lines))
+    return "\r\n".join(parts) + f"\r\n--{boundary}--\r\n"
+
+
+def _decode_batch(response):
+    """Return {operation index: (status code, parsed JSON body or None)}."""
+    content_type = response.headers.get("Content-Type", "")
+    boundary = content_type.split("boundary=")[-1].strip().strip('"')
+    results = {}
+
+    for part in response.text.split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+        lines = part.replace("\r\n", "\n").split("\n")
+
+        index = None
+        status_code = None
+        body_lines = []
+        in_body = False
+        for line in lines:
+            if in_body:
+                body_lines.append(line)
+            elif line.lower().startswith("content-id:"):
+                # Google answers with <response-item-N>
+                index = int(line.split("item-")[-1].rstrip(">").strip())
+            elif line.startswith("HTTP/"):
+                status_code = int(line.split()[1])
+            elif status_code is not None and line == "":
+                in_body = True
+
+        if index is None or status_code is None:
+            continue
+        body_text = "\n".join(body_lines).strip()
+        try:
+            body = json.loads(body_text) if body_text else None
+        except ValueError:
+            body = None
+        results[index] = (status_code, body)
+
+    return results
+
+
+def execute_batch(operations):
+    """
+    Run calendar operations through Google's batch endpoint, BATCH_LIMIT per
+    HTTP request. Each operation is a dict with method, path, token and an
+    optional body; parts carry their own Authorization header so calls for
+    different users' calendars can share one request.
+
+    Returns a list of (status code, body) in the order of operations.
+    """
+    results = []
+    for offset in range(0, len(operations), BATCH_LIMIT):
+        chunk = operations[offset:offset + BATCH_LIMIT]
+        boundary = f"batch_{uuid.uuid4().hex}"
+        try:
+            response = requests.post(
+                BATCH_URL,
+                headers={
+                    "Authorization": f"Bearer {chunk[0]['token']}",
+                    "Content-Type": f"multipart/mixed; boundary={boundary}",
+                },
+                data=_encode_batch(chunk, boundary).encode("utf-8"),
+                timeout=30,
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Google Calendar batch request failed: {e}")
+            results.extend([(None, None)] * len(chunk))
+            continue
+
+        if response.status_code != 200:
+            logger.error(f"Google Calendar batch error: {response.status_code} - {response.text[:500]}")
+            results.extend([(response.status_code, None)] * len(chunk))
+            continue
+
+        decoded = _decode_batch(response)
+        results.extend(decoded.get(index, (None, None)) for index in range(len(chunk)))
+    return results
+
+
+def publish_class_calendar(tutoring_class):
+    """
+    Make every enrolled family's Google Calendar match the class schedule:
+    one recurring event per meeting day, inserted the first time, patched
+    afterwards, and deleted when the day or the enrollment goes away.
+
+    Families without a usable Google connection are skipped.
+
+    Returns a dict of counts.
+    """
+    from playground.models import GroupEnrollment, GroupClassCalendarEvent
+
+    enrollments = (
+        GroupEnrollment.objects.filter(tutoring_class=tutoring_class, status='enrolled')
+        .select_related('parent', 'student')
+    )
+    families = {}
+    for enrollment in enrollments:
+        family = families.setdefault(enrollment.parent_id, {'parent': enrollment.parent, 'students': []})
+        family['students'].append(f"{enrollment.student.firstName} {enrollment.student.lastName}")
+
+    existing = {
+        (row.user_id, row.day): row
+        for row in GroupClassCalendarEvent.objects.filter(tutoring_class=tutoring_class)
+    }
+    days = [d.lower() for d in (tutoring_class.schedule_days or [])]
+
+    operations = []
+    skipped = 0
+    wanted = set()
+    tokens = {}
+    for parent_id, family in families.items():
+        parent = family['parent']
+        if not parent._encrypted_google_access_token:
+            skipped += 1
+            continue
+        token = google_token_manager.get_access_token(parent)
+        if not token or token == RECONNECT_GOOGLE:
+            skipped += 1
+            continue
+        tokens[parent_id] = token
+
+        for day in days:
+            body = build_class_event(tutoring_class, day, family['students'])
+            if body is None:
+                continue
+            wanted.add((parent_id, day))
+            row = existing.get((parent_id, day))
+            if row:
+                operations.append({'kind': 'patch', 'key': (parent_id, day), 'token': token, 'body': body,
+                                   'method': 'PATCH', 'path': f"{EVENTS_PATH}/{row.google_event_id}?sendUpdates=none"})
+            else:
+                operations.append({'kind': 'insert', 'key': (parent_id, day), 'token': token, 'body': body,
+                                   'method': 'POST', 'path': EVENTS_PATH})
+
+    for key, row in existing.items():
+        if key in wanted:
+            continue
+        token = tokens.get(row.user_id)
+        if token is None:
+            token = google_token_manager.get_access_token(row.user)
+            if not token or token == RECONNECT_GOOGLE:
+                continue
+        operations.append({'kind': 'delete', 'key': key, 'token': token,
+                           'method': 'DELETE', 'path': f"{EVENTS_PATH}/{row.google_event_id}?sendUpdates=none"})
+
+    counts = {'inserted': 0, 'patched': 0, 'deleted': 0, 'failed': 0, 'skipped_families': skipped}
+    if not operations:
+        return counts
+
+    for op, (status_code, body) in zip(operations, execute_batch(operations)):
+        parent_id, day = op['key']
+        if op['kind'] == 'insert' and status_code == 200 and body:
+            GroupClassCalendarEvent.objects.update_or_create(
+                tutoring_class=tutoring_class, user_id=parent_id, day=day,
+                defaults={'google_event_id': body['id'], 'etag': body.get('etag', '')},
+            )
+            counts['inserted'] += 1
+        elif op['kind'] == 'patch' and status_code == 200 and body:
+            existing[op['key']].etag = body.get('etag', '')
+            existing[op['key']].save(update_fields=['etag', 'updated_at'])
+            counts['patched'] += 1
+        elif op['kind'] == 'patch' and status_code in (404, 410):
+            # Removed from the calendar by the family; recreated on the next publish
+            existing[op['key']].delete()
+            counts['failed'] += 1
+        elif op['kind'] == 'delete' and status_code in (200, 204, 404, 410):
+            existing[op['key']].delete()
+            counts['deleted'] += 1
+        else:
+            logger.warning(f"Group class calendar {op['kind']} failed for class {tutoring_class.id}, user {parent_id}, {day}: {status_code}")
+            counts['failed'] += 1
+
+    logger.info(f"Published calendar for group class {tutoring_class.id}: {counts}")
+    return counts
+
+
+def delete_calendar_events(events):
+    """
+    Delete published class events that no longer have a class to publish
+    from, e.g. after the class itself was deleted. events is a list of
+    (user_id, google_event_id) pairs.
+
+    Returns a dict of counts.
+    """
+    from playground.models import User
+
+    users = User.objects.in_bulk({user_id for user_id, _ in events})
+    operations = []
+    counts = {'deleted': 0, 'failed': 0, 'skipped': 0}
+    tokens = {}
+    for user_id, event_id in events:
+        if user_id not in tokens:
+            user = users.get(user_id)
+            token = google_token_manager.get_access_token(user) if user else None
+            tokens[user_id] = token if token and token != RECONNECT_GOOGLE else None
+        if tokens[user_id] is None:
+            counts['skipped'] += 1
+            continue
+        operations.append({'token': tokens[user_id], 'method': 'DELETE',
+                           'path': f"{EVENTS_PATH}/{event_id}?sendUpdates=none"})
+
+    if not operations:
+        return counts
+
+    for op, (status_code, _) in zip(operations, execute_batch(operations)):
+        if status_code in (200, 204, 404, 410):
+            counts['deleted'] += 1
+        else:
+            logger.warning(f"Group class calendar delete failed for {op['path']}: {status_code}")
+            counts['failed'] += 1
+
+    logger.info(f"Deleted calendar events of a removed group class: {counts}")
+    return counts
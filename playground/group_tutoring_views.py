@@ -23,6 +23,14 @@ from .serializers import (
 )
 
 
+def queue_class_calendar_publish(class_id):
+    try:
+        from .tasks import publish_group_class_calendar_async
+        publish_group_class_calendar_async.delay(class_id)
+    except Exception as e:
+        print(f"Failed to queue calendar publish for class {class_id}: {e}")
+
+
 class GroupTutoringClassViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Group Tutoring Classes
@@ -304,6 +312,8 @@ EGS Tutoring Team
         enrollment.enrolled_at = timezone.now()
         enrollment.save()
 
+        queue_class_calendar_publish(enrollment.tutoring_class_id)
+
         serializer = self.get_serializer(enrollment)
         return Response(serializer.data)
 
@@ -1079,6 +1089,9 @@ def admin_update_class_schedule(request, class_id):
 
     tutoring_class.save()
 
+    # Patch the families' calendar events in place
+    queue_class_calendar_publish(tutoring_class.id)
+
     # Notify parents if requested
     notify_parents = request.data.get('notify_parents', False)
 
@@ -0,0 +1,202 @@
+# playground/hours_import.py
+import csv
+import io
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('tutor_id', 'student_id', 'date', 'start_time', 'end_time', 'total_time', 'location')
+CSV_COLUMNS = REQUIRED_FIELDS + ('subject', 'notes')
+
+
+def parse_hours_csv(upload):
+    """
+    Read an uploaded CSV (header row with the same keys as the JSON entries)
+    into a list of entry dicts. Raises ValueError if the file isn't UTF-8 CSV
+    or the header is missing a required column.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+    try:
+        missing = [column for column in REQUIRED_FIELDS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+        return [
+            {column: (row.get(column) or '').strip() for column in CSV_COLUMNS}
+            for row in reader
+        ]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(str(e))
+
+
+def _user_id(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _validate(entry):
+    """
+    Check one entry's fields in memory. Returns (parsed values, None) or
+    (None, error message).
+    """
+    if not isinstance(entry, dict):
+        return None, 'Entry must be an object'
+    if not all(entry.get(field) for field in REQUIRED_FIELDS):
+        return None, 'Missing required fields (tutor_id, student_id, date, start_time, end_time, total_time, location)'
+
+    try:
+        session_date = datetime.strptime(entry['date'], "%Y-%m-%d").date()
+        start_time = datetime.strptime(entry['start_time'], "%H:%M").time()
+        end_time = datetime.strptime(entry['end_time'], "%H:%M").time()
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid date/time format: {str(e)}'
+
+    try:
+        total_time = Decimal(str(entry['total_time']))
+    except (ValueError, InvalidOperation):
+        return None, 'Invalid total_time value'
+    if not total_time.is_finite() or total_time <= 0 or total_time > 8:
+        return None, 'Total time must be between 0 and 8 hours'
+
+    if entry['location'] not in ['Online', 'In-Person']:
+        return None, 'Location must be "Online" or "In-Person"'
+
+    return {
+        'tutor_id': _user_id(entry['tutor_id']),
+        'student_id': _user_id(entry['student_id']),
+        'date': session_date,
+        'startTime': start_time,
+        'endTime': end_time,
+        'totalTime': total_time,
+        'location': entry['location'],
+        'subject': entry.get('subject') or '',
+        'notes': entry.get('notes') or '',
+    }, None
+
+
+def import_hours(entries, current_week_start, dry_run=False):
+    """
+    Validate and insert a batch of admin-entered hours.
+
+    Every row is validated in memory first. All referenced users are then
+    loaded in one query, and existing sessions are matched in one
+    query over the batch's tutors and date span. The rows that pass are
+    inserted with bulk_create in batches of HOURS_IMPORT_BATCH_SIZE. Repeats
+    within the upload count as duplicates too. With dry_run nothing is
+    written and the report shows what would be created (hour_id is None).
+
+    bulk_create doesn't send post_save, so the Hours receivers are applied
+    here instead: mark_tutor_match_features_stale (per tutor, in the insert
+    transaction) and maybe_issue_referral_credit (per student, after commit).
+    Those are the only two Hours receivers (no realtime event is published
+    for Hours, so there is nothing to replay there); anything new added to
+    post_save for Hours has to be mirrored here too.
+
+    Hours dated in the week starting current_week_start are marked Eligible,
+    the rest Late. Returns the report dict with successful, failed,
+    total_submitted and dry_run.
+    """
+    from playground.models import Hours, User
+    from playground.tutor_ranking import mark_features_stale
+    from playground.views import issue_referral_credit
+
+    results = {
+        'successful': [],
+        'failed': [],
+        'total_submitted': len(entries),
+        'dry_run': dry_run,
+    }
+
+    def fail(idx, error):
+        results['failed'].append({'index': idx, 'entry': entries[idx], 'error': error})
+
+    parsed = []
+    for idx, entry in enumerate(entries):
+        values, error = _validate(entry)
+        if error:
+            fail(idx, error)
+        else:
+            parsed.append((idx, values))
+
+    user_ids = {values['tutor_id'] for _, values in parsed} | {values['student_id'] for _, values in parsed}
+    users = User.objects.only('id', 'roles', 'firstName', 'lastName', 'parent_id').in_bulk(user_ids - {None})
+
+    checked = []
+    for idx, values in parsed:
+        tutor = users.get(values['tutor_id'])
+        student = users.get(values['student_id'])
+        if tutor is None:
+            fail(idx, f"Tutor with id {entries[idx]['tutor_id']} not found")
+        elif tutor.roles != 'tutor':
+            fail(idx, f"User {entries[idx]['tutor_id']} is not a tutor")
+        elif student is None:
+            fail(idx, f"Student with id {entries[idx]['student_id']} not found")
+        elif not student.parent_id:
+            fail(idx, f"Student {entries[idx]['student_id']} has no parent associated")
+        else:
+            checked.append((idx, values, tutor, student))
+
+    taken = set()
+    if checked:
+        dates = [values['date'] for _, values, _, _ in checked]
+        taken = set(
+            Hours.objects.filter(
+                tutor_id__in={values['tutor_id'] for _, values, _, _ in checked},
+                date__range=(min(dates), max(dates)),
+            ).values_list('tutor_id', 'student_id', 'date', 'startTime', 'endTime')
+        )
+
+    current_week_end = current_week_start + timedelta(days=6)
+    to_create = []
+    students = {}
+    for idx, values, tutor, student in checked:
+        key = (values['tutor_id'], values['student_id'], values['date'], values['startTime'], values['endTime'])
+        if key in taken:
+            fail(idx, 'Hours already logged for this tutor, student, date, and time slot')
+            continue
+        taken.add(key)
+        eligible = "Eligible" if current_week_start <= values['date'] <= current_week_end else "Late"
+        hour = Hours(
+            parent_id=student.parent_id,
+            status='Accepted',  # Admin-added hours are auto-accepted
+            eligible=eligible,
+            **values,
+        )
+        to_create.append(hour)
+        students[student.id] = student
+        results['successful'].append({
+            'index': idx,
+            'hour_id': None,
+            'tutor': f"{tutor.firstName} {tutor.lastName}",
+            'student': f"{student.firstName} {student.lastName}",
+            'date': entries[idx]['date'],
+            'total_time': str(values['totalTime']),
+            'eligible': eligible,
+        })
+
+    results['failed'].sort(key=lambda item: item['index'])
+    if dry_run or not to_create:
+        return results
+
+    with transaction.atomic():
+        Hours.objects.bulk_create(to_create, batch_size=settings.HOURS_IMPORT_BATCH_SIZE)
+        # bulk_create skips post_save, so do what the Hours receivers would
+        mark_features_stale({hour.tutor_id for hour in to_create})
+    for item, hour in zip(results['successful'], to_create):
+        item['hour_id'] = hour.pk
+
+    # Referral credit (maybe_issue_referral_credit), once per student rather than per row
+    for student in students.values():
+        try:
+            issue_referral_credit(student)
+        except Exception as e:
+            logger.error(f"Referral credit check failed for student {student.id} after batch import: {e}")
+
+    logger.info(f"Admin batch import created {len(to_create)} hours, {len(results['failed'])} rows failed")
+    return results
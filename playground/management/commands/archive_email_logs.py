@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from playground.email_archive import archive_email_logs
+
+
+class Command(BaseCommand):
+    help = 'Move EmailLog rows older than the retention window into gzipped NDJSON archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.EMAIL_LOG_RETENTION_DAYS,
+            help='Archive rows older than this many days (default: EMAIL_LOG_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Archiving email logs older than {options['days']} days...")
+        result = archive_email_logs(retention_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['archived_rows']} rows into {result['archived_files']} files."
+        ))
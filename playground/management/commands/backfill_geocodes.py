@@ -0,0 +1,167 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from playground import geocode_cache
+from playground.city_centroids import city_centroid
+from playground.mapulus_service import MapulusGeocoder, address_hash, normalize_address
+from playground.models import User
+from playground.spatial_index import geohash_encode, invalidate_tutor_index
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rps seconds apart across all threads."""
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps if rps > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = (
+        'Geocode tutors and parents that have an address but no (or only approximate) coordinates. '
+        'Progress is committed per batch, so an interrupted run can simply be started again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent geocoding threads (default: 4)')
+        parser.add_argument('--rps', type=float, default=5.0, help='Max Mapulus API requests per second (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Users written per bulk_update (default: 200)')
+        parser.add_argument('--after-id', type=int, default=0, help='Only users with a higher id (resume point printed per batch)')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many users')
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry users whose current address already failed to geocode',
+        )
+
+    def handle(self, *args, **options):
+        users = (
+            User.objects.filter(roles__in=['tutor', 'parent'], id__gt=options['after_id'])
+            .filter(Q(latitude__isnull=True) | Q(location_is_approximate=True))
+            .exclude(Q(address='') | Q(city='') | Q(city='None'))
+            .order_by('id')
+            .only('id', 'address', 'city', 'latitude', 'longitude', 'geohash', 'geocoded_address', 'geocode_address_hash', 'location_is_approximate')
+        )
+        if options['limit']:
+            users = users[:options['limit']]
+
+        self.geocoder = MapulusGeocoder()
+        if not self.geocoder.api_key or self.geocoder.api_key == 'YOUR_MAPULUS_API_KEY_HERE':
+            self.stdout.write(self.style.WARNING('MAPULUS_API_KEY is not configured; only cached addresses will resolve.'))
+        self.limiter = RateLimiter(options['rps'])
+        self.totals = {'processed': 0, 'geocoded': 0, 'from_cache': 0, 'api_calls': 0, 'failed': 0, 'approximate': 0, 'skipped': 0}
+        failed_ids = []
+        started = time.monotonic()
+
+        batch = []
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for user in users.iterator(chunk_size=options['batch_size']):
+                current_hash = address_hash(user.address, user.city)
+                if not options['retry_failed'] and user.geocode_address_hash == current_hash:
+                    self.totals['skipped'] += 1
+                    continue
+                batch.append(user)
+                if len(batch) >= options['batch_size']:
+                    failed_ids += self.process_batch(pool, batch)
+                    batch = []
+            if batch:
+                failed_ids += self.process_batch(pool, batch)
+
+        # bulk_update skips the signal that would normally do this
+        invalidate_tutor_index()
+
+        elapsed = time.monotonic() - started
+        rate = self.totals['processed'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Processed {self.totals['processed']} users in {elapsed:.1f}s ({rate:.1f}/s): "
+            f"{self.totals['geocoded']} geocoded ({self.totals['from_cache']} from cache, "
+            f"{self.totals['api_calls']} API calls), {self.totals['failed']} failed "
+            f"({self.totals['approximate']} placed at their city centre), "
+            f"{self.totals['skipped']} skipped as previously failed."
+        )
+        if failed_ids:
+            shown = ', '.join(str(i) for i in failed_ids[:50])
+            more = f" (+{len(failed_ids) - 50} more)" if len(failed_ids) > 50 else ''
+            self.stdout.write(self.style.WARNING(f"Failed user ids: {shown}{more}"))
+        self.stdout.write(self.style.SUCCESS('Geocoding backfill complete.'))
+
+    def process_batch(self, pool, batch):
+        # Users at the same normalized address share one lookup
+        by_address = {}
+        for user in batch:
+            by_address.setdefault(normalize_address(user.address, user.city), []).append(user)
+
+        results = {}
+        misses = []
+        for key, group in by_address.items():
+            cached = geocode_cache.lookup(key)
+            if cached:
+                results[key] = cached
+                self.totals['from_cache'] += len(group)
+            else:
+                misses.append((key, group[0].address, group[0].city))
+
+        for key, result in zip([m[0] for m in misses], pool.map(self.geocode, misses)):
+            results[key] = result
+            self.totals['api_calls'] += 1
+
+        geocoded, failed = [], []
+        for key, group in by_address.items():
+            result = results.get(key)
+            for user in group:
+                user.geocode_address_hash = address_hash(user.address, user.city)
+                if result:
+                    self.place(user, result, approximate=False)
+                    geocoded.append(user)
+                else:
+                    # Keep users on the map at their city centre until a retry succeeds
+                    centroid = city_centroid(user.city)
+                    if centroid:
+                        self.place(user, centroid, approximate=True)
+                        self.totals['approximate'] += 1
+                    failed.append(user)
+
+        # bulk_update skips post_save, so this doesn't queue the geocode signal again
+        User.objects.bulk_update(
+            geocoded + failed,
+            ['latitude', 'longitude', 'geohash', 'geocoded_address', 'geocode_address_hash', 'location_is_approximate'],
+        )
+
+        self.totals['processed'] += len(batch)
+        self.totals['geocoded'] += len(geocoded)
+        self.totals['failed'] += len(failed)
+        self.stdout.write(
+            f"  {self.totals['processed']} processed, {self.totals['geocoded']} geocoded, "
+            f"{self.totals['failed']} failed (resume with --after-id {batch[-1].id})"
+        )
+        return [user.id for user in failed]
+
+    def place(self, user, result, approximate):
+        user.latitude = round(result['latitude'], 6)
+        user.longitude = round(result['longitude'], 6)
+        user.geocoded_address = (result['formatted_address'] or '')[:255]
+        user.location_is_approximate = approximate
+        user.geohash = geohash_encode(float(user.latitude), float(user.longitude))
+
+    def geocode(self, miss):
+        _key, address, city = miss
+        self.limiter.wait()
+        try:
+            return self.geocoder.geocode_address(address, city)
+        finally:
+            # Worker threads get their own DB connection through the geocode cache
+            connection.close()
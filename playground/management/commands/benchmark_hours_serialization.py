@@ -0,0 +1,72 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from playground.models import HourDispute, Hours, User
+from playground.serializers import HoursSerializer
+
+
+class Command(BaseCommand):
+    help = ('Time HoursSerializer against HoursSerializer.serialize_values on seeded hours and check the '
+            'rendered JSON is identical. Runs in a transaction that is rolled back, so nothing is kept.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Hours rows to seed (default: 10000)')
+        parser.add_argument('--users', type=int, default=200, help='Users to spread them over (default: 200)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._run(options['rows'], options['users'])
+            transaction.set_rollback(True)
+
+    def _run(self, row_count, user_count):
+        rng = random.Random(42)
+        users = User.objects.bulk_create([
+            User(username=f'bench_hours_{i}', email=f'bench_hours_{i}@example.com', roles=rng.choice(['parent', 'tutor', 'student']),
+                 firstName=f'First{i}', lastName=f'Last{i}')
+            for i in range(user_count)
+        ])
+        start = datetime.date.today() - datetime.timedelta(days=365)
+        hours = Hours.objects.bulk_create([
+            Hours(
+                student=rng.choice(users), parent=rng.choice(users), tutor=rng.choice(users),
+                date=start + datetime.timedelta(days=rng.randint(0, 364)),
+                startTime=datetime.time(rng.randint(8, 18), rng.choice([0, 30])), endTime=datetime.time(20, 0),
+                totalTime=Decimal(rng.randint(1, 12)) / 4, location=rng.choice(['Online', 'In-Person']),
+                subject='Math', notes='Benchmark row', eligible=rng.choice(['Eligible', 'Late']),
+                edit_history={'edits': []} if rng.random() < 0.1 else {},
+            )
+            for _ in range(row_count)
+        ])
+        viewer = users[0]
+        HourDispute.objects.bulk_create([
+            HourDispute(hour=hour, complainer=rng.choice([viewer, users[1]]), message='Benchmark dispute',
+                        status=rng.choice(['pending', 'resolved']))
+            for hour in rng.sample(hours, min(len(hours), row_count // 20))
+        ])
+
+        request = type('BenchmarkRequest', (), {'user': viewer})()
+        queryset = Hours.objects.filter(tutor__username__startswith='bench_hours_').order_by('-date', '-created_at')
+        eager = queryset.select_related('student', 'tutor', 'parent').prefetch_related('disputes')
+        context = {'request': request}
+
+        began = time.perf_counter()
+        slow = JSONRenderer().render(HoursSerializer(eager, many=True, context=context).data)
+        slow_seconds = time.perf_counter() - began
+
+        began = time.perf_counter()
+        fast = JSONRenderer().render(HoursSerializer.serialize_values(queryset, context=context))
+        fast_seconds = time.perf_counter() - began
+
+        if slow != fast:
+            raise CommandError('serialize_values output differs from HoursSerializer')
+        self.stdout.write(f"HoursSerializer (select/prefetch_related): {slow_seconds * 1000:.0f} ms")
+        self.stdout.write(f"serialize_values:                          {fast_seconds * 1000:.0f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"{row_count} rows, identical output, {slow_seconds / fast_seconds:.1f}x faster"
+        ))
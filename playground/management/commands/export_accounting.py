@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from playground.exports import EXPORT_FORMATS, EXPORTS, export_rows, stream_export
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Stream an accounting export (hours, monthly hours, payouts or invoices) as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help='Output format (default: csv)')
+        parser.add_argument('--from', dest='date_from', type=_date, help='First date to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=_date, help='Last date to include (YYYY-MM-DD)')
+        parser.add_argument('--user', type=int, help='Only rows involving this user id')
+        parser.add_argument('--role', help='Which of the user\'s roles to match, e.g. tutor')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            rows, columns = export_rows(
+                options['dataset'], date_from=options['date_from'], date_to=options['date_to'],
+                user_id=options['user'], role=options['role'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = stream_export(rows, columns, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(lines)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['dataset']} export to {options['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from playground.request_search import ensure_search_index
+
+
+class Command(BaseCommand):
+    help = ('Recreate any missing SQLite full-text search triggers for tutoring requests and reindex them. '
+            'PostgreSQL keeps its search column up to date itself, so nothing is done there.')
+
+    def handle(self, *args, **options):
+        restored = ensure_search_index(rebuild=True)
+        if restored:
+            self.stdout.write(self.style.WARNING(f"Recreated missing triggers: {', '.join(restored)}"))
+        self.stdout.write(self.style.SUCCESS("Request search index is up to date."))
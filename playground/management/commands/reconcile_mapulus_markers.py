@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from playground.mapulus_sync import reconcile_mapulus_markers
+
+
+class Command(BaseCommand):
+    help = ('Diff tutors and parents against the Mapulus layers and list the marker creates, updates and '
+            'deletes needed. Nothing is changed unless --apply is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help='Send the changes to Mapulus (default: dry run)')
+
+    def handle(self, *args, **options):
+        dry_run = not options['apply']
+        result = reconcile_mapulus_markers(dry_run=dry_run)
+        if result is None:
+            raise CommandError('Could not read the Mapulus layers')
+
+        if dry_run:
+            for kind, marker_id, user_id in result['operations']:
+                self.stdout.write(f"{kind:<7} marker={marker_id or '-'} user={user_id or '-'}")
+            self.stdout.write(self.style.WARNING(
+                f"Dry run, {result['remote_markers']} markers on the map. Planned: {result['planned']}. "
+                f"Re-run with --apply to make these changes."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Mapulus reconcile finished: {result}"))
@@ -1,10 +1,19 @@
 # playground/mapulus_service.py
+import hashlib
+import json
+import re
 import requests
 import logging
 from django.conf import settings
+from playground import geocode_cache
+from playground.city_centroids import city_centroid
+from playground.spatial_index import geohash_encode
 
 logger = logging.getLogger(__name__)
 
+# Returned by update_marker when the marker was deleted on the Mapulus side
+MARKER_NOT_FOUND = 'MARKER_NOT_FOUND'
+
 
 class MapulusGeocoder:
     """Service for geocoding addresses using Mapulus API"""
@@ -29,6 +38,12 @@ class MapulusGeocoder:
         Returns:
             dict with 'latitude', 'longitude', 'formatted_address' or None if failed
         """
+        # Shared buildings, streets and re-saves are answered without an API call
+        cache_key = normalize_address(address, city)
+        cached = geocode_cache.lookup(cache_key)
+        if cached:
+            return cached
+
         if not self.api_key or self.api_key == 'YOUR_MAPULUS_API_KEY_HERE':
             logger.error("Cannot geocode: Mapulus API key not configured")
             return None
@@ -56,11 +71,14 @@ class MapulusGeocoder:
                 result = data['results'][0]
                 location = result.get('geometry', {}).get('location', {})
 
-                return {
+                geocoded = {
                     'latitude': location.get('lat'),
                     'longitude': location.get('lng'),
                     'formatted_address': result.get('formatted_address', full_address)
                 }
+                if geocoded['latitude'] is not None and geocoded['longitude'] is not None:
+                    geocode_cache.store(cache_key, geocoded)
+                return geocoded
             else:
                 logger.warning(f"Mapulus geocoding failed for address: {full_address}. Status: {data.get('status')}")
                 return None
@@ -123,6 +141,86 @@ class MapulusGeocoder:
             logger.error(f"Unexpected error while adding marker: {e}")
             return None
 
+    def update_marker(self, marker_id, layer_name, latitude, longitude, title, description="", metadata=None):
+        """
+        Replace an existing marker's position and details
+
+        Args:
+            marker_id: Mapulus marker ID
+            layer_name, latitude, longitude, title, description, metadata:
+                as for add_marker_to_layer
+
+        Returns:
+            dict with marker info, MARKER_NOT_FOUND if the marker no longer exists,
+            or None if failed
+        """
+        if not self.api_key or self.api_key == 'YOUR_MAPULUS_API_KEY_HERE':
+            logger.error("Cannot update marker: Mapulus API key not configured")
+            return None
+
+        try:
+            url = f"{self.BASE_URL}/markers/{marker_id}"
+
+            payload = {
+                'api_key': self.api_key,
+                'layer': layer_name,
+                'latitude': latitude,
+                'longitude': longitude,
+                'title': title,
+                'description': description,
+                'metadata': metadata or {}
+            }
+
+            response = requests.put(url, json=payload, timeout=10)
+            if response.status_code == 404:
+                return MARKER_NOT_FOUND
+            response.raise_for_status()
+
+            data = response.json()
+
+            if data.get('status') == 'OK':
+                return data.get('marker') or {'id': marker_id}
+            else:
+                logger.warning(f"Failed to update marker {marker_id}: {data.get('message')}")
+                return None
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Mapulus API request failed while updating marker: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error while updating marker: {e}")
+            return None
+
+    def delete_marker(self, marker_id):
+        """
+        Remove a marker from the map
+
+        Args:
+            marker_id: Mapulus marker ID
+
+        Returns:
+            True if the marker is gone (including already deleted), False if failed
+        """
+        if not self.api_key or self.api_key == 'YOUR_MAPULUS_API_KEY_HERE':
+            logger.error("Cannot delete marker: Mapulus API key not configured")
+            return False
+
+        try:
+            url = f"{self.BASE_URL}/markers/{marker_id}"
+
+            response = requests.delete(url, params={'api_key': self.api_key}, timeout=10)
+            if response.status_code == 404:
+                return True
+            response.raise_for_status()
+            return True
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Mapulus API request failed while deleting marker: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error while deleting marker: {e}")
+            return False
+
     def get_layer_markers(self, layer_name):
         """
         Get all markers from a specific layer
@@ -131,11 +229,12 @@ class MapulusGeocoder:
             layer_name: Name of the layer
 
         Returns:
-            list of markers or empty list if failed
+            list of markers, or None if failed (so callers can tell a failed
+            request from an empty layer)
         """
         if not self.api_key or self.api_key == 'YOUR_MAPULUS_API_KEY_HERE':
             logger.error("Cannot get markers: Mapulus API key not configured")
-            return []
+            return None
 
         try:
             url = f"{self.BASE_URL}/markers"
@@ -154,73 +253,165 @@ class MapulusGeocoder:
                 return data.get('markers', [])
             else:
                 logger.warning(f"Failed to get markers from layer '{layer_name}': {data.get('message')}")
-                return []
+                return None
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Mapulus API request failed while getting markers: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Unexpected error while getting markers: {e}")
-            return []
+            return None
+
+
+STREET_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'road': 'rd', 'drive': 'dr', 'boulevard': 'blvd',
+    'crescent': 'cres', 'court': 'crt', 'place': 'pl', 'lane': 'ln', 'circle': 'cir',
+    'terrace': 'terr', 'parkway': 'pkwy', 'highway': 'hwy', 'square': 'sq', 'trail': 'trl',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+
+# "Apt 4", "unit 12B", "suite 200", "#5" anywhere in the street line
+UNIT_RE = re.compile(r"(?:\b(?:apt|apartment|unit|suite|ste)\b\.?|#)\s*[\w-]+")
+# Canadian "12-345 Main St" (unit 12 at number 345)
+UNIT_PREFIX_RE = re.compile(r"^\s*\w+\s*-\s*(\d+\b)")
+
+
+def normalize_address(address, city):
+    """
+    Canonical 'street, city' string used as the geocode cache key and for
+    change detection: lower-cased, unit numbers dropped, street types
+    abbreviated, punctuation and whitespace collapsed. Units share the
+    building's coordinates, so they are never worth a separate lookup.
+    """
+    street = (address or '').lower()
+    street = UNIT_RE.sub(" ", street)
+    street = UNIT_PREFIX_RE.sub(r"\1", street)
+    street = re.sub(r"[^\w\s]", " ", street)
+    street = " ".join(STREET_ABBREVIATIONS.get(word, word) for word in street.split())
+
+    city = " ".join(re.sub(r"[^\w\s]", " ", (city or '').lower()).split())
+    return f"{street}, {city}".strip(" ,")
+
+
+def address_hash(address, city):
+    return hashlib.sha1(normalize_address(address, city).encode()).hexdigest()
 
 
 # Convenience function
 def geocode_user_address(user):
-    """Geocode a user's address and update their coordinates"""
+    """
+    Geocode a user's address and update their coordinates.
+
+    If the geocoder fails or isn't configured, the city centroid is stored
+    instead and flagged location_is_approximate. The address hash is stored
+    either way, so an address the geocoder can't resolve isn't retried on
+    every save; the backfill command picks those users up again.
+
+    Returns True only for a precise geocode.
+    """
     if not user.address or not user.city:
         logger.warning(f"User {user.id} missing address or city, skipping geocoding")
         return False
 
     geocoder = MapulusGeocoder()
     result = geocoder.geocode_address(user.address, user.city)
+    user.geocode_address_hash = address_hash(user.address, user.city)
+    update_fields = ['latitude', 'longitude', 'geohash', 'geocoded_address', 'geocode_address_hash', 'location_is_approximate']
 
     if result:
         user.latitude = result['latitude']
         user.longitude = result['longitude']
         user.geocoded_address = result['formatted_address']
-        user.save(update_fields=['latitude', 'longitude', 'geocoded_address'])
+        user.location_is_approximate = False
+        user.geohash = geohash_encode(float(user.latitude), float(user.longitude))
+        user.save(update_fields=update_fields)
         logger.info(f"User {user.id} ({user.firstName} {user.lastName}) geocoded successfully")
         return True
+
+    centroid = city_centroid(user.city)
+    if centroid and (user.latitude is None or user.location_is_approximate):
+        user.latitude = centroid['latitude']
+        user.longitude = centroid['longitude']
+        user.geocoded_address = centroid['formatted_address']
+        user.location_is_approximate = True
+        user.geohash = geohash_encode(user.latitude, user.longitude)
+        user.save(update_fields=update_fields)
+        logger.warning(f"Failed to geocode user {user.id}, using {user.city} centroid")
     else:
+        user.save(update_fields=['geocode_address_hash'])
         logger.warning(f"Failed to geocode user {user.id}")
-        return False
+    return False
+
+
+MAPPED_LAYERS = {'tutor': 'tutors', 'parent': 'parents'}
+
+
+def marker_payload(user):
+    """
+    Marker fields for a user, or None when they shouldn't be on the map
+    (inactive, unmapped role, or no coordinates).
+    """
+    layer_name = MAPPED_LAYERS.get(user.roles)
+    if not layer_name or not user.is_active or user.latitude is None or user.longitude is None:
+        return None
+
+    return {
+        'layer_name': layer_name,
+        'latitude': round(float(user.latitude), 6),
+        'longitude': round(float(user.longitude), 6),
+        'title': f"{user.roles.capitalize()}: {user.firstName} {user.lastName}",
+        'description': f"{user.city} - {user.email}",
+        'metadata': {
+            'user_id': user.id,
+            'email': user.email,
+            'city': user.city,
+            'role': user.roles,
+            'approximate': user.location_is_approximate,
+        },
+    }
+
+
+def payload_hash(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
 
 
 def add_user_to_map(user):
-    """Add user marker to appropriate Mapulus layer based on role"""
-    if not user.latitude or not user.longitude:
-        logger.warning(f"User {user.id} has no coordinates, cannot add to map")
+    """
+    Create or update the user's marker on the appropriate Mapulus layer.
+
+    The marker ID is stored on the user, so later calls move the existing
+    pin instead of adding another one. Users who shouldn't be on the map
+    are left for the reconcile task to remove.
+    """
+    payload = marker_payload(user)
+    if payload is None:
+        logger.info(f"User {user.id} ({user.roles}) has no mappable location, skipping")
         return False
 
-    geocoder = MapulusGeocoder()
+    digest = payload_hash(payload)
+    if user.mapulus_marker_id and user.mapulus_marker_hash == digest:
+        return True
 
-    # Determine layer based on role
-    if user.roles == 'tutor':
-        layer_name = 'tutors'
-        title = f"Tutor: {user.firstName} {user.lastName}"
-    elif user.roles == 'parent':
-        layer_name = 'parents'
-        title = f"Parent: {user.firstName} {user.lastName}"
-    else:
-        logger.info(f"User {user.id} role '{user.roles}' not mapped, skipping")
+    geocoder = MapulusGeocoder()
+    result = None
+    if user.mapulus_marker_id:
+        result = geocoder.update_marker(user.mapulus_marker_id, **payload)
+        if result == MARKER_NOT_FOUND:
+            result = None
+            user.mapulus_marker_id = ''
+    if not user.mapulus_marker_id:
+        result = geocoder.add_marker_to_layer(**payload)
+        if result is not None:
+            user.mapulus_marker_id = str(result.get('id', ''))
+
+    if result is None:
         return False
 
-    metadata = {
-        'user_id': user.id,
-        'email': user.email,
-        'city': user.city,
-        'role': user.roles
-    }
-
-    description = f"{user.city} - {user.email}"
+    from playground.models import User
 
-    result = geocoder.add_marker_to_layer(
-        layer_name=layer_name,
-        latitude=float(user.latitude),
-        longitude=float(user.longitude),
-        title=title,
-        description=description,
-        metadata=metadata
+    user.mapulus_marker_hash = digest if user.mapulus_marker_id else ''
+    User.objects.filter(pk=user.pk).update(
+        mapulus_marker_id=user.mapulus_marker_id,
+        mapulus_marker_hash=user.mapulus_marker_hash,
     )
-
-    return result is not None
+    return True
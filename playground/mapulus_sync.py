@@ -0,0 +1,217 @@
+# playground/mapulus_sync.py
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+
+from playground.mapulus_service import (
+    MAPPED_LAYERS,
+    MARKER_NOT_FOUND,
+    MapulusGeocoder,
+    marker_payload,
+    payload_hash,
+)
+
+logger = logging.getLogger(__name__)
+
+MARKER_FIELDS = ['mapulus_marker_id', 'mapulus_marker_hash']
+
+
+def _marker_user_id(marker):
+    try:
+        return int((marker.get('metadata') or {}).get('user_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _same_position(marker, payload):
+    try:
+        return (
+            abs(float(marker.get('latitude')) - payload['latitude']) < 1e-6
+            and abs(float(marker.get('longitude')) - payload['longitude']) < 1e-6
+        )
+    except (TypeError, ValueError):
+        return False
+
+
+def plan_marker_sync(users, remote):
+    """
+    Diff local users against the markers on the map.
+
+    users: iterable of tutors/parents plus anyone still holding a marker ID.
+    remote: {marker id: (layer name, marker dict)} for every mapped layer.
+
+    Returns a list of operations, each a dict with kind ('create', 'update',
+    'delete', or 'forget' for a stored ID whose marker is already gone), the
+    user (None for orphaned markers), marker_id and payload.
+    A user's stored marker ID wins; otherwise an existing marker carrying
+    their user_id is adopted, so pins created before IDs were stored are
+    reused rather than duplicated. Unclaimed markers are only deleted when
+    their metadata carries an EGS user_id (a duplicate, or a user who is
+    gone or no longer mapped); pins placed by hand in Mapulus have none and
+    are left alone.
+    """
+    by_user = {}
+    for marker_id, (_layer, marker) in remote.items():
+        user_id = _marker_user_id(marker)
+        if user_id is not None:
+            by_user.setdefault(user_id, []).append(marker_id)
+
+    operations = []
+    claimed = set()
+    for user in users:
+        payload = marker_payload(user)
+        if payload is None:
+            if user.mapulus_marker_id:
+                if user.mapulus_marker_id in remote:
+                    claimed.add(user.mapulus_marker_id)
+                    operations.append({'kind': 'delete', 'user': user, 'marker_id': user.mapulus_marker_id, 'payload': None})
+                else:
+                    operations.append({'kind': 'forget', 'user': user, 'marker_id': user.mapulus_marker_id, 'payload': None})
+            continue
+
+        marker_id = user.mapulus_marker_id if user.mapulus_marker_id in remote else None
+        if marker_id is None:
+            candidates = [m for m in by_user.get(user.id, []) if m not in claimed]
+            marker_id = candidates[0] if candidates else None
+
+        if marker_id is not None and remote[marker_id][0] != payload['layer_name']:
+            # Role changed: the pin belongs on another layer
+            claimed.add(marker_id)
+            operations.append({'kind': 'delete', 'user': None, 'marker_id': marker_id, 'payload': None})
+            marker_id = None
+
+        if marker_id is None:
+            operations.append({'kind': 'create', 'user': user, 'marker_id': None, 'payload': payload})
+            continue
+
+        claimed.add(marker_id)
+        digest = payload_hash(payload)
+        if (marker_id != user.mapulus_marker_id or digest != user.mapulus_marker_hash
+                or not _same_position(remote[marker_id][1], payload)):
+            operations.append({'kind': 'update', 'user': user, 'marker_id': marker_id, 'payload': payload})
+
+    for marker_id, (_layer, marker) in remote.items():
+        if marker_id not in claimed and _marker_user_id(marker) is not None:
+            operations.append({'kind': 'delete', 'user': None, 'marker_id': marker_id, 'payload': None})
+
+    return operations
+
+
+def fetch_remote_markers(geocoder):
+    """{marker id: (layer, marker)} for every mapped layer, or None if any layer fails."""
+    remote = {}
+    for layer_name in MAPPED_LAYERS.values():
+        markers = geocoder.get_layer_markers(layer_name)
+        if markers is None:
+            return None
+        for marker in markers:
+            if marker.get('id') is not None:
+                remote[str(marker['id'])] = (layer_name, marker)
+    return remote
+
+
+def apply_marker_operations(geocoder, operations, batch_size):
+    """
+    Send the planned operations to Mapulus, batch_size at a time, saving the
+    resulting marker IDs and hashes with one bulk_update per batch so an
+    interrupted run keeps its progress.
+    """
+    from playground.models import User
+
+    counts = {'created': 0, 'updated': 0, 'deleted': 0, 'failed': 0}
+    for offset in range(0, len(operations), batch_size):
+        changed = []
+        for op in operations[offset:offset + batch_size]:
+            user = op['user']
+            if op['kind'] == 'forget':
+                user.mapulus_marker_id = ''
+                user.mapulus_marker_hash = ''
+                changed.append(user)
+                continue
+
+            if op['kind'] == 'delete':
+                if geocoder.delete_marker(op['marker_id']):
+                    counts['deleted'] += 1
+                    if user is not None:
+                        user.mapulus_marker_id = ''
+                        user.mapulus_marker_hash = ''
+                        changed.append(user)
+                else:
+                    counts['failed'] += 1
+                continue
+
+            result = None
+            if op['kind'] == 'update':
+                result = geocoder.update_marker(op['marker_id'], **op['payload'])
+                if result == MARKER_NOT_FOUND:
+                    result = None
+                    op['kind'] = 'create'
+                elif result is not None:
+                    user.mapulus_marker_id = op['marker_id']
+                    counts['updated'] += 1
+            if op['kind'] == 'create':
+                result = geocoder.add_marker_to_layer(**op['payload'])
+                if result is not None and result.get('id') is not None:
+                    user.mapulus_marker_id = str(result['id'])
+                    counts['created'] += 1
+                else:
+                    result = None
+
+            if result is None:
+                counts['failed'] += 1
+                continue
+            user.mapulus_marker_hash = payload_hash(op['payload'])
+            changed.append(user)
+
+        if changed:
+            User.objects.bulk_update(changed, MARKER_FIELDS)
+
+    return counts
+
+
+def reconcile_mapulus_markers(dry_run=False):
+    """
+    Bring the Mapulus tutor and parent layers in line with the database:
+    create missing pins, move changed ones, and delete duplicates and pins
+    of users who are inactive or gone. Markers without an EGS user_id are
+    never touched.
+
+    Returns a dict of counts, or None when the map couldn't be read. A dry
+    run also lists the planned operations as (kind, marker_id, user_id).
+    """
+    from playground.models import User
+
+    geocoder = MapulusGeocoder()
+    remote = fetch_remote_markers(geocoder)
+    if remote is None:
+        logger.warning("Skipping Mapulus reconcile: could not read the map layers")
+        return None
+
+    users = (
+        User.objects.filter(Q(roles__in=list(MAPPED_LAYERS)) | ~Q(mapulus_marker_id=''))
+        .only('id', 'roles', 'is_active', 'firstName', 'lastName', 'email', 'city',
+              'latitude', 'longitude', 'location_is_approximate', *MARKER_FIELDS)
+        .order_by('id')
+    )
+    operations = plan_marker_sync(users.iterator(chunk_size=500), remote)
+
+    planned = {'create': 0, 'update': 0, 'delete': 0, 'forget': 0}
+    for op in operations:
+        planned[op['kind']] += 1
+    if dry_run:
+        return {
+            'remote_markers': len(remote),
+            'planned': planned,
+            'operations': [
+                (op['kind'], op['marker_id'], op['user'].id if op['user'] else _marker_user_id(remote[op['marker_id']][1]))
+                for op in operations
+            ],
+        }
+    if not operations:
+        return {'remote_markers': len(remote), 'planned': planned}
+
+    counts = apply_marker_operations(geocoder, operations, settings.MAPULUS_SYNC_BATCH_SIZE)
+    counts['remote_markers'] = len(remote)
+    logger.info(f"Mapulus reconcile finished: {counts}")
+    return counts
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0047_user_birth_year_user_lives_with_parent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the archived rows belong to')),
+                ('file_path', models.CharField(help_text='Archive file path relative to MEDIA_ROOT', max_length=255, unique=True)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('first_sent_at', models.DateTimeField()),
+                ('last_sent_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-month', '-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['sent_at'], name='emaillog_sent_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['email_type', 'sent_at'], name='emaillog_type_sent_idx'),
+        ),
+    ]
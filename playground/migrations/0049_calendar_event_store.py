@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0048_emaillog_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sync_token', models.TextField(blank=True, help_text='nextSyncToken from the last completed sync')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_sync_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('google_event_id', models.CharField(max_length=1024)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('summary', models.CharField(blank=True, max_length=1024)),
+                ('start', models.DateTimeField(blank=True, help_text='Start time (all-day events use midnight UTC)', null=True)),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('google_updated', models.DateTimeField(blank=True, help_text="Google's last-modified time for the event", null=True)),
+                ('data', models.JSONField(default=dict, help_text='Full Google event resource as returned by events.list')),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['user', 'start'], name='calevent_user_start_idx')],
+                'unique_together': {('user', 'google_event_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0049_calendar_event_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupClassCalendarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(choices=[('monday', 'Monday'), ('tuesday', 'Tuesday'), ('wednesday', 'Wednesday'), ('thursday', 'Thursday'), ('friday', 'Friday'), ('saturday', 'Saturday'), ('sunday', 'Sunday')], max_length=10)),
+                ('google_event_id', models.CharField(max_length=1024)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tutoring_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_events', to='playground.grouptutoringclass')),
+                ('user', models.ForeignKey(help_text='Owner of the Google Calendar the event lives in', on_delete=django.db.models.deletion.CASCADE, related_name='group_class_calendar_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('tutoring_class', 'user', 'day')},
+            },
+        ),
+    ]
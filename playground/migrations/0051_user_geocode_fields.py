@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0050_group_class_calendar_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='geocode_address_hash',
+            field=models.CharField(blank=True, default='', help_text='Hash of the normalized address/city last geocoded', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='geocoded_address',
+            field=models.CharField(blank=True, help_text='Full geocoded address from Mapulus', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Geocoded latitude', max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Geocoded longitude', max_digits=9, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0052_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='location_is_approximate',
+            field=models.BooleanField(default=False, help_text='Coordinates are the city centroid, pending a precise geocode'),
+        ),
+    ]
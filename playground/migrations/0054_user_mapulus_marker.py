@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0053_user_location_is_approximate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='mapulus_marker_hash',
+            field=models.CharField(blank=True, default='', help_text='Hash of the marker payload last sent to Mapulus', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='mapulus_marker_id',
+            field=models.CharField(blank=True, default='', help_text="ID of this user's marker on the Mapulus map", max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+def fill_geohashes(apps, schema_editor):
+    """Compute geohashes for users geocoded before the field existed"""
+    from playground.spatial_index import geohash_encode
+
+    User = apps.get_model('playground', 'User')
+    users = list(User.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude'))
+    for user in users:
+        user.geohash = geohash_encode(float(user.latitude), float(user.longitude))
+    User.objects.bulk_update(users, ['geohash'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0054_user_mapulus_marker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Geohash of latitude/longitude, for radius queries', max_length=12),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
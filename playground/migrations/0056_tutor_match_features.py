@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0055_user_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorMatchFeatures',
+            fields=[
+                ('tutor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match_features', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('subject_hours', models.JSONField(blank=True, default=dict, help_text='Logged hours per subject keyword')),
+                ('grade_matches', models.JSONField(blank=True, default=list, help_text='Accepted matches per grade, in TutoringRequest.GRADE_CHOICES order')),
+                ('online_hours', models.FloatField(default=0)),
+                ('in_person_hours', models.FloatField(default=0)),
+                ('sessions', models.PositiveIntegerField(default=0, help_text='Logged (non-void) hours entries')),
+                ('active_students', models.PositiveIntegerField(default=0, help_text='AcceptedTutor rows still in Accepted status')),
+                ('disputes', models.PositiveIntegerField(default=0, help_text="Disputes on this tutor's hours that weren't dismissed")),
+                ('complaints', models.PositiveIntegerField(default=0)),
+                ('stale', models.BooleanField(db_index=True, default=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
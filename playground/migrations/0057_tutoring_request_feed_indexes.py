@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0056_tutor_match_features'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tutoringrequest',
+            index=models.Index(fields=['is_accepted', '-created_at', '-id'], name='request_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutoringrequest',
+            index=models.Index(fields=['city', 'is_accepted', '-created_at'], name='request_city_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutoringrequest',
+            index=models.Index(fields=['grade', 'is_accepted', '-created_at'], name='request_grade_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutoringrequest',
+            index=models.Index(fields=['service', 'is_accepted', '-created_at'], name='request_service_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Full-text search over TutoringRequest subject/description.
+# PostgreSQL: a generated, weighted tsvector column with a GIN index.
+# SQLite (dev): an external-content FTS5 table kept in sync by triggers.
+# Both are maintained by the database on every insert/update/delete.
+from django.db import migrations
+
+PG_FORWARD = [
+    """
+    ALTER TABLE playground_tutoringrequest
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(subject, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX request_search_vector_idx ON playground_tutoringrequest USING gin (search_vector)",
+]
+PG_REVERSE = [
+    "DROP INDEX IF EXISTS request_search_vector_idx",
+    "ALTER TABLE playground_tutoringrequest DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE playground_tutoringrequest_fts USING fts5(
+        subject, description,
+        content='playground_tutoringrequest', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER playground_tutoringrequest_fts_ai AFTER INSERT ON playground_tutoringrequest BEGIN
+        INSERT INTO playground_tutoringrequest_fts(rowid, subject, description)
+        VALUES (new.id, new.subject, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER playground_tutoringrequest_fts_ad AFTER DELETE ON playground_tutoringrequest BEGIN
+        INSERT INTO playground_tutoringrequest_fts(playground_tutoringrequest_fts, rowid, subject, description)
+        VALUES ('delete', old.id, old.subject, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER playground_tutoringrequest_fts_au AFTER UPDATE OF subject, description ON playground_tutoringrequest BEGIN
+        INSERT INTO playground_tutoringrequest_fts(playground_tutoringrequest_fts, rowid, subject, description)
+        VALUES ('delete', old.id, old.subject, old.description);
+        INSERT INTO playground_tutoringrequest_fts(rowid, subject, description)
+        VALUES (new.id, new.subject, new.description);
+    END
+    """,
+    "INSERT INTO playground_tutoringrequest_fts(playground_tutoringrequest_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS playground_tutoringrequest_fts_au",
+    "DROP TRIGGER IF EXISTS playground_tutoringrequest_fts_ad",
+    "DROP TRIGGER IF EXISTS playground_tutoringrequest_fts_ai",
+    "DROP TABLE IF EXISTS playground_tutoringrequest_fts",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0057_tutoring_request_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'postgresql': PG_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': PG_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
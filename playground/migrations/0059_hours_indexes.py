@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0058_tutoring_request_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hours',
+            index=models.Index(condition=models.Q(('invoice_status', 'pending')), fields=['date'], name='hours_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hours',
+            index=models.Index(condition=models.Q(('invoice_status', 'pending')), fields=['parent', 'date', 'startTime'], name='hours_parent_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hours',
+            index=models.Index(fields=['tutor', 'date', 'startTime'], name='hours_tutor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hours',
+            index=models.Index(fields=['-date', '-created_at', '-id'], name='hours_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hours',
+            index=models.Index(fields=['parent', '-created_at'], name='hours_parent_created_idx'),
+        ),
+    ]
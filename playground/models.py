@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
@@ -120,6 +121,27 @@ class User(AbstractUser):
     _encrypted_google_refresh_token = models.TextField(blank=True, null=True)
     google_token_expiry = models.DateTimeField(null=True, blank=True)
 
+    # Geocoding (filled asynchronously from address/city)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Geocoded latitude")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Geocoded longitude")
+    geocoded_address = models.CharField(max_length=255, blank=True, null=True, help_text="Full geocoded address from Mapulus")
+    geocode_address_hash = models.CharField(max_length=40, blank=True, default='', help_text="Hash of the normalized address/city last geocoded")
+    location_is_approximate = models.BooleanField(default=False, help_text="Coordinates are the city centroid, pending a precise geocode")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, help_text="Geohash of latitude/longitude, for radius queries")
+    mapulus_marker_id = models.CharField(max_length=64, blank=True, default='', help_text="ID of this user's marker on the Mapulus map")
+    mapulus_marker_hash = models.CharField(max_length=40, blank=True, default='', help_text="Hash of the marker payload last sent to Mapulus")
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Role audiences (tutor lists, bulk email, reminders) and the newest users per role
+            models.Index(fields=['roles', 'is_active'], name='user_roles_active_idx'),
+            models.Index(fields=['roles', '-date_joined'], name='user_roles_joined_idx'),
+            # A parent's students
+            models.Index(fields=['parent', 'roles'], name='user_parent_roles_idx'),
+            # email__iexact compiles to UPPER(email) on PostgreSQL, which this matches
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
+
     def _get_fernet(self):
         return Fernet(settings.FERNET_SECRET)
 
@@ -322,6 +344,15 @@ class TutoringRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_accepted = models.CharField(max_length=15, choices=ACCEPTED_CHOICES, default='Not Accepted')
 
+    class Meta:
+        indexes = [
+            # Request feed: open requests newest first, optionally narrowed by one filter
+            models.Index(fields=['is_accepted', '-created_at', '-id'], name='request_feed_idx'),
+            models.Index(fields=['city', 'is_accepted', '-created_at'], name='request_city_feed_idx'),
+            models.Index(fields=['grade', 'is_accepted', '-created_at'], name='request_grade_feed_idx'),
+            models.Index(fields=['service', 'is_accepted', '-created_at'], name='request_service_feed_idx'),
+        ]
+
 
 class TutorResponse(models.Model):
     request = models.ForeignKey(TutoringRequest, on_delete=models.CASCADE)
@@ -426,6 +457,21 @@ class Hours(models.Model):
     edit_history = models.JSONField(default=dict, blank=True)
     tutor_reply = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Billing: uninvoiced hours in a week, overall and per parent. Partial,
+            # so they stay the size of the unbilled backlog rather than all history
+            models.Index(fields=['date'], condition=models.Q(invoice_status='pending'), name='hours_pending_date_idx'),
+            models.Index(fields=['parent', 'date', 'startTime'], condition=models.Q(invoice_status='pending'),
+                         name='hours_parent_pending_date_idx'),
+            # Payouts and the duplicate-session check: a tutor's hours by date and start time
+            models.Index(fields=['tutor', 'date', 'startTime'], name='hours_tutor_date_idx'),
+            # Date-range scans (monthly payouts) and the admin listing's (date, created_at, id) keyset pages
+            models.Index(fields=['-date', '-created_at', '-id'], name='hours_date_idx'),
+            # A parent's hours, newest logged first
+            models.Index(fields=['parent', '-created_at'], name='hours_parent_created_idx'),
+        ]
+
 
 class WeeklyHours(models.Model):
     date = models.DateField()
@@ -900,6 +946,32 @@ class GroupEnrollment(models.Model):
         return f"{self.student.firstName} {self.student.lastName} - {self.tutoring_class.title} ({self.get_status_display()})"
 
 
+class GroupClassCalendarEvent(models.Model):
+    """
+    A recurring Google Calendar event published for one class meeting day into
+    one enrolled family's calendar, so schedule changes can be patched in place.
+    """
+    tutoring_class = models.ForeignKey(GroupTutoringClass, on_delete=models.CASCADE, related_name='calendar_events')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='group_class_calendar_events',
+        help_text="Owner of the Google Calendar the event lives in"
+    )
+    day = models.CharField(max_length=10, choices=GroupTutoringClass.DAYS_OF_WEEK_CHOICES)
+    google_event_id = models.CharField(max_length=1024)
+    etag = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('tutoring_class', 'user', 'day')
+
+    def __str__(self):
+        return f"{self.tutoring_class.title} ({self.day}) -> {self.user.email}"
+
+
 class DiagnosticTest(models.Model):
     """
     Stores diagnostic test questions for group tutoring classes
@@ -1190,6 +1262,128 @@ class EmailLog(models.Model):
 
     class Meta:
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['sent_at'], name='emaillog_sent_at_idx'),
+            models.Index(fields=['email_type', 'sent_at'], name='emaillog_type_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.email_type}] to {self.recipient_email} — {self.status} @ {self.sent_at:%Y-%m-%d %H:%M}"
+
+
+class EmailLogArchive(models.Model):
+    """
+    One gzipped NDJSON file of EmailLog rows moved out of the hot table by the
+    nightly retention job. All rows in a file belong to a single calendar month.
+    """
+    month = models.DateField(help_text="First day of the month the archived rows belong to")
+    file_path = models.CharField(max_length=255, unique=True, help_text="Archive file path relative to MEDIA_ROOT")
+    row_count = models.PositiveIntegerField(default=0)
+    first_sent_at = models.DateTimeField()
+    last_sent_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month', '-created_at']
+
+    def __str__(self):
+        return f"{self.file_path} ({self.row_count} rows)"
+
+# ============================================================================
+# Google Calendar Local Store
+# ============================================================================
+
+class CalendarEvent(models.Model):
+    """
+    Local copy of one EGS event instance from a user's primary Google Calendar,
+    kept current by incremental sync so event listings don't call Google.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_events'
+    )
+    google_event_id = models.CharField(max_length=1024)
+    status = models.CharField(max_length=20, blank=True)
+    summary = models.CharField(max_length=1024, blank=True)
+    start = models.DateTimeField(null=True, blank=True, help_text="Start time (all-day events use midnight UTC)")
+    end = models.DateTimeField(null=True, blank=True)
+    etag = models.CharField(max_length=255, blank=True)
+    google_updated = models.DateTimeField(null=True, blank=True, help_text="Google's last-modified time for the event")
+    data = models.JSONField(default=dict, help_text="Full Google event resource as returned by events.list")
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['start']
+        unique_together = ('user', 'google_event_id')
+        indexes = [
+            models.Index(fields=['user', 'start'], name='calevent_user_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.summary} @ {self.start} ({self.user_id})"
+
+
+class CalendarSyncState(models.Model):
+    """Per-user Google Calendar sync cursor."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_sync_state'
+    )
+    sync_token = models.TextField(blank=True, help_text="nextSyncToken from the last completed sync")
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Calendar sync for user {self.user_id} @ {self.last_synced_at}"
+
+
+# ============================================================================
+# Geocoding
+# ============================================================================
+
+class GeocodeCache(models.Model):
+    """Mapulus geocoding results keyed by normalized street address and city."""
+    normalized_address = models.CharField(max_length=255, unique=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    formatted_address = models.CharField(max_length=255, blank=True)
+    hit_count = models.PositiveIntegerField(default=0, help_text="Lookups answered from this row instead of the API")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.normalized_address} ({self.latitude}, {self.longitude})"
+
+
+# ============================================================================
+# Tutor matching
+# ============================================================================
+
+class TutorMatchFeatures(models.Model):
+    """
+    Per-tutor aggregates used to rank tutors for a request. Rows are marked
+    stale by signals when a tutor's hours, matches, disputes or complaints
+    change, and recomputed in the background.
+    """
+    tutor = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='match_features'
+    )
+    subject_hours = models.JSONField(default=dict, blank=True, help_text="Logged hours per subject keyword")
+    grade_matches = models.JSONField(default=list, blank=True, help_text="Accepted matches per grade, in TutoringRequest.GRADE_CHOICES order")
+    online_hours = models.FloatField(default=0)
+    in_person_hours = models.FloatField(default=0)
+    sessions = models.PositiveIntegerField(default=0, help_text="Logged (non-void) hours entries")
+    active_students = models.PositiveIntegerField(default=0, help_text="AcceptedTutor rows still in Accepted status")
+    disputes = models.PositiveIntegerField(default=0, help_text="Disputes on this tutor's hours that weren't dismissed")
+    complaints = models.PositiveIntegerField(default=0)
+    stale = models.BooleanField(default=True, db_index=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"[{self.email_type}] to {self.recipient_email} — {self.status} @ {self.sent_at:%Y-%m-%d %H:%M}"
\ No newline at end of file
+        return f"Match features for tutor {self.tutor_id}"
\ No newline at end of file
@@ -0,0 +1,93 @@
+# playground/pagination.py
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(value, pk):
+    """
+    Opaque cursor for the row after which the next page starts. value is the
+    row's sort value, or a tuple of them for a multi-field ordering; dates and
+    times are stored as isoformat, so already-serialized values work too.
+    """
+    values = value if isinstance(value, tuple) else (value,)
+    parts = [v if isinstance(v, str) else v.isoformat() for v in values]
+    raw = "|".join([*parts, str(pk)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(tuple of isoformat values, pk) from encode_cursor; raises ValueError if it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        *values, pk = raw.split("|")
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    # Out of range for a bigint primary key, which the database would reject
+    if not values or not 0 < pk < 2 ** 63:
+        raise ValueError("Invalid cursor")
+    return tuple(values), pk
+
+
+def page_size(params, default=DEFAULT_PAGE_SIZE):
+    """?limit= clamped to 1..MAX_PAGE_SIZE; raises ValueError if not a number."""
+    try:
+        limit = int(params.get("limit", default))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a number")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_queryset(queryset, cursor=None, field="created_at"):
+    """
+    queryset ordered by (field, id) descending, starting after the cursor.
+    field may be a tuple of fields, which are compared in order, then id.
+
+    Raises DRF ValidationError (a 400) if the cursor doesn't decode or its
+    values aren't valid for the fields, rather than letting the lookup fail.
+    """
+    fields = field if isinstance(field, tuple) else (field,)
+    queryset = queryset.order_by(*[f"-{name}" for name in fields], "-id")
+    if cursor:
+        try:
+            raw_values, pk = decode_cursor(cursor)
+            if len(raw_values) != len(fields):
+                raise ValueError("Invalid cursor")
+            values = [queryset.model._meta.get_field(name).to_python(raw) for name, raw in zip(fields, raw_values)]
+            if any(value is None for value in values):
+                raise ValueError("Invalid cursor")
+        except (DjangoValidationError, ValueError, TypeError, OverflowError):
+            raise ValidationError("invalid cursor")
+        # (f1, f2, .., id) < (v1, v2, .., pk), spelled out for the ORM
+        after = Q()
+        equal = {}
+        for name, value in zip(fields, values):
+            after |= Q(**equal, **{f"{name}__lt": value})
+            equal[name] = value
+        queryset = queryset.filter(after | Q(**equal, id__lt=pk))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, field="created_at"):
+    """
+    One page of queryset, newest first, ordered by (field, id) and resumed
+    after the cursor instead of with OFFSET, so deep pages cost the same as
+    the first and rows added meanwhile don't shift the pages.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    fields = field if isinstance(field, tuple) else (field,)
+    rows = list(keyset_queryset(queryset, cursor, field)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(tuple(getattr(last, name) for name in fields), last.pk)
+    return rows, next_cursor
@@ -0,0 +1,250 @@
+# playground/realtime.py
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+TICKET_SALT = 'playground.realtime.ticket'
+
+# Events waiting for a slow client beyond this are dropped, oldest first
+QUEUE_SIZE = 100
+
+# Redis channel names are namespaced so the broker can share a Redis with Celery
+REDIS_PREFIX = 'realtime:'
+REDIS_RECONNECT_SECONDS = 5
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def role_channel(role):
+    return f'role:{role}'
+
+
+def channels_for(user_id, roles, is_superuser=False):
+    channels = {user_channel(user_id), role_channel(roles)}
+    if is_superuser:
+        channels.add(role_channel('admin'))
+    return channels
+
+
+def _offer(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class Subscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    async def get(self, timeout):
+        """The next message, or None if nothing arrived within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """
+    Fans messages out to the subscriptions of this process. publish() may be
+    called from any thread (sync views, signal handlers); delivery hops onto
+    each subscriber's event loop.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def deliver(self, channels, message):
+        with self._lock:
+            targets = {s for channel in channels for s in self._subscribers.get(channel, ())}
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(_offer, subscription.queue, message)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                self.unsubscribe(subscription)
+
+    def publish(self, channels, message):
+        self.deliver(channels, message)
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Publishes through Redis so events raised in any process (other web
+    workers, Celery) reach every stream. Each process holds one pattern
+    subscription and fans messages out to its own streams locally.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._listener = None
+
+    def publish(self, channels, message):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        data = json.dumps(message)
+        with self._client.pipeline(transaction=False) as pipe:
+            for channel in channels:
+                pipe.publish(REDIS_PREFIX + channel, data)
+            pipe.execute()
+
+    def subscribe(self, channels):
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+        return super().subscribe(channels)
+
+    async def _listen(self):
+        import redis.asyncio
+
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(REDIS_PREFIX + '*')
+                async for item in pubsub.listen():
+                    if item['type'] != 'pmessage':
+                        continue
+                    channel = item['channel'].decode()[len(REDIS_PREFIX):]
+                    self.deliver([channel], json.loads(item['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Realtime Redis listener failed, reconnecting: {e}")
+                await asyncio.sleep(REDIS_RECONNECT_SECONDS)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = settings.REALTIME_REDIS_URL
+                if not url and not settings.DEBUG:
+                    logger.warning(
+                        "Realtime broker is in-process (REALTIME_REDIS_URL is not set): events raised "
+                        "by other processes, including every web worker and Celery, are dropped"
+                    )
+                _broker = RedisBroker(url) if url else InMemoryBroker()
+    return _broker
+
+
+def publish(channels, event, data):
+    """
+    Push an event to every stream subscribed to any of the channels. Never
+    raises: a notification failing must not fail the change it announces.
+    """
+    channels = sorted(set(channels))
+    if not channels:
+        return
+    try:
+        get_broker().publish(channels, {'event': event, 'data': data, 'ts': time.time()})
+    except Exception as e:
+        logger.error(f"Failed to publish realtime event {event} to {channels}: {e}")
+
+
+def publish_on_commit(channels, event, data):
+    """
+    publish() once the current transaction commits. channels may be a
+    callable, so any lookup it needs runs after the commit instead of in
+    the save that raised the event.
+    """
+    from django.db import transaction
+
+    def send():
+        try:
+            resolved = channels() if callable(channels) else channels
+        except Exception as e:
+            logger.error(f"Failed to resolve channels for realtime event {event}: {e}")
+            return
+        publish(resolved, event, data)
+
+    transaction.on_commit(send)
+
+
+def issue_ticket(user):
+    return signing.dumps({'user_id': user.id}, salt=TICKET_SALT)
+
+
+def read_ticket(ticket):
+    """The user ID in a ticket from issue_ticket, or None if invalid or expired."""
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.REALTIME_TICKET_MAX_AGE_SECONDS)
+        return int(data['user_id'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def format_sse(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+async def event_stream(channels, still_allowed=None):
+    """
+    Server-Sent Events for the channels: a reconnect hint, then each event as
+    it is published, with a comment line every REALTIME_HEARTBEAT_SECONDS so
+    proxies keep the idle connection open. Ends after
+    REALTIME_STREAM_MAX_SECONDS; the client reconnects with a fresh ticket.
+
+    still_allowed, an async callable, is awaited once per heartbeat interval;
+    the stream ends as soon as it returns False, e.g. when the user has been
+    deactivated.
+    """
+    subscription = get_broker().subscribe(channels)
+    heartbeat = settings.REALTIME_HEARTBEAT_SECONDS
+    deadline = time.monotonic() + settings.REALTIME_STREAM_MAX_SECONDS
+    next_check = time.monotonic() + heartbeat
+    try:
+        yield f"retry: {settings.REALTIME_RETRY_MS}\n: connected\n\n"
+        while time.monotonic() < deadline:
+            message = await subscription.get(heartbeat)
+            if still_allowed is not None and time.monotonic() >= next_check:
+                if not await still_allowed():
+                    return
+                next_check = time.monotonic() + heartbeat
+            yield format_sse(message) if message is not None else ": ping\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,100 @@
+# playground/request_search.py
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Built by migration 0058. On SQLite a later migration that rebuilds
+# playground_tutoringrequest drops its triggers; ensure_search_index puts them
+# back after every migrate (and the rebuild_request_search command on demand).
+FTS_TABLE = 'playground_tutoringrequest_fts'
+SEARCH_MIGRATION = 'playground.migrations.0058_tutoring_request_search'
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Subject matches count this many times more than description matches on SQLite
+# (PostgreSQL gets the same effect from the A/B weights on the tsvector)
+SUBJECT_WEIGHT = 10.0
+
+
+def search_terms(text):
+    return WORD_RE.findall((text or '').lower())[:20]
+
+
+def search_requests(queryset, text):
+    """
+    Narrow a TutoringRequest queryset to rows matching every word of `text`
+    in subject or description, annotated with search_rank (higher is
+    better). Uses the tsvector/GIN column on PostgreSQL, the FTS5 table on
+    SQLite, and a plain icontains scan elsewhere.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        # websearch_to_tsquery also understands "quoted phrases", OR and -excluded words
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return queryset.alias(
+            search_match=RawSQL(f'"playground_tutoringrequest"."search_vector" @@ {tsquery}', [text],
+                                output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(f'ts_rank_cd("playground_tutoringrequest"."search_vector", {tsquery})', [text],
+                               output_field=FloatField()),
+        )
+
+    if vendor == 'sqlite':
+        # Each word quoted, so user input can't inject FTS5 operators; the last
+        # one also matches as a prefix to support search-as-you-type
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        # MATCH narrows to the matching ids once; the rank is then looked up by
+        # rowid, which FTS5 answers directly for each remaining row
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]),
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {SUBJECT_WEIGHT}, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "playground_tutoringrequest"."id"',
+                [match], output_field=FloatField(),
+            ),
+        )
+
+    for term in terms:
+        queryset = queryset.filter(Q(subject__icontains=term) | Q(description__icontains=term))
+    return queryset.annotate(search_rank=Value(1.0, output_field=FloatField()))
+
+
+def ensure_search_index(rebuild=False, using='default'):
+    """
+    On SQLite, recreate any of the FTS5 sync triggers that a table rebuild
+    dropped and, if one was missing or rebuild is set, reindex every request.
+    Does nothing elsewhere or before migration 0058 has run. Returns the
+    names of the triggers that were recreated.
+    """
+    import importlib
+
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND name LIKE %s)",
+            [FTS_TABLE, f'{FTS_TABLE}_%'],
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            return []
+
+        missing = []
+        for sql in importlib.import_module(SEARCH_MIGRATION).SQLITE_FORWARD:
+            match = re.search(r'CREATE TRIGGER (\w+)', sql)
+            if match and match.group(1) not in existing:
+                cursor.execute(sql)
+                missing.append(match.group(1))
+        if missing or rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return missing
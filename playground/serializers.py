@@ -7,6 +7,7 @@ from rest_framework import serializers
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError  # Useful for validating form/models/serializer data
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import TutoringRequest  # Import the Request model from models.py
 from .models import (
     TutorResponse, AcceptedTutor, Hours, WeeklyHours, Announcements, UserDocument,
@@ -69,7 +70,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         except DjangoValidationError:
             raise serializers.ValidationError({"email": "Invalid e-mail format."})
 
-        if roles in ("parent", "tutor") and User.objects.filter(email=email).exists():
+        if roles in ("parent", "tutor") and User.objects.filter(email__iexact=email).exists():
             raise serializers.ValidationError({"email": "E-mail already in use."})
 
         # For student: cross-check that the parent username's e-mail matches
@@ -176,7 +177,7 @@ class UserSerializer(serializers.ModelSerializer):
         except DjangoValidationError:
             raise serializers.ValidationError({"email": "Invalid e-mail format."})
 
-        if roles in ("parent", "tutor") and User.objects.filter(email=email).exists():
+        if roles in ("parent", "tutor") and User.objects.filter(email__iexact=email).exists():
             raise serializers.ValidationError({"email": "E-mail already in use."})
 
         # For student: cross-check that the parent username's e-mail matches
@@ -244,35 +245,61 @@ class RequestSerializer(serializers.ModelSerializer):
     student_firstName = serializers.CharField(source='student.firstName', read_only=True)
     student_lastName = serializers.CharField(source='student.lastName', read_only=True)
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything the serializer reads in a fixed number of queries:
+        parent and student joined in, accepted tutors (with the tutor) and
+        non-rejected replies prefetched.
+        """
+        return queryset.select_related('parent', 'student').prefetch_related(
+            Prefetch(
+                'accepted_tutorsRequest',
+                queryset=AcceptedTutor.objects.select_related('tutor').order_by('-accepted_at', '-id'),
+                to_attr='prefetched_accepted_tutors',
+            ),
+            Prefetch(
+                'tutorresponse_set',
+                queryset=TutorResponse.objects.filter(rejected=False).order_by('id'),
+                to_attr='prefetched_replies',
+            ),
+        )
+
+    def _accepted_tutor(self, obj):
+        """The request's AcceptedTutor (the latest one if there are several), or None"""
+        if not hasattr(obj, 'prefetched_accepted_tutors'):
+            # Querysets that skipped setup_eager_loading still work, just per row
+            obj.prefetched_accepted_tutors = list(
+                AcceptedTutor.objects.filter(request=obj).select_related('tutor').order_by('-accepted_at', '-id')[:1]
+            )
+        return obj.prefetched_accepted_tutors[0] if obj.prefetched_accepted_tutors else None
+
     def get_accepted_tutor_id(self, obj):
         """Get the ID of the accepted tutor for this request"""
-        try:
-            accepted_tutor = AcceptedTutor.objects.get(request=obj)
-            return accepted_tutor.tutor.id
-        except AcceptedTutor.DoesNotExist:
-            return None
+        accepted_tutor = self._accepted_tutor(obj)
+        return accepted_tutor.tutor_id if accepted_tutor else None
 
     def get_accepted_tutor_name(self, obj):
         """Get the name of the accepted tutor for this request"""
-        try:
-            accepted_tutor = AcceptedTutor.objects.get(request=obj)
-            return f"{accepted_tutor.tutor.firstName} {accepted_tutor.tutor.lastName}"
-        except AcceptedTutor.DoesNotExist:
+        accepted_tutor = self._accepted_tutor(obj)
+        if accepted_tutor is None:
             return None
+        return f"{accepted_tutor.tutor.firstName} {accepted_tutor.tutor.lastName}"
 
     def get_accepted_tutor_message(self, obj):
         """Get the message from the accepted tutor"""
-        try:
-            accepted_tutor = AcceptedTutor.objects.get(request=obj)
-            # Get the tutor's response for this request
-            tutor_response = TutorResponse.objects.filter(
-                request=obj,
-                tutor=accepted_tutor.tutor,
-                rejected=False
-            ).first()
-            return tutor_response.message if tutor_response else None
-        except AcceptedTutor.DoesNotExist:
+        accepted_tutor = self._accepted_tutor(obj)
+        if accepted_tutor is None:
             return None
+        if hasattr(obj, 'prefetched_replies'):
+            replies = [r for r in obj.prefetched_replies if r.tutor_id == accepted_tutor.tutor_id]
+            return replies[0].message if replies else None
+        tutor_response = TutorResponse.objects.filter(
+            request=obj,
+            tutor=accepted_tutor.tutor,
+            rejected=False
+        ).first()
+        return tutor_response.message if tutor_response else None
 
     def get_student_details(self, obj):
         """Get the student details with firstName and lastName"""
@@ -298,6 +325,23 @@ class RequestSerializer(serializers.ModelSerializer):
         def create(self, validated_data):
             return TutoringRequest.objects.create(**validated_data)
         
+class RequestListItemSerializer(serializers.ModelSerializer):
+    """Compact request for the paginated feed; the full record is at requests/<id>/"""
+    description_preview = serializers.SerializerMethodField()
+
+    PREVIEW_LENGTH = 140
+
+    def get_description_preview(self, obj):
+        description = obj.description or ''
+        if len(description) <= self.PREVIEW_LENGTH:
+            return description
+        return description[:self.PREVIEW_LENGTH].rsplit(' ', 1)[0] + '…'
+
+    class Meta:
+        model = TutoringRequest
+        fields = ['id', 'parent', 'student', 'subject', 'grade', 'service', 'city', 'is_accepted', 'created_at', 'description_preview']
+
+
 class RequestReplySerializer(serializers.ModelSerializer):
     # Client posts IDs; DRF resolves them to instances.
     request = serializers.PrimaryKeyRelatedField(queryset=TutoringRequest.objects.all())
@@ -382,6 +426,66 @@ class HoursSerializer(serializers.ModelSerializer):
             "notes": {"required": True},
         }
     
+    # .values() column behind each output field, where it isn't the field name
+    VALUE_COLUMNS = {
+        'student': 'student_id',
+        'parent': 'parent_id',
+        'tutor': 'tutor_id',
+        'student_firstName': 'student__firstName',
+        'student_lastName': 'student__lastName',
+        'student_username': 'student__username',
+        'tutor_firstName': 'tutor__firstName',
+        'tutor_lastName': 'tutor__lastName',
+        'parent_firstName': 'parent__firstName',
+        'parent_lastName': 'parent__lastName',
+    }
+    RELATED_ID_FIELDS = {'student', 'parent', 'tutor'}
+    DISPUTE_CHUNK = 1000
+
+    @classmethod
+    def serialize_values(cls, queryset, context=None):
+        """
+        Read-only equivalent of HoursSerializer(queryset, many=True).data for
+        large listings: one .values() query with the user names joined in,
+        plus one query per DISPUTE_CHUNK rows for their pending disputes,
+        instead of model instances that each load three users and their
+        disputes. Values go through the serializer's own fields, so the
+        rendered output is identical.
+        """
+        context = context or {}
+        fields = cls(context=context).fields
+        names = [name for name in cls.Meta.fields if name not in ('has_disputes', 'dispute_id')]
+        columns = [cls.VALUE_COLUMNS.get(name, name) for name in names]
+        rows = list(queryset.values(*columns))
+
+        request = context.get('request')
+        user_id = request.user.id if request and request.user.is_authenticated else None
+        disputed, own_dispute = set(), {}
+        hour_ids = [row['id'] for row in rows]
+        for offset in range(0, len(hour_ids), cls.DISPUTE_CHUNK):
+            pending = (
+                HourDispute.objects.filter(hour_id__in=hour_ids[offset:offset + cls.DISPUTE_CHUNK], status='pending')
+                .order_by('-created_at').values_list('hour_id', 'complainer_id', 'id')
+            )
+            for hour_id, complainer_id, dispute_id in pending:
+                disputed.add(hour_id)
+                if complainer_id == user_id:
+                    own_dispute.setdefault(hour_id, dispute_id)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, column in zip(names, columns):
+                value = row[column]
+                if value is None or name in cls.RELATED_ID_FIELDS:
+                    item[name] = value
+                else:
+                    item[name] = fields[name].to_representation(value)
+            item['has_disputes'] = row['id'] in disputed
+            item['dispute_id'] = own_dispute.get(row['id'])
+            data.append(item)
+        return data
+
     def get_has_disputes(self, obj):
         return any(d.status == 'pending' for d in obj.disputes.all())
 
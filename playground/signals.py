@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.core.mail import EmailMultiAlternatives
@@ -6,6 +6,8 @@ from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from playground.email_utils import send_mailgun_email
 import logging
 import random
@@ -75,11 +77,11 @@ def generate_tutor_referral_code(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def geocode_and_map_user(sender, instance, created, **kwargs):
+def geocode_and_map_user(sender, instance, created, update_fields=None, **kwargs):
     """
-    Automatically geocode user address and add pin to Mapulus map
-    - On creation: geocode if tutor/parent with address
-    - On update: regeocode if address/city changed
+    Queue geocoding and a Mapulus pin update for tutors and parents whose
+    address or city changed since the last geocode. The HTTP calls run in
+    a Celery task, never in the request that saved the user.
     """
     # Only process tutors and parents
     if instance.roles not in ['tutor', 'parent']:
@@ -89,38 +91,197 @@ def geocode_and_map_user(sender, instance, created, **kwargs):
     if not instance.address or not instance.city:
         return
 
+    # Partial saves that don't touch the address can't change it
+    if update_fields is not None and not {'address', 'city'} & set(update_fields):
+        return
+
     try:
-        from playground.mapulus_service import geocode_user_address, add_user_to_map
+        from playground.city_centroids import city_centroid
+        from playground.spatial_index import geohash_encode, invalidate_tutor_index
+        from playground.mapulus_service import address_hash
+
+        new_hash = address_hash(instance.address, instance.city)
+        if new_hash == instance.geocode_address_hash:
+            return
 
-        needs_geocoding = False
+        # One job per user and address, however many times it is saved meanwhile
+        pending_key = f"geocode_pending:{instance.id}:{new_hash}"
+        if not cache.add(pending_key, True, 10 * 60):
+            return
 
         if created:
-            # New user
-            needs_geocoding = True
             logger.info(f"New {instance.roles} created: {instance.firstName} {instance.lastName}. Will geocode and map.")
         else:
-            # Check if address or city changed (requires django-model-utils)
+            logger.info(f"{instance.roles.capitalize()} {instance.id} address changed. Will regeocode.")
+
+        # Place the user at their city centre right away; the precise geocode
+        # below replaces it. update() skips post_save, so this doesn't recurse.
+        centroid = city_centroid(instance.city)
+        if centroid:
+            instance.latitude = centroid['latitude']
+            instance.longitude = centroid['longitude']
+            instance.geocoded_address = centroid['formatted_address']
+            instance.location_is_approximate = True
+            instance.geohash = geohash_encode(instance.latitude, instance.longitude)
+            User.objects.filter(pk=instance.pk).update(
+                latitude=instance.latitude,
+                longitude=instance.longitude,
+                geohash=instance.geohash,
+                geocoded_address=instance.geocoded_address,
+                location_is_approximate=True,
+            )
+            if instance.roles == 'tutor':
+                invalidate_tutor_index()
+
+        def enqueue(user_id=instance.id, expected_hash=new_hash):
             try:
-                from model_utils import FieldTracker
-                if hasattr(instance, 'tracker'):
-                    if instance.tracker.has_changed('address') or instance.tracker.has_changed('city'):
-                        needs_geocoding = True
-                        logger.info(f"{instance.roles.capitalize()} {instance.id} address changed. Will regeocode.")
-            except:
-                # If model_utils not available, always regeocode on save
-                if instance.latitude is None or instance.longitude is None:
-                    needs_geocoding = True
-
-        if needs_geocoding:
-            # Geocode the address
-            success = geocode_user_address(instance)
-
-            if success:
-                # Add/update marker on Mapulus map
-                add_user_to_map(instance)
-                logger.info(f"Successfully geocoded and mapped {instance.roles} {instance.id}")
-            else:
-                logger.warning(f"Failed to geocode {instance.roles} {instance.id}")
+                from playground.tasks import geocode_user_async
+                geocode_user_async.delay(user_id, expected_hash)
+            except Exception as e:
+                cache.delete(pending_key)
+                logger.error(f"Failed to queue geocoding for user {user_id}: {e}")
+
+        transaction.on_commit(enqueue)
 
     except Exception as e:
-        logger.error(f"Error geocoding/mapping user {instance.id}: {e}")
\ No newline at end of file
+        logger.error(f"Error geocoding/mapping user {instance.id}: {e}")
+
+
+TUTOR_INDEX_FIELDS = {'roles', 'is_active', 'latitude', 'longitude', 'location_is_approximate'}
+
+
+@receiver(post_save, sender=User)
+def refresh_tutor_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """Tell every process to rebuild the in-memory tutor spatial index."""
+    if instance.roles != 'tutor':
+        return
+    if update_fields is not None and not TUTOR_INDEX_FIELDS & set(update_fields):
+        return
+    from playground.spatial_index import invalidate_tutor_index
+    invalidate_tutor_index()
+
+
+def _mark_match_features_stale(tutor_id):
+    from playground.tutor_ranking import mark_features_stale
+    mark_features_stale([tutor_id])
+
+
+@receiver([post_save, post_delete], sender='playground.Hours')
+@receiver([post_save, post_delete], sender='playground.AcceptedTutor')
+@receiver([post_save, post_delete], sender='playground.TutorComplaint')
+def mark_tutor_match_features_stale(sender, instance, **kwargs):
+    """Queue the tutor's ranking features for the next background refresh."""
+    _mark_match_features_stale(instance.tutor_id)
+
+
+@receiver([post_save, post_delete], sender='playground.HourDispute')
+def mark_disputed_tutor_match_features_stale(sender, instance, **kwargs):
+    from playground.models import Hours
+    tutor_id = Hours.objects.filter(pk=instance.hour_id).values_list('tutor_id', flat=True).first()
+    if tutor_id:
+        _mark_match_features_stale(tutor_id)
+
+# Realtime events. Payloads only identify what changed; clients refetch the
+# matching list endpoint rather than trusting the event for the full record.
+@receiver([post_save, post_delete], sender='playground.TutoringRequest')
+def publish_request_event(sender, instance, created=False, **kwargs):
+    from playground.realtime import publish_on_commit, role_channel, user_channel
+    action = 'deleted' if kwargs['signal'] is post_delete else 'created' if created else 'updated'
+    publish_on_commit(
+        [role_channel('tutor'), role_channel('admin'), user_channel(instance.parent_id)],
+        f'request.{action}',
+        {'id': instance.id, 'subject': instance.subject, 'grade': instance.grade, 'city': instance.city,
+         'service': instance.service, 'is_accepted': instance.is_accepted},
+    )
+
+
+@receiver(post_save, sender='playground.TutorResponse')
+def publish_reply_event(sender, instance, created, **kwargs):
+    from playground.realtime import publish_on_commit, role_channel, user_channel
+    # instance.request is normally cached by the caller; if not, it loads after commit
+    publish_on_commit(
+        lambda: [role_channel('admin'), user_channel(instance.request.parent_id), user_channel(instance.tutor_id)],
+        'reply.created' if created else 'reply.updated',
+        {'id': instance.id, 'request_id': instance.request_id, 'tutor_id': instance.tutor_id,
+         'rejected': instance.rejected},
+    )
+
+
+@receiver([post_save, post_delete], sender='playground.AcceptedTutor')
+def publish_match_event(sender, instance, created=False, **kwargs):
+    from playground.realtime import publish_on_commit, role_channel, user_channel
+    action = 'deleted' if kwargs['signal'] is post_delete else 'created' if created else 'updated'
+    publish_on_commit(
+        [role_channel('admin'), user_channel(instance.tutor_id), user_channel(instance.parent_id),
+         user_channel(instance.student_id)],
+        f'match.{action}',
+        {'id': instance.id, 'request_id': instance.request_id, 'tutor_id': instance.tutor_id,
+         'status': instance.status},
+    )
+
+
+@receiver(post_save, sender='playground.HourDispute')
+def publish_dispute_event(sender, instance, created, **kwargs):
+    from playground.realtime import publish_on_commit, role_channel, user_channel
+
+    def channels():
+        # instance.hour is normally cached by the caller; if not, it loads after commit
+        hour = instance.hour
+        return [role_channel('admin'), user_channel(instance.complainer_id),
+                user_channel(hour.tutor_id), user_channel(hour.parent_id)]
+
+    publish_on_commit(
+        channels,
+        'dispute.created' if created else 'dispute.updated',
+        {'id': instance.id, 'hour_id': instance.hour_id, 'status': instance.status},
+    )
+
+
+# Group class calendars. publish_class_calendar only runs when an enrollment is
+# approved or the schedule changes, so leaving a class and deleting one are
+# handled here.
+def _queue_class_calendar_publish(class_id):
+    from playground.models import GroupTutoringClass
+    from playground.tasks import publish_group_class_calendar_async
+    # Enrollments cascade-deleted with their class have nothing left to publish
+    if not GroupTutoringClass.objects.filter(pk=class_id).exists():
+        return
+    try:
+        publish_group_class_calendar_async.delay(class_id)
+    except Exception as e:
+        logger.error(f"Failed to queue calendar publish for class {class_id}: {e}")
+
+
+@receiver([post_save, post_delete], sender='playground.GroupEnrollment')
+def unpublish_left_enrollment(sender, instance, **kwargs):
+    """Republish when a family with published events is rejected, withdrawn or removed."""
+    if kwargs['signal'] is post_save and instance.status == 'enrolled':
+        return
+    from playground.models import GroupClassCalendarEvent
+    published = GroupClassCalendarEvent.objects.filter(
+        tutoring_class_id=instance.tutoring_class_id, user_id=instance.parent_id,
+    ).exists()
+    if published:
+        class_id = instance.tutoring_class_id
+        transaction.on_commit(lambda: _queue_class_calendar_publish(class_id))
+
+
+@receiver(pre_delete, sender='playground.GroupTutoringClass')
+def delete_class_calendar_events(sender, instance, **kwargs):
+    """Collect the class's Google event ids before the rows cascade away."""
+    events = [
+        [user_id, event_id]
+        for user_id, event_id in instance.calendar_events.values_list('user_id', 'google_event_id')
+    ]
+    if not events:
+        return
+    class_id = instance.pk
+
+    def queue():
+        from playground.tasks import delete_group_class_calendar_events_async
+        try:
+            delete_group_class_calendar_events_async.delay(events)
+        except Exception as e:
+            logger.error(f"Failed to queue calendar cleanup for deleted class {class_id}: {e}")
+
+    transaction.on_commit(queue)
\ No newline at end of file
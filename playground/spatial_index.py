@@ -0,0 +1,269 @@
+# playground/spatial_index.py
+import heapq
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from playground.city_centroids import CITY_CENTROIDS, city_centroid
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Stored on User.geohash; 9 characters is a ~5 m cell
+GEOHASH_PRECISION = 9
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Radius queries against the DB use at most this many geohash prefixes
+MAX_COVERING_CELLS = 16
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell with this many characters."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_geohashes(latitude, longitude, radius_km, max_cells=MAX_COVERING_CELLS):
+    """
+    Geohash prefixes whose cells together cover the circle's bounding box,
+    at the finest precision that needs no more than max_cells of them.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlng = dlat / max(math.cos(math.radians(latitude)), 0.01)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    west, east = longitude - dlng, longitude + dlng
+
+    best = {geohash_encode(latitude, longitude, 1)}
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols > max_cells:
+            break
+        # Sample one point per cell row/column, plus the far edges
+        lats = [min(south + row * height, north) for row in range(rows)] + [north]
+        lngs = [min(west + col * width, east) for col in range(cols)] + [east]
+        cells = {
+            geohash_encode(lat, ((lng + 180.0) % 360.0) - 180.0, precision)
+            for lat in lats for lng in lngs
+        }
+        best = cells
+    return best
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _to_xyz(latitude, longitude):
+    phi, lmb = math.radians(latitude), math.radians(longitude)
+    return (math.cos(phi) * math.cos(lmb), math.cos(phi) * math.sin(lmb), math.sin(phi))
+
+
+def _km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class KDTree:
+    """
+    Static 3-d tree over points on the unit sphere. Straight-line (chord)
+    distance there orders points the same way as great-circle distance, so
+    no special handling is needed near the poles or the antimeridian.
+    """
+
+    def __init__(self, points):
+        """points: iterable of (key, latitude, longitude)."""
+        nodes = [(_to_xyz(lat, lng), key) for key, lat, lng in points]
+        self.size = len(nodes)
+        self.root = self._build(nodes, 0)
+
+    def _build(self, nodes, axis):
+        if not nodes:
+            return None
+        nodes.sort(key=lambda node: node[0][axis])
+        mid = len(nodes) // 2
+        next_axis = (axis + 1) % 3
+        return (nodes[mid][0], nodes[mid][1], axis,
+                self._build(nodes[:mid], next_axis), self._build(nodes[mid + 1:], next_axis))
+
+    def nearest(self, latitude, longitude, k, max_km=None):
+        """Up to k (distance_km, key) pairs, closest first."""
+        if k <= 0 or self.root is None:
+            return []
+        target = _to_xyz(latitude, longitude)
+        limit = _km_to_chord(max_km) ** 2 if max_km is not None else float('inf')
+        heap = []  # (-squared chord, key), the worst kept match on top
+
+        def visit(node):
+            if node is None:
+                return
+            point, key, axis, left, right = node
+            d2 = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+            if d2 <= limit:
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d2, key))
+                elif d2 < -heap[0][0]:
+                    heapq.heapreplace(heap, (-d2, key))
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            bound = -heap[0][0] if len(heap) == k else limit
+            if diff * diff <= bound:
+                visit(far)
+
+        visit(self.root)
+        return sorted((_chord_to_km(math.sqrt(-d2)), key) for d2, key in heap)
+
+    def within(self, latitude, longitude, radius_km):
+        """All (distance_km, key) pairs within radius_km, closest first."""
+        if self.root is None:
+            return []
+        target = _to_xyz(latitude, longitude)
+        limit = _km_to_chord(radius_km) ** 2
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            point, key, axis, left, right = node
+            d2 = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+            if d2 <= limit:
+                found.append((_chord_to_km(math.sqrt(d2)), key))
+            diff = target[axis] - point[axis]
+            if diff < 0 or diff * diff <= limit:
+                stack.append(left)
+            if diff >= 0 or diff * diff <= limit:
+                stack.append(right)
+        found.sort()
+        return found
+
+
+# In-memory tutor index. Each process keeps its own copy and rebuilds it when
+# the shared version number moves (bumped on tutor location changes) or after
+# TUTOR_INDEX_MAX_AGE_SECONDS, which bounds staleness with per-process caches.
+_VERSION_KEY = 'tutor_spatial_index_version'
+_index = None
+_index_lock = threading.Lock()
+
+
+class TutorIndex:
+    def __init__(self, version):
+        from playground.models import User
+
+        rows = (
+            User.objects.filter(roles='tutor', is_active=True, latitude__isnull=False, longitude__isnull=False)
+            .values_list('id', 'latitude', 'longitude', 'location_is_approximate')
+        )
+        self.approximate = {}
+        points = []
+        for user_id, latitude, longitude, approximate in rows:
+            points.append((user_id, float(latitude), float(longitude)))
+            self.approximate[user_id] = approximate
+        self.tree = KDTree(points)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def nearest(self, latitude, longitude, k, max_km=None):
+        return self.tree.nearest(latitude, longitude, k, max_km)
+
+    def within(self, latitude, longitude, radius_km):
+        return self.tree.within(latitude, longitude, radius_km)
+
+
+def invalidate_tutor_index():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+
+
+def tutor_index():
+    global _index
+    version = cache.get(_VERSION_KEY, 0)
+    max_age = settings.TUTOR_INDEX_MAX_AGE_SECONDS
+
+    current = _index
+    if current and current.version == version and time.monotonic() - current.built_at < max_age:
+        return current
+    with _index_lock:
+        current = _index
+        if current and current.version == version and time.monotonic() - current.built_at < max_age:
+            return current
+        started = time.monotonic()
+        _index = TutorIndex(version)
+        logger.info(f"Built tutor spatial index: {_index.tree.size} tutors in {(time.monotonic() - started) * 1000:.1f} ms")
+        return _index
+
+
+def request_location(tutoring_request):
+    """
+    (latitude, longitude, approximate) for a tutoring request: the parent's
+    geocoded home, else the centre of the request's city, else None.
+    """
+    parent = tutoring_request.parent
+    if parent.latitude is not None and parent.longitude is not None:
+        return float(parent.latitude), float(parent.longitude), parent.location_is_approximate
+    centroid = city_centroid(tutoring_request.city)
+    if centroid:
+        return centroid['latitude'], centroid['longitude'], True
+    return None
+
+
+def nearby_requests_q(latitude, longitude, radius_km):
+    """
+    Coarse DB prefilter for TutoringRequests within radius_km: the parent's
+    geohash falls in a covering cell, or, for parents not geocoded yet, the
+    request's city centre is in range. Check request_location afterwards
+    for the exact distance.
+    """
+    q = Q()
+    for prefix in covering_geohashes(latitude, longitude, radius_km):
+        q |= Q(parent__geohash__startswith=prefix)
+    cities = [
+        name for name, (lat, lng) in CITY_CENTROIDS.items()
+        if haversine_km(latitude, longitude, lat, lng) <= radius_km
+    ]
+    if cities:
+        q |= Q(parent__geohash='', city__in=cities)
+    return q
@@ -6,6 +6,9 @@ from django.conf import settings
 from playground import models
 from playground.models import User
 from playground.email_utils import send_mailgun_email
+from playground.google_tokens import google_token_manager, RECONNECT_GOOGLE
+from playground.calendar_sync import schedule_calendar_sync
+from playground.calendar_cache import invalidate_events_cache
 from celery.exceptions import Retry
 
 logger = logging.getLogger(__name__)
@@ -741,31 +744,16 @@ def create_google_calendar_event_async(self, user_id, event_data):
     Create Google Calendar event asynchronously
     """
     try:
-        from datetime import datetime, timezone
         import requests
         
         user = User.objects.get(id=user_id)
         
         # Ensure we have a valid access token
-        access_token = None
-        if getattr(user, "google_token_expiry", None):
-            if user.google_token_expiry < datetime.now(timezone.utc):
-                # Import at runtime to avoid circular imports
-                from playground.views import refresh_google_access_token
-                refresh_result = refresh_google_access_token(user)
-                if refresh_result == "RECONNECT_GOOGLE":
-                    return {'success': False, 'error': 'Google account needs to be reconnected'}
-                if refresh_result:
-                    access_token = refresh_result
-                else:
-                    return {'success': False, 'error': 'Google token expired and refresh failed'}
-            else:
-                access_token = getattr(user, "access_token", None)
-        else:
-            access_token = getattr(user, "access_token", None)
-
-        if not access_token:
+        access_token = google_token_manager.get_access_token(user)
+        if access_token == RECONNECT_GOOGLE:
             return {'success': False, 'error': 'Google account needs to be reconnected'}
+        if not access_token:
+            return {'success': False, 'error': 'Google token expired and refresh failed'}
 
         # Create the calendar event
         headers = {
@@ -780,6 +768,8 @@ def create_google_calendar_event_async(self, user_id, event_data):
         if response.status_code == 200:
             event_result = response.json()
             logger.info(f"Google Calendar event created for user {user_id}: {event_result.get('id')}")
+            invalidate_events_cache(user_id)
+            schedule_calendar_sync(user_id)
             return {
                 'success': True,
                 'event_id': event_result.get('id'),
@@ -808,11 +798,9 @@ def refresh_google_token_async(self, user_id):
         
         user = User.objects.get(id=user_id)
         
-        # Import at runtime to avoid circular imports
-        from playground.views import refresh_google_access_token
-        refresh_result = refresh_google_access_token(user)
+        refresh_result = google_token_manager.get_access_token(user)
         
-        if refresh_result == "RECONNECT_GOOGLE":
+        if refresh_result == RECONNECT_GOOGLE:
             logger.warning(f"User {user_id} needs to reconnect Google account")
             return {'success': False, 'error': 'Reconnection required', 'reconnect_needed': True}
         elif refresh_result:
@@ -842,25 +830,11 @@ def fetch_google_calendar_events_async(self, user_id, params=None):
         user = User.objects.get(id=user_id)
         
         # Ensure we have a valid access token
-        access_token = None
-        if getattr(user, "google_token_expiry", None):
-            if user.google_token_expiry < datetime.now(timezone.utc):
-                # Import at runtime to avoid circular imports
-                from playground.views import refresh_google_access_token
-                refresh_result = refresh_google_access_token(user)
-                if refresh_result == "RECONNECT_GOOGLE":
-                    return {'success': False, 'error': 'Google account needs to be reconnected'}
-                if refresh_result:
-                    access_token = refresh_result
-                else:
-                    return {'success': False, 'error': 'Google token expired and refresh failed'}
-            else:
-                access_token = getattr(user, "access_token", None)
-        else:
-            access_token = getattr(user, "access_token", None)
-
-        if not access_token:
+        access_token = google_token_manager.get_access_token(user)
+        if access_token == RECONNECT_GOOGLE:
             return {'success': False, 'error': 'Google account needs to be reconnected'}
+        if not access_token:
+            return {'success': False, 'error': 'Google token expired and refresh failed'}
 
         # Set up default parameters
         default_params = {
@@ -904,42 +878,39 @@ def fetch_google_calendar_events_async(self, user_id, params=None):
         raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=30)
-def update_google_calendar_rsvp_async(self, user_id, event_id, status):
+def update_google_calendar_rsvp_async(self, user_id, event_id, status=None):
     """
     Update Google Calendar event RSVP status asynchronously
+
+    Without a status, the latest RSVP recorded by calendar_rsvp.queue_rsvp_update
+    (from UpdateEventRsvpView) is applied the same way the view used to, so
+    rapid changes for the same event collapse into one patch.
     """
     try:
-        from datetime import datetime, timezone
-        import requests
-        
+        from playground.calendar_rsvp import apply_rsvp, patch_attendee_status, take_queued_status
+
+        if status is None:
+            queued = take_queued_status(user_id, event_id)
+            if queued is None:
+                return {'success': True, 'event_id': event_id, 'detail': 'Nothing queued'}
+
+            user = User.objects.get(id=user_id)
+            try:
+                apply_rsvp(user, event_id, queued.pop('status'), **queued)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
+            logger.info(f"Queued RSVP applied for user {user_id}, event {event_id}")
+            return {'success': True, 'event_id': event_id, 'user_id': user_id}
+
         user = User.objects.get(id=user_id)
         
         # Ensure we have a valid access token
-        access_token = None
-        if getattr(user, "google_token_expiry", None):
-            if user.google_token_expiry < datetime.now(timezone.utc):
-                # Import at runtime to avoid circular imports
-                from playground.views import refresh_google_access_token
-                refresh_result = refresh_google_access_token(user)
-                if refresh_result == "RECONNECT_GOOGLE":
-                    return {'success': False, 'error': 'Google account needs to be reconnected'}
-                if refresh_result:
-                    access_token = refresh_result
-                else:
-                    return {'success': False, 'error': 'Google token expired and refresh failed'}
-            else:
-                access_token = getattr(user, "access_token", None)
-        else:
-            access_token = getattr(user, "access_token", None)
-
-        if not access_token:
+        access_token = google_token_manager.get_access_token(user)
+        if access_token == RECONNECT_GOOGLE:
             return {'success': False, 'error': 'Google account needs to be reconnected'}
+        if not access_token:
+            return {'success': False, 'error': 'Google token expired and refresh failed'}
 
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json',
-        }
-        
         # Map status to Google Calendar attendee status
         status_mapping = {
             'cant_attend': 'declined',
@@ -948,31 +919,13 @@ def update_google_calendar_rsvp_async(self, user_id, event_id, status):
         }
         
         google_status = status_mapping.get(status, 'declined')
-        
-        # Get current event to update attendee status
-        get_url = f'https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}'
-        get_response = requests.get(get_url, headers=headers)
-        
-        if get_response.status_code != 200:
-            return {'success': False, 'error': f'Could not fetch event: {get_response.text}'}
-            
-        event_data = get_response.json()
-        
-        # Update attendee status
-        attendees = event_data.get('attendees', [])
-        user_email = user.email
-        
-        for attendee in attendees:
-            if attendee.get('email') == user_email:
-                attendee['responseStatus'] = google_status
-                break
-        
-        # Update the event
-        put_url = f'https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}'
-        put_response = requests.put(put_url, json=event_data, headers=headers)
-        
-        if put_response.status_code == 200:
+
+        result = patch_attendee_status(access_token, event_id, user.email, google_status, add_if_missing=False)
+
+        if result['success']:
             logger.info(f"RSVP status updated for user {user_id}, event {event_id}: {google_status}")
+            invalidate_events_cache(user_id)
+            schedule_calendar_sync(user_id)
             return {
                 'success': True,
                 'event_id': event_id,
@@ -980,9 +933,8 @@ def update_google_calendar_rsvp_async(self, user_id, event_id, status):
                 'user_id': user_id
             }
         else:
-            error_msg = f"Google Calendar API error updating RSVP: {put_response.status_code} - {put_response.text}"
-            logger.error(error_msg)
-            return {'success': False, 'error': error_msg}
+            logger.error(result['error'])
+            return {'success': False, 'error': result['error']}
             
     except User.DoesNotExist:
         logger.error(f"User {user_id} not found for RSVP update")
@@ -1315,14 +1267,16 @@ def create_mapulus_pin_async(self, user_data):
     Create a pin on Mapulus map when a new user signs up
     """
     try:
-        from playground.mapulus_service import mapulus_service
+        from playground.mapulus_service import add_user_to_map
         
         user_id = user_data.get('id')
         full_name = f"{user_data.get('firstName', '')} {user_data.get('lastName', '')}"
         
         logger.info(f"Creating Mapulus pin for user {user_id} - {full_name}")
         
-        success = mapulus_service.create_pin(user_data)
+        # Creating and updating are the same upsert keyed on the stored marker ID
+        user = User.objects.get(id=user_id)
+        success = add_user_to_map(user)
         
         if success:
             logger.info(f"Successfully created Mapulus pin for user {user_id} - {full_name}")
@@ -1339,6 +1293,10 @@ def create_mapulus_pin_async(self, user_data):
                 'error': 'Pin creation failed'
             }
             
+    except User.DoesNotExist:
+        logger.error(f"User {user_data.get('id')} not found for Mapulus pin")
+        return {'success': False, 'error': 'User not found'}
+            
     except Exception as e:
         logger.error(f"Error in create_mapulus_pin_async for user {user_data.get('id')}: {str(e)}")
         raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
@@ -1350,14 +1308,16 @@ def update_mapulus_pin_async(self, user_data):
     Update an existing pin on Mapulus map when user profile is updated
     """
     try:
-        from playground.mapulus_service import mapulus_service
+        from playground.mapulus_service import add_user_to_map
         
         user_id = user_data.get('id')
         full_name = f"{user_data.get('firstName', '')} {user_data.get('lastName', '')}"
         
         logger.info(f"Updating Mapulus pin for user {user_id} - {full_name}")
         
-        success = mapulus_service.update_pin(user_data)
+        # Creating and updating are the same upsert keyed on the stored marker ID
+        user = User.objects.get(id=user_id)
+        success = add_user_to_map(user)
         
         if success:
             logger.info(f"Successfully updated Mapulus pin for user {user_id} - {full_name}")
@@ -1374,6 +1334,10 @@ def update_mapulus_pin_async(self, user_data):
                 'error': 'Pin update failed or pin does not exist'
             }
             
+    except User.DoesNotExist:
+        logger.error(f"User {user_data.get('id')} not found for Mapulus pin")
+        return {'success': False, 'error': 'User not found'}
+            
     except Exception as e:
         logger.error(f"Error in update_mapulus_pin_async for user {user_data.get('id')}: {str(e)}")
         raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
@@ -1385,14 +1349,15 @@ def delete_mapulus_pin_async(self, pin_id, user_info=None):
     Delete a pin from Mapulus map (e.g., when user is deactivated)
     """
     try:
-        from playground.mapulus_service import mapulus_service
+        from playground.mapulus_service import MapulusGeocoder
         
         user_name = user_info.get('name', 'Unknown') if user_info else 'Unknown'
         logger.info(f"Deleting Mapulus pin {pin_id} for user {user_name}")
         
-        success = mapulus_service.delete_pin(pin_id)
+        success = MapulusGeocoder().delete_marker(pin_id)
         
         if success:
+            User.objects.filter(mapulus_marker_id=str(pin_id)).update(mapulus_marker_id='', mapulus_marker_hash='')
             logger.info(f"Successfully deleted Mapulus pin {pin_id}")
             return {
                 'success': True,
@@ -1690,6 +1655,17 @@ def send_daily_health_check():
     except Exception as e:
         checks['database'] = {'ok': False, 'detail': str(e)}
 
+    # --- Geocode cache ---
+    try:
+        from playground.geocode_cache import geocode_cache_stats
+        stats = geocode_cache_stats()
+        checks['geocode_cache'] = {
+            'ok': True,
+            'detail': f"{stats['table_rows']} cached addresses, {stats['api_calls_saved']} Mapulus API calls saved.",
+        }
+    except Exception as e:
+        checks['geocode_cache'] = {'ok': False, 'detail': str(e)}
+
     # --- Mailgun ---
     # Sending this email IS the Mailgun test — if it arrives, Mailgun is working.
     checks['mailgun'] = {
@@ -1718,3 +1694,222 @@ def send_daily_health_check():
 
     return checks
 
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=600)
+def archive_email_logs_async(self, retention_days=None):
+    """
+    Nightly: move EmailLog rows older than EMAIL_LOG_RETENTION_DAYS into
+    gzipped NDJSON archive files so the hot table stays small.
+    """
+    try:
+        from playground.email_archive import archive_email_logs
+
+        result = archive_email_logs(retention_days=retention_days)
+        return {'success': True, **result}
+
+    except Exception as e:
+        logger.error(f"Error archiving email logs: {str(e)}")
+        raise self.retry(exc=e, countdown=600 * (self.request.retries + 1))
+
+
+@shared_task
+def refresh_expiring_google_tokens(window_minutes=None):
+    """
+    Periodic: refresh every Google access token that expires within the next
+    window so user-facing requests always find a valid token already stored.
+    Refresh tokens Google rejects as invalid_grant are cleared by the token
+    manager, so those users drop out of this query until they reconnect.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+
+    if window_minutes is None:
+        window_minutes = settings.GOOGLE_TOKEN_REFRESH_WINDOW_MINUTES
+    horizon = timezone.now() + timedelta(minutes=window_minutes)
+
+    users = (
+        User.objects.filter(
+            is_active=True,
+            google_token_expiry__isnull=False,
+            google_token_expiry__lte=horizon,
+        )
+        .exclude(_encrypted_google_refresh_token__isnull=True)
+        .exclude(_encrypted_google_refresh_token='')
+        .only('id', '_encrypted_google_access_token', '_encrypted_google_refresh_token', 'google_token_expiry')
+    )
+
+    refreshed = 0
+    reconnect_needed = 0
+    failed = 0
+    for user in users.iterator():
+        try:
+            result = google_token_manager.refresh(user, min_valid_for=timedelta(minutes=window_minutes))
+        except Exception as e:
+            logger.error(f"Error refreshing Google token for user {user.id}: {str(e)}")
+            failed += 1
+            continue
+        if result == RECONNECT_GOOGLE:
+            reconnect_needed += 1
+        elif result:
+            refreshed += 1
+        else:
+            failed += 1
+
+    logger.info(f"Proactive Google token refresh: {refreshed} refreshed, {reconnect_needed} need reconnect, {failed} failed")
+    return {'refreshed': refreshed, 'reconnect_needed': reconnect_needed, 'failed': failed}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def sync_google_calendar_async(self, user_id, full=False):
+    """
+    Incrementally sync the user's EGS calendar events into CalendarEvent.
+    """
+    try:
+        from playground.calendar_sync import sync_user_calendar
+
+        user = User.objects.get(id=user_id)
+        return sync_user_calendar(user, full=full)
+
+    except User.DoesNotExist:
+        logger.error(f"User {user_id} not found for calendar sync")
+        return {'success': False, 'error': 'User not found'}
+
+    except Exception as e:
+        logger.error(f"Error syncing Google Calendar for user {user_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
+
+
+@shared_task
+def sync_stale_google_calendars():
+    """
+    Periodic: queue an incremental sync for every local calendar that is older
+    than GOOGLE_CALENDAR_SYNC_MAX_AGE_MINUTES, so changes made directly in
+    Google show up without anyone opening the events page.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from playground.models import CalendarSyncState
+
+    cutoff = timezone.now() - timedelta(minutes=settings.GOOGLE_CALENDAR_SYNC_MAX_AGE_MINUTES)
+    user_ids = (
+        CalendarSyncState.objects.filter(user__is_active=True, last_synced_at__lt=cutoff)
+        .exclude(user___encrypted_google_refresh_token__isnull=True)
+        .exclude(user___encrypted_google_refresh_token='')
+        .values_list('user_id', flat=True)
+    )
+
+    queued = 0
+    for user_id in user_ids.iterator():
+        try:
+            sync_google_calendar_async.delay(user_id)
+            queued += 1
+        except Exception as e:
+            logger.error(f"Failed to queue calendar sync for user {user_id}: {str(e)}")
+
+    logger.info(f"Queued {queued} stale Google Calendar syncs")
+    return {'queued': queued}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=120)
+def publish_group_class_calendar_async(self, class_id):
+    """
+    Push a group class schedule into every enrolled family's Google Calendar
+    using batched insert/patch/delete calls.
+    """
+    try:
+        from playground.group_calendar import publish_class_calendar
+        from playground.models import GroupTutoringClass
+
+        tutoring_class = GroupTutoringClass.objects.get(id=class_id)
+        return {'success': True, **publish_class_calendar(tutoring_class)}
+
+    except GroupTutoringClass.DoesNotExist:
+        logger.error(f"Group class {class_id} not found for calendar publishing")
+        return {'success': False, 'error': 'Class not found'}
+
+    except Exception as e:
+        logger.error(f"Error publishing calendar for group class {class_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=120 * (self.request.retries + 1))
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=120)
+def delete_group_class_calendar_events_async(self, events):
+    """
+    Remove a deleted group class's recurring events from family calendars.
+    events is a list of (user_id, google_event_id) pairs collected before
+    the class and its GroupClassCalendarEvent rows were deleted.
+    """
+    try:
+        from playground.group_calendar import delete_calendar_events
+        return {'success': True, **delete_calendar_events(events)}
+
+    except Exception as e:
+        logger.error(f"Error deleting calendar events of a removed group class: {str(e)}")
+        raise self.retry(exc=e, countdown=120 * (self.request.retries + 1))
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def geocode_user_async(self, user_id, expected_hash=None):
+    """
+    Geocode a tutor/parent address and refresh their Mapulus pin.
+    Queued by the User post_save signal when address or city changes.
+    """
+    try:
+        from django.core.cache import cache
+        from playground.mapulus_service import address_hash, geocode_user_address, add_user_to_map
+
+        user = User.objects.get(id=user_id)
+        current_hash = address_hash(user.address, user.city)
+
+        if expected_hash and current_hash != expected_hash:
+            # Address changed again after queueing; the newer job handles it
+            return {'success': True, 'user_id': user_id, 'skipped': 'address changed'}
+        if current_hash == user.geocode_address_hash:
+            return {'success': True, 'user_id': user_id, 'skipped': 'already geocoded'}
+
+        success = geocode_user_address(user)
+        cache.delete(f"geocode_pending:{user_id}:{current_hash}")
+
+        if success:
+            logger.info(f"Successfully geocoded {user.roles} {user.id}")
+        else:
+            logger.warning(f"Failed to geocode {user.roles} {user.id}")
+        # Approximate (city centroid) locations are mapped too
+        if user.latitude is not None:
+            add_user_to_map(user)
+        return {'success': success, 'user_id': user_id}
+
+    except User.DoesNotExist:
+        logger.error(f"User {user_id} not found for geocoding")
+        return {'success': False, 'error': 'User not found'}
+
+    except Exception as e:
+        logger.error(f"Error geocoding user {user_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=300)
+def reconcile_mapulus_markers_async(self, dry_run=False):
+    """
+    Periodic diff of tutors/parents against the Mapulus layers; creates,
+    moves and deletes markers in batches. Profile edits don't call Mapulus
+    directly, they are picked up here.
+    """
+    try:
+        from playground.mapulus_sync import reconcile_mapulus_markers
+
+        counts = reconcile_mapulus_markers(dry_run=dry_run)
+        if counts is None:
+            return {'success': False, 'error': 'Could not read Mapulus layers'}
+        return {'success': True, **counts}
+
+    except Exception as e:
+        logger.error(f"Error reconciling Mapulus markers: {str(e)}")
+        raise self.retry(exc=e, countdown=300 * (self.request.retries + 1))
+
+
+@shared_task
+def refresh_tutor_match_features():
+    """Recompute ranking features for tutors marked stale (and new tutors)."""
+    from playground.tutor_ranking import refresh_match_features
+    return {'refreshed': refresh_match_features()}
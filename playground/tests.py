@@ -1,3 +1,1407 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from playground.models import (
+    AcceptedTutor, EmailLog, EmailLogArchive, HourDispute, Hours, TutoringRequest, TutorMatchFeatures,
+    TutorReferralRequest, TutorResponse, User,
+)
+from playground.pagination import encode_cursor
+from playground.serializers import HoursSerializer
+
+
+def make_user(username, roles, **extra):
+    # Creating a user queues a geocode; there is no broker in tests
+    with mock.patch('playground.tasks.geocode_user_async.delay'):
+        return User.objects.create(**{'username': username, 'email': f'{username}@example.com', 'roles': roles, **extra})
+
+
+class RequestListQueryCountTests(TestCase):
+    """RequestListView reads parent, student, accepted tutor and replies from prefetched relations."""
+
+    def setUp(self):
+        self.admin = make_user('admin', 'admin', is_superuser=True)
+        self.parent = make_user('parent', 'parent')
+        self.tutors = [make_user(f'tutor{i}', 'tutor') for i in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_requests(self, count):
+        for i in range(count):
+            student = make_user(f'student{TutoringRequest.objects.count()}', 'student', parent=self.parent)
+            tutoring_request = TutoringRequest.objects.create(
+                parent=self.parent, student=student, subject='Math', description='Help',
+            )
+            for tutor in self.tutors:
+                TutorResponse.objects.create(request=tutoring_request, tutor=tutor, message='I can help')
+            if i % 2:
+                AcceptedTutor.objects.create(
+                    request=tutoring_request, parent=self.parent, student=student, tutor=self.tutors[0],
+                )
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/requests/list/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_requests(3)
+        few, data = self.list_queries()
+        self.assertEqual(len(data), 3)
+
+        self.add_requests(12)
+        many, data = self.list_queries()
+        self.assertEqual(len(data), 15)
+        self.assertEqual(few, many)
+
+    def test_list_runs_three_queries(self):
+        self.add_requests(5)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/requests/list/')
+        accepted = [row for row in response.data if row['accepted_tutor_id']]
+        self.assertEqual(len(accepted), 2)
+        self.assertEqual(accepted[0]['accepted_tutor_id'], self.tutors[0].id)
+
+    def test_tampered_cursor_is_a_bad_request(self):
+        self.add_requests(2)
+        first = TutoringRequest.objects.order_by('-created_at', '-id').first()
+        response = self.client.get('/api/requests/list/', {'cursor': encode_cursor(first.created_at, first.id)})
+        self.assertEqual(response.status_code, 200)
+
+        tampered = [
+            'not-a-cursor!',
+            base64.urlsafe_b64encode(b'2024-13-45T99:00:00|1').decode(),
+            base64.urlsafe_b64encode(b'2024-01-01T00:00:00+00:00|99999999999999999999999').decode(),
+        ]
+        for cursor in tampered:
+            response = self.client.get('/api/requests/list/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class IndexUsageMixin:
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn(f'USING INDEX {index_name}', plan)
+        else:
+            self.assertIn(index_name, plan)
+
+
+class HoursIndexUsageTests(IndexUsageMixin, TestCase):
+    """The hot Hours queries are answered from the indexes declared on Hours.Meta."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent')
+        self.tutor = make_user('tutor', 'tutor')
+        self.student = make_user('student', 'student', parent=self.parent)
+        self.week = (datetime.date(2024, 1, 1), datetime.date(2024, 1, 7))
+        for day in range(30):
+            Hours.objects.create(
+                tutor=self.tutor, student=self.student, parent=self.parent,
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=day),
+                startTime=datetime.time(10), endTime=datetime.time(11), totalTime=1,
+                location='Online', invoice_status='pending' if day % 2 else 'invoiced',
+            )
+
+    def test_weekly_billing_uses_pending_index(self):
+        queryset = Hours.objects.filter(invoice_status='pending', date__range=self.week)
+        self.assertUsesIndex(queryset, 'hours_pending_date_idx')
+
+    def test_parent_pending_uses_parent_pending_index(self):
+        queryset = Hours.objects.filter(parent=self.parent, invoice_status='pending', date__range=self.week)
+        self.assertUsesIndex(queryset, 'hours_parent_pending_date_idx')
+
+    def test_tutor_range_uses_tutor_index(self):
+        queryset = Hours.objects.filter(tutor=self.tutor, date__range=self.week)
+        self.assertUsesIndex(queryset, 'hours_tutor_date_idx')
+
+    def test_duplicate_check_uses_tutor_index(self):
+        queryset = Hours.objects.filter(
+            tutor=self.tutor, student=self.student, date=self.week[0],
+            startTime=datetime.time(10), endTime=datetime.time(11),
+        )
+        self.assertUsesIndex(queryset, 'hours_tutor_date_idx')
+
+    def test_admin_listing_uses_date_index(self):
+        queryset = Hours.objects.order_by('-date', '-created_at', '-id')[:50]
+        self.assertUsesIndex(queryset, 'hours_date_idx')
+
+    def test_parent_listing_uses_created_index(self):
+        queryset = Hours.objects.filter(parent=self.parent).order_by('-created_at')
+        self.assertUsesIndex(queryset, 'hours_parent_created_idx')
+
+
+class AdminHoursListingTests(TestCase):
+    """AdminAllHoursView filters, stats and (date, created_at, id) keyset pages."""
+
+    def setUp(self):
+        self.admin = make_user('admin', 'admin', is_superuser=True)
+        parent = make_user('parent', 'parent')
+        tutor = make_user('tutor', 'tutor')
+        student = make_user('student', 'student', parent=parent)
+        logged = datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+        # Three sessions a day, logged out of order, so created_at decides within a date
+        for i in range(9):
+            hour = Hours.objects.create(
+                tutor=tutor, student=student, parent=parent,
+                date=datetime.date(2024, 1, 1 + i // 3),
+                startTime=datetime.time(10), endTime=datetime.time(11), totalTime=1, location='Online',
+                eligible='Late' if i % 3 == 0 else 'Eligible',
+                invoice_status='invoiced' if i % 2 else 'pending',
+            )
+            Hours.objects.filter(pk=hour.pk).update(created_at=logged + datetime.timedelta(minutes=(i * 7) % 9))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, **params):
+        response = self.client.get('/api/admin/all-hours/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_filters_narrow_rows_but_not_stats(self):
+        data = self.get(eligible='Late', invoice_status='pending')
+        expected = Hours.objects.filter(eligible='Late', invoice_status='pending')
+        self.assertEqual({row['id'] for row in data['hours']}, set(expected.values_list('id', flat=True)))
+        self.assertEqual(data['stats'], {'total': 9, 'eligible': 6, 'late': 3, 'pending': 5, 'invoiced': 4})
+
+    def test_start_and_end_filter_independently(self):
+        self.assertEqual(self.get(start='2024-01-02')['stats']['total'], 6)
+        self.assertEqual(self.get(end='2024-01-01')['stats']['total'], 3)
+
+    def test_pages_follow_date_then_created_at(self):
+        expected = list(Hours.objects.order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            data = self.get(limit=2, **({'cursor': cursor} if cursor else {}))
+            seen += [row['id'] for row in data['hours']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+
+class AdminUserHoursPagingTests(TestCase):
+    """AdminUserHoursView pages a user's hours on (date, startTime, id)."""
+
+    def setUp(self):
+        admin = make_user('admin', 'admin', is_superuser=True)
+        parent = make_user('parent', 'parent')
+        self.tutor = make_user('tutor', 'tutor')
+        student = make_user('student', 'student', parent=parent)
+        # Logged out of order, so ids don't follow start times within a day
+        for i in range(7):
+            Hours.objects.create(
+                tutor=self.tutor, student=student, parent=parent,
+                date=datetime.date(2024, 1, 1 + i // 3), startTime=datetime.time(9 + (i * 2) % 5),
+                endTime=datetime.time(16), totalTime=1, location='Online',
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_pages_follow_date_then_start_time(self):
+        url = f'/api/admin/users/{self.tutor.id}/hours/'
+        expected = list(Hours.objects.order_by('-date', '-startTime', '-id').values_list('id', flat=True))
+        data = self.client.get(url, {'limit': 2}).data
+        seen = [row['id'] for row in data['hours']]
+        while data['hours_next_cursor']:
+            response = self.client.get(url, {'limit': 2, 'cursor': data['hours_next_cursor']})
+            self.assertEqual(response.status_code, 200)
+            data = response.data
+            seen += [row['id'] for row in data['hours']]
+        self.assertEqual(seen, expected)
+
+
+class AdminBatchAddHoursTests(TestCase):
+    """AdminBatchAddHoursView: dry runs, duplicates, the row limit, CSV uploads and the receivers bulk_create skips."""
+
+    def setUp(self):
+        admin = make_user('admin', 'admin', is_superuser=True)
+        self.parent = make_user('parent', 'parent')
+        self.tutor = make_user('tutor', 'tutor')
+        self.student = make_user('student', 'student', parent=self.parent)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def entry(self, day=1, start='10:00', end='11:00'):
+        return {
+            'tutor_id': self.tutor.id, 'student_id': self.student.id, 'date': f'2024-01-{day:02d}',
+            'start_time': start, 'end_time': end, 'total_time': '1', 'location': 'Online',
+        }
+
+    def post(self, data, **kwargs):
+        return self.client.post('/api/admin/batch-add-hours/', data, **kwargs)
+
+    def test_dry_run_reports_without_saving(self):
+        response = self.post({'hours': [self.entry(1), self.entry(2)], 'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertTrue(results['dry_run'])
+        self.assertEqual([item['hour_id'] for item in results['successful']], [None, None])
+        self.assertFalse(Hours.objects.exists())
+
+    def test_duplicates_of_saved_and_uploaded_rows_fail(self):
+        Hours.objects.create(
+            tutor=self.tutor, student=self.student, parent=self.parent, date=datetime.date(2024, 1, 1),
+            startTime=datetime.time(10), endTime=datetime.time(11), totalTime=1, location='Online',
+        )
+        response = self.post({'hours': [self.entry(1), self.entry(2), self.entry(2)]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([item['index'] for item in results['failed']], [0, 2])
+        self.assertIn('already logged', results['failed'][0]['error'])
+        self.assertEqual(Hours.objects.count(), 2)
+        created = Hours.objects.get(pk=results['successful'][0]['hour_id'])
+        self.assertEqual((created.parent_id, created.status, created.eligible), (self.parent.id, 'Accepted', 'Late'))
+
+    @override_settings(HOURS_IMPORT_MAX_ROWS=2)
+    def test_too_many_rows_is_rejected(self):
+        response = self.post({'hours': [self.entry(day) for day in (1, 2, 3)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Too many rows', response.data['error'])
+        self.assertFalse(Hours.objects.exists())
+
+    def test_csv_upload(self):
+        rows = ['tutor_id,student_id,date,start_time,end_time,total_time,location,subject']
+        rows += [f'{self.tutor.id},{self.student.id},2024-01-0{day},10:00,11:00,1,Online, Math ' for day in (1, 2)]
+        upload = SimpleUploadedFile('hours.csv', ('\ufeff' + '\n'.join(rows)).encode(), content_type='text/csv')
+        response = self.post({'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']['successful']), 2)
+        self.assertEqual(set(Hours.objects.values_list('subject', flat=True)), {'Math'})
+
+    def test_csv_missing_column_is_rejected(self):
+        upload = SimpleUploadedFile('hours.csv', b'tutor_id,student_id,date\n1,2,2024-01-01\n', content_type='text/csv')
+        response = self.post({'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_time', response.data['error'])
+
+    def test_import_applies_what_the_hours_receivers_would(self):
+        TutorMatchFeatures.objects.create(tutor=self.tutor, stale=False)
+        with mock.patch('playground.views.issue_referral_credit') as credit, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.post({'hours': [self.entry(day) for day in (1, 2, 3)]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(TutorMatchFeatures.objects.get(tutor=self.tutor).stale)
+        credit.assert_called_once()
+        self.assertEqual(credit.call_args.args[0].id, self.student.id)
+
+    def test_hours_receivers_are_the_ones_import_mirrors(self):
+        # import_hours replays these by hand; a new Hours receiver must be added there too
+        receivers = {receiver.__name__ for receiver in post_save._live_receivers(Hours)[0]}
+        self.assertEqual(receivers, {'mark_tutor_match_features_stale', 'maybe_issue_referral_credit'})
+
+
+class HoursSerializeValuesTests(TestCase):
+    """HoursSerializer.serialize_values renders the same JSON as HoursSerializer(many=True)."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent', firstName='Pat', lastName='Lee')
+        tutor = make_user('tutor', 'tutor', firstName='Tam', lastName='Ng')
+        student = make_user('student', 'student', parent=self.parent, firstName='Sam', lastName='Lee')
+        other = make_user('other', 'tutor')
+        hours = [
+            Hours.objects.create(
+                tutor=tutor, student=student, parent=self.parent, date=datetime.date(2024, 1, day),
+                startTime=datetime.time(9, 30), endTime=datetime.time(11), totalTime='1.50',
+                location='In-Person' if day % 2 else 'Online', subject='Math', notes=f'Session {day}',
+                invoice_id='in_123' if day == 2 else None, tutor_reply='Thanks' if day == 3 else None,
+                edit_history={'changes': [{'field': 'notes'}]} if day == 1 else {},
+            )
+            for day in (1, 2, 3, 4)
+        ]
+        Hours.objects.filter(pk=hours[0].pk).update(edited_at=datetime.datetime(2024, 1, 2, 8, 15, 30, 123456, tzinfo=datetime.timezone.utc))
+        # Ours pending, someone else's pending, ours resolved, none
+        HourDispute.objects.create(hour=hours[0], complainer=self.parent, message='Wrong time')
+        HourDispute.objects.create(hour=hours[1], complainer=other, message='Not me')
+        HourDispute.objects.create(hour=hours[2], complainer=self.parent, message='Old', status='resolved')
+
+    def test_output_is_byte_identical(self):
+        context = {'request': mock.Mock(user=self.parent)}
+        queryset = Hours.objects.order_by('-date', '-id')
+        expected = HoursSerializer(
+            queryset.select_related('student', 'tutor', 'parent').prefetch_related('disputes'),
+            many=True, context=context,
+        ).data
+        actual = HoursSerializer.serialize_values(queryset, context=context)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+        self.assertEqual([row['has_disputes'] for row in actual], [False, False, True, True])
+        self.assertEqual(sum(row['dispute_id'] is not None for row in actual), 1)
+
+    def test_anonymous_request_has_no_dispute_id(self):
+        rows = HoursSerializer.serialize_values(Hours.objects.all(), context={})
+        self.assertEqual({row['dispute_id'] for row in rows}, {None})
+
+
+def streamed(response):
+    return b''.join(response.streaming_content).decode()
+
+
+class AccountingExportTests(TestCase):
+    """AdminAccountingExportView streams the dataset's rows under its columns."""
+
+    def setUp(self):
+        admin = make_user('admin', 'admin', is_superuser=True)
+        parent = make_user('parent', 'parent', firstName='Pat')
+        self.tutor = make_user('tutor', 'tutor', firstName='Tam')
+        student = make_user('student', 'student', parent=parent)
+        for day in (2, 1):
+            Hours.objects.create(
+                tutor=self.tutor, student=student, parent=parent, date=datetime.date(2024, 1, day),
+                startTime=datetime.time(9, 30), endTime=datetime.time(11), totalTime='1.50', location='Online',
+                subject='Math, "advanced"', invoice_id='in_1' if day == 1 else None,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_hours_csv_has_the_dataset_columns_and_rows(self):
+        response = self.client.get('/api/admin/exports/hours/', {'export_format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        reader = csv.DictReader(io.StringIO(streamed(response)))
+        self.assertEqual(reader.fieldnames[:3], ['id', 'date', 'startTime'])
+        self.assertIn('tutor_email', reader.fieldnames)
+        rows = list(reader)
+        self.assertEqual([row['date'] for row in rows], ['2024-01-01', '2024-01-02'])
+        self.assertEqual(rows[0]['startTime'], '09:30:00')
+        self.assertEqual(rows[0]['totalTime'], '1.50')
+        self.assertEqual(rows[0]['subject'], 'Math, "advanced"')
+        self.assertEqual((rows[0]['invoice_id'], rows[1]['invoice_id']), ('in_1', ''))
+        self.assertEqual(rows[0]['tutor_email'], self.tutor.email)
+
+    def test_unknown_dataset_is_not_found(self):
+        response = self.client.get('/api/admin/exports/refunds/')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('hours', response.data['error'])
+
+
+class EmailLogArchiveTests(TestCase):
+    """Archiving EmailLog rows to MEDIA_ROOT and exporting them again."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        sent = datetime.datetime(2024, 1, 15, 12, 30, 45, 123456, tzinfo=datetime.timezone.utc)
+        for i in range(3):
+            log = EmailLog.objects.create(
+                recipient_email=f'user{i}@example.com', recipient_name=f'User, {i}',
+                subject=f'Invoice "{i}"', email_type='invoice', status='failed' if i == 2 else 'sent',
+                error_message='Line one\nline two' if i == 2 else '',
+            )
+            EmailLog.objects.filter(pk=log.pk).update(sent_at=sent + datetime.timedelta(days=i))
+        admin = make_user('admin', 'admin', is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_csv_export_matches_the_previous_writer(self):
+        from playground.email_archive import ARCHIVE_FIELDS, archive_email_logs, iter_archived_email_logs
+
+        self.assertEqual(archive_email_logs(retention_days=30)['archived_rows'], 3)
+        response = self.client.get('/api/admin/email-logs/export/', {'export_format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+
+        # What the view wrote before it streamed through exports.stream_export
+        class Echo:
+            def write(self, value):
+                return value
+
+        writer = csv.DictWriter(Echo(), fieldnames=ARCHIVE_FIELDS)
+        expected = writer.writeheader() + ''.join(writer.writerow(row) for row in iter_archived_email_logs())
+        self.assertEqual(streamed(response), expected)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(expected)))), 3)
+
+    def archive_files(self):
+        return [name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names]
+
+    def test_archive_moves_rows_to_an_indexed_file(self):
+        from playground.email_archive import archive_email_logs
+
+        archive_email_logs(retention_days=30)
+        self.assertFalse(EmailLog.objects.exists())
+        archive = EmailLogArchive.objects.get()
+        self.assertEqual((archive.month, archive.row_count), (datetime.date(2024, 1, 1), 3))
+        self.assertEqual(self.archive_files(), [os.path.basename(archive.file_path)])
+
+    def test_failed_delete_rolls_back_the_index_row_and_file(self):
+        from playground.email_archive import archive_email_logs
+
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                archive_email_logs(retention_days=30)
+        self.assertEqual(EmailLog.objects.count(), 3)
+        self.assertFalse(EmailLogArchive.objects.exists())
+        self.assertEqual(self.archive_files(), [])
+
+
+class FakeCalendar:
+    """Stands in for the Calendar API client: serves one event and records patches."""
+
+    def __init__(self, event):
+        self.event = event
+        self.patches = []
+
+    def events(self):
+        return self
+
+    def get(self, **kwargs):
+        return mock.Mock(execute=lambda: dict(self.event))
+
+    def patch(self, **kwargs):
+        self.patches.append(kwargs)
+        return mock.Mock(headers={}, execute=lambda: {'id': kwargs['eventId'], 'etag': '"2"'})
+
+
+class RsvpMarkerTests(TestCase):
+    """The GET link and the POST cancel dialog mark events the way they always have."""
+
+    def setUp(self):
+        self.user = make_user('tutor', 'tutor', _encrypted_google_refresh_token='refresh')
+        self.calendar = FakeCalendar({
+            'id': 'ev1', 'etag': '"1"',
+            'attendees': [{'email': 'tutor@example.com', 'responseStatus': 'accepted'},
+                          {'email': 'parent@example.com', 'responseStatus': 'accepted'}],
+        })
+        patches = [
+            mock.patch('playground.calendar_rsvp.build_calendar_service', return_value=self.calendar),
+            mock.patch('playground.calendar_cache.invalidate_events_cache'),
+            mock.patch('playground.calendar_sync.schedule_calendar_sync'),
+            mock.patch('playground.calendar_rsvp.send_cancellation_emails'),
+        ]
+        self.emails = [p.start() for p in patches][-1]
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    def apply(self, status_str, **options):
+        from playground.calendar_rsvp import apply_rsvp
+        apply_rsvp(self.user, 'ev1', status_str, **options)
+        self.assertEqual(len(self.calendar.patches), 1)
+        return self.calendar.patches[0]
+
+    def test_get_link_marks_disputed_and_notifies(self):
+        patch = self.apply('disputed')
+        self.assertEqual(patch['body']['extendedProperties'], {'private': {'disputed': 'true'}})
+        self.assertEqual(patch['sendUpdates'], 'all')
+
+    def test_get_link_cant_attend_writes_no_cancellation_markers(self):
+        patch = self.apply('cant_attend')
+        self.assertNotIn('extendedProperties', patch['body'])
+        self.assertEqual(patch['sendUpdates'], 'all')
+
+    def test_post_cant_attend_stores_reason_and_stays_silent(self):
+        patch = self.apply('cant_attend', cancellation=True, cancel_reason='Sick')
+        self.assertEqual(patch['body']['extendedProperties'], {'private': {
+            'cant_attend': 'true', 'cancelled_by': 'tutor@example.com', 'cancel_reason': 'Sick',
+        }})
+        self.assertEqual(patch['sendUpdates'], 'none')
+        self.emails.assert_not_called()
+
+    def test_post_cant_attend_with_emails_sends_ours(self):
+        patch = self.apply('cant_attend', cancellation=True, send_emails=True)
+        self.assertEqual(patch['sendUpdates'], 'none')
+        self.emails.assert_called_once()
+
+    def test_post_disputed_writes_no_marker(self):
+        patch = self.apply('disputed', cancellation=True)
+        self.assertNotIn('extendedProperties', patch['body'])
+        self.assertEqual(patch['sendUpdates'], 'all')
+
+    def test_view_queues_with_the_entry_points_marking(self):
+        client = APIClient()
+        with mock.patch('playground.views.queue_rsvp_update', return_value=True) as queue:
+            response = client.get('/api/google/update-rsvp/', {'user_id': self.user.id, 'event_id': 'ev1', 'status': 'disputed'})
+            self.assertEqual(response.status_code, 202)
+            self.assertFalse(queue.call_args.kwargs['cancellation'])
+
+            response = client.post('/api/google/update-rsvp/', {'user_id': self.user.id, 'event_id': 'ev1', 'status': 'cant_attend'}, format='json')
+            self.assertEqual(response.status_code, 202)
+            self.assertTrue(queue.call_args.kwargs['cancellation'])
+
+    def test_task_applies_the_queued_choice(self):
+        from playground.tasks import update_google_calendar_rsvp_async
+        queued = {'status': 'cant_attend', 'calendar_id': 'primary', 'cancel_reason': 'Sick',
+                  'send_emails': False, 'cancellation': True}
+        with mock.patch('playground.calendar_rsvp.take_queued_status', return_value=queued):
+            result = update_google_calendar_rsvp_async.run(self.user.id, 'ev1')
+        self.assertTrue(result['success'])
+        self.assertEqual(self.calendar.patches[0]['body']['extendedProperties']['private']['cancel_reason'], 'Sick')
+
+
+class RealtimeEventTests(TestCase):
+    """Signal handlers publish to the right channels without querying during the save."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent')
+        self.tutor = make_user('tutor', 'tutor')
+        self.student = make_user('student', 'student', parent=self.parent)
+        self.request = TutoringRequest.objects.create(
+            parent=self.parent, student=self.student, subject='Math', description='Help',
+        )
+
+    def test_reply_event_uses_cached_request(self):
+        with mock.patch('playground.realtime.publish') as publish:
+            with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+                TutorResponse.objects.create(request=self.request, tutor=self.tutor, message='I can help')
+        channels, event, _ = publish.call_args.args
+        self.assertEqual(event, 'reply.created')
+        self.assertEqual(set(channels), {'role:admin', f'user:{self.parent.id}', f'user:{self.tutor.id}'})
+
+    def test_dispute_event_reaches_tutor_and_parent(self):
+        from playground.models import HourDispute
+        from playground.signals import publish_dispute_event
+        hour = Hours.objects.create(
+            tutor=self.tutor, student=self.student, parent=self.parent, date=datetime.date(2024, 1, 1),
+            startTime=datetime.time(10), endTime=datetime.time(11), totalTime=1, location='Online',
+        )
+        dispute = HourDispute.objects.create(hour=hour, complainer=self.parent, message='Wrong time')
+        with mock.patch('playground.realtime.publish') as publish:
+            with self.assertNumQueries(0), self.captureOnCommitCallbacks(execute=True):
+                publish_dispute_event(HourDispute, dispute, created=True)
+        channels, event, _ = publish.call_args.args
+        self.assertEqual(event, 'dispute.created')
+        self.assertEqual(set(channels), {'role:admin', f'user:{self.parent.id}', f'user:{self.tutor.id}'})
+
+
+    @override_settings(REALTIME_HEARTBEAT_SECONDS=0, REALTIME_STREAM_MAX_SECONDS=60)
+    def test_stream_ends_when_user_is_no_longer_allowed(self):
+        from playground.realtime import event_stream
+        answers = [True, True, False]
+
+        async def still_allowed():
+            return answers.pop(0)
+
+        async def read():
+            return [chunk async for chunk in event_stream({f'user:{self.parent.id}'}, still_allowed)]
+
+        chunks = asyncio.run(read())
+        self.assertTrue(chunks[0].startswith('retry:'))
+        self.assertEqual(chunks[1:], [': ping\n\n', ': ping\n\n'])
+        self.assertEqual(answers, [])
+
+
+class RequestSearchTests(TestCase):
+    """Full-text request search ranks subject matches first and keeps its index in sync."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent')
+        self.student = make_user('student', 'student', parent=self.parent)
+
+    def add_request(self, subject, description):
+        return TutoringRequest.objects.create(
+            parent=self.parent, student=self.student, subject=subject, description=description,
+        )
+
+    def search(self, text):
+        from playground.request_search import search_requests
+        return list(search_requests(TutoringRequest.objects.all(), text).order_by('-search_rank', '-id'))
+
+    def test_subject_match_outranks_description_match(self):
+        in_description = self.add_request('Science', 'Needs help with chemistry homework')
+        in_subject = self.add_request('Chemistry', 'Grade 11 course')
+        self.add_request('Math', 'Algebra')
+        self.assertEqual(self.search('chemistry'), [in_subject, in_description])
+        self.assertEqual(self.search('chem'), [in_subject, in_description])
+
+    def test_missing_triggers_are_restored(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 triggers only exist on SQLite')
+        from playground.request_search import FTS_TABLE, ensure_search_index
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TABLE}_ai')
+        unindexed = self.add_request('Physics', 'Kinematics')
+        self.assertEqual(self.search('physics'), [])
+
+        self.assertEqual(ensure_search_index(), [f'{FTS_TABLE}_ai'])
+        self.assertEqual(self.search('physics'), [unindexed])
+        self.assertEqual(self.search('kinematics'), [unindexed])
+        self.assertEqual(ensure_search_index(), [])
+
+
+@override_settings(GOOGLE_CLIENT_ID='client', GOOGLE_CLIENT_SECRET='secret')
+class GoogleTokenManagerTests(TestCase):
+    """GoogleTokenManager refreshes once, defers to a concurrent winner and drops revoked refresh tokens."""
+
+    def setUp(self):
+        from playground.google_tokens import GoogleTokenManager
+
+        self.manager = GoogleTokenManager()
+        self.user = make_user(
+            'tutor', 'tutor', _encrypted_google_refresh_token='refresh-1', _encrypted_google_access_token='expired',
+            google_token_expiry=timezone.now() - datetime.timedelta(minutes=1),
+        )
+
+    def google_answers(self, status_code, body, side_effect=None):
+        def post(*args, **kwargs):
+            if side_effect:
+                side_effect()
+            return mock.Mock(status_code=status_code, json=lambda: body)
+        return mock.patch('playground.google_tokens.requests.post', side_effect=post)
+
+    def stored(self):
+        return User.objects.values_list(
+            '_encrypted_google_access_token', '_encrypted_google_refresh_token',
+        ).get(pk=self.user.pk)
+
+    def test_refreshed_token_is_then_served_from_memory(self):
+        with self.google_answers(200, {'access_token': 'fresh', 'expires_in': 3600}) as post:
+            self.assertEqual(self.manager.get_access_token(self.user), 'fresh')
+            with self.assertNumQueries(0):
+                self.assertEqual(self.manager.get_access_token(self.user), 'fresh')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(self.stored(), ('fresh', 'refresh-1'))
+
+    def test_concurrent_refresh_keeps_the_first_write(self):
+        def other_worker_refreshes():
+            User.objects.filter(pk=self.user.pk).update(
+                _encrypted_google_access_token='theirs',
+                google_token_expiry=timezone.now() + datetime.timedelta(hours=1),
+            )
+
+        with self.google_answers(200, {'access_token': 'ours', 'expires_in': 3600}, other_worker_refreshes):
+            self.assertEqual(self.manager.get_access_token(self.user), 'theirs')
+        self.assertEqual(self.stored(), ('theirs', 'refresh-1'))
+        self.assertEqual(self.user.access_token, 'theirs')
+
+    def test_invalid_grant_clears_the_refresh_token(self):
+        from playground.google_tokens import RECONNECT_GOOGLE
+
+        with self.google_answers(400, {'error': 'invalid_grant'}):
+            self.assertEqual(self.manager.get_access_token(self.user), RECONNECT_GOOGLE)
+        self.assertEqual(self.stored(), ('expired', None))
+        with self.google_answers(200, {}) as post:
+            self.assertEqual(self.manager.get_access_token(self.user), RECONNECT_GOOGLE)
+        post.assert_not_called()
+
+    def test_other_failures_keep_the_refresh_token(self):
+        with self.google_answers(500, {'error': 'backend_error'}):
+            self.assertIsNone(self.manager.get_access_token(self.user))
+        self.assertEqual(self.stored(), ('expired', 'refresh-1'))
+
+
+def egs_event(event_id, summary='Math', **extra):
+    return {
+        'id': event_id, 'status': 'confirmed', 'summary': summary, 'etag': f'"{event_id}"',
+        'start': {'dateTime': '2024-01-01T10:00:00Z'}, 'end': {'dateTime': '2024-01-01T11:00:00Z'},
+        'extendedProperties': {'shared': {'egs_tutoring': 'true'}}, **extra,
+    }
+
+
+class CalendarSyncTests(TestCase):
+    """sync_user_calendar keeps the local EGS event copy current, falling back to a full resync on 410."""
+
+    def setUp(self):
+        self.user = make_user('tutor', 'tutor')
+        token = mock.patch('playground.calendar_sync.google_token_manager.get_access_token', return_value='token')
+        token.start()
+        self.addCleanup(token.stop)
+
+    def google_lists(self, pages):
+        """Patch events.list; pages maps the syncToken sent (or None) to a status code or page body."""
+        calls = []
+
+        def get(url, headers, params, timeout):
+            calls.append(params.get('syncToken'))
+            page = pages[params.get('syncToken')]
+            if isinstance(page, int):
+                return mock.Mock(status_code=page, text='')
+            return mock.Mock(status_code=200, json=lambda: page)
+        return mock.patch('playground.calendar_sync.requests.get', side_effect=get), calls
+
+    def sync(self, pages):
+        from playground.calendar_sync import sync_user_calendar
+
+        patch, calls = self.google_lists(pages)
+        with patch:
+            result = sync_user_calendar(self.user)
+        return result, calls
+
+    def stored(self):
+        from playground.models import CalendarEvent
+        return dict(CalendarEvent.objects.filter(user=self.user).values_list('google_event_id', 'summary'))
+
+    def state(self):
+        from playground.models import CalendarSyncState
+        return CalendarSyncState.objects.get(user=self.user)
+
+    def test_full_then_incremental_sync(self):
+        personal = {'id': 'dentist', 'status': 'confirmed', 'summary': 'Dentist'}
+        result, calls = self.sync({None: {'items': [egs_event('a'), egs_event('b'), personal], 'nextSyncToken': 't1'}})
+        self.assertEqual((result['full'], calls), (True, [None]))
+        self.assertEqual(self.stored(), {'a': 'Math', 'b': 'Math'})
+
+        changes = {'items': [egs_event('a', 'Physics'), {'id': 'b', 'status': 'cancelled'}], 'nextSyncToken': 't2'}
+        result, calls = self.sync({'t1': changes})
+        self.assertEqual((result['full'], calls), (False, ['t1']))
+        self.assertEqual(self.stored(), {'a': 'Physics'})
+        self.assertEqual(self.state().sync_token, 't2')
+
+    def test_expired_sync_token_falls_back_to_full_resync(self):
+        self.sync({None: {'items': [egs_event('a'), egs_event('b')], 'nextSyncToken': 't1'}})
+        result, calls = self.sync({'t1': 410, None: {'items': [egs_event('b')], 'nextSyncToken': 't9'}})
+        self.assertEqual((result['success'], result['full'], calls), (True, True, ['t1', None]))
+        # A full listing that no longer has 'a' removes it locally
+        self.assertEqual(self.stored(), {'b': 'Math'})
+        state = self.state()
+        self.assertEqual(state.sync_token, 't9')
+        self.assertIsNotNone(state.last_full_sync_at)
+
+    def test_api_error_keeps_the_sync_token(self):
+        self.sync({None: {'items': [egs_event('a')], 'nextSyncToken': 't1'}})
+        result, _ = self.sync({'t1': 500})
+        self.assertFalse(result['success'])
+        state = self.state()
+        self.assertEqual(state.sync_token, 't1')
+        self.assertIn('500', state.last_error)
+
+    def test_local_listing_filters_on_properties(self):
+        from playground.calendar_sync import local_events_response
+
+        self.sync({None: {'items': [egs_event('a'), egs_event('b', extendedProperties={'shared': {
+            'egs_tutoring': 'true', 'student_id': '7'}})], 'nextSyncToken': 't1'}})
+        items = local_events_response(self.user, shared_props=['student_id=7'])['items']
+        self.assertEqual([item['id'] for item in items], ['b'])
+        with self.assertRaises(ValueError):
+            local_events_response(self.user, shared_props=['student_id__gt=1'])
+
+
+class EventsCacheTests(TestCase):
+    """fetch_events serves fresh listings from cache and revalidates stale ones with Google's ETag."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.params = {'timeMin': '2024-01-01T00:00:00Z', 'singleEvents': True}
+
+    def google(self, *responses):
+        return mock.patch('playground.calendar_cache.requests.get', side_effect=[
+            mock.Mock(status_code=status, json=lambda body=body: body, headers=headers)
+            for status, body, headers in responses
+        ])
+
+    def fetch(self, at):
+        from playground.calendar_cache import fetch_events
+        with mock.patch('playground.calendar_cache.time.time', return_value=at):
+            return fetch_events(7, 'token', self.params)
+
+    @override_settings(GOOGLE_EVENTS_CACHE_TTL_SECONDS=60)
+    def test_fresh_hit_then_revalidation(self):
+        body = {'items': [{'id': 'a'}]}
+        with self.google((200, body, {'ETag': '"g1"'}), (304, {}, {})) as get:
+            status, first, etag = self.fetch(1000)
+            self.assertEqual(self.fetch(1030), (200, first, etag))
+            self.assertEqual(get.call_count, 1)
+
+            self.assertEqual(self.fetch(1100), (200, body, etag))
+            self.assertEqual(get.call_count, 2)
+            self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"g1"')
+            # The 304 renewed the entry
+            self.fetch(1130)
+            self.assertEqual(get.call_count, 2)
+
+    def test_invalidate_forces_a_refetch(self):
+        from playground.calendar_cache import invalidate_events_cache
+        with self.google((200, {'items': []}, {}), (200, {'items': [{'id': 'new'}]}, {})) as get:
+            self.fetch(1000)
+            invalidate_events_cache(7)
+            status, body, _ = self.fetch(1001)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(body['items'], [{'id': 'new'}])
+
+    def test_errors_are_not_cached(self):
+        with self.google((500, {'error': 'backend'}, {}), (200, {}, {})) as get:
+            self.assertEqual(self.fetch(1000), (500, {'error': 'backend'}, None))
+            status, body, etag = self.fetch(1001)
+        self.assertEqual((status, body['items'], get.call_count), (200, [], 2))
+        self.assertIsNotNone(etag)
+
+    def test_matching_if_none_match_is_a_304(self):
+        from playground.calendar_cache import compute_etag, etag_response
+
+        data = {'items': [{'id': 'a'}]}
+        etag = compute_etag(data)
+        request = APIRequestFactory().get('/', HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        response = etag_response(request, data)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        response = etag_response(APIRequestFactory().get('/', HTTP_IF_NONE_MATCH='"other"'), data)
+        self.assertEqual((response.status_code, response.data), (200, data))
+
+
+def batch_response(parts, boundary='batch_resp'):
+    """A Google batch reply; parts are (item index, status line, JSON body or None)."""
+    chunks = []
+    for index, status_line, body in parts:
+        payload = '' if body is None else json.dumps(body)
+        chunks.append(
+            f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-item-{index}>\r\n\r\n'
+            f'HTTP/1.1 {status_line}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{payload}\r\n'
+        )
+    return mock.Mock(
+        status_code=200, text=''.join(chunks) + f'--{boundary}--\r\n',
+        headers={'Content-Type': f'multipart/mixed; boundary={boundary}'},
+    )
+
+
+class GroupCalendarBatchTests(TestCase):
+    """Group class events go to Google as multipart batches and come back matched to their operation."""
+
+    def test_encoded_parts_carry_their_own_auth(self):
+        from playground.group_calendar import EVENTS_PATH, _encode_batch
+
+        body = _encode_batch([
+            {'method': 'POST', 'path': EVENTS_PATH, 'token': 'parent-1', 'body': {'summary': 'Class'}},
+            {'method': 'DELETE', 'path': f'{EVENTS_PATH}/ev2', 'token': 'parent-2'},
+        ], 'b1')
+        parts = body.split('--b1')
+        self.assertEqual(parts[-1], '--\r\n')
+        self.assertIn('Content-ID: <item-0>\r\n\r\nPOST /calendar/v3/calendars/primary/events\r\n'
+                      'Authorization: Bearer parent-1\r\nContent-Type: application/json\r\n\r\n{"summary": "Class"}', parts[1])
+        self.assertIn('DELETE /calendar/v3/calendars/primary/events/ev2\r\nAuthorization: Bearer parent-2', parts[2])
+
+    def test_decoded_results_follow_content_ids(self):
+        from playground.group_calendar import _decode_batch
+
+        response = batch_response([
+            (1, '204 No Content', None),
+            (0, '200 OK', {'id': 'ev1', 'etag': '"1"'}),
+            (2, '404 Not Found', {'error': {'code': 404}}),
+        ])
+        self.assertEqual(_decode_batch(response), {
+            0: (200, {'id': 'ev1', 'etag': '"1"'}), 1: (204, None), 2: (404, {'error': {'code': 404}}),
+        })
+
+    def test_execute_batch_splits_at_the_limit_and_keeps_order(self):
+        from playground.group_calendar import BATCH_LIMIT, execute_batch
+
+        def post(url, headers, data, timeout):
+            count = data.decode().count('Content-ID: <item-')
+            return batch_response([(i, '200 OK', {'n': i}) for i in reversed(range(count))])
+
+        operations = [{'method': 'DELETE', 'path': f'/e/{i}', 'token': 't'} for i in range(BATCH_LIMIT + 2)]
+        with mock.patch('playground.group_calendar.requests.post', side_effect=post) as requests_post:
+            results = execute_batch(operations)
+        self.assertEqual(requests_post.call_count, 2)
+        self.assertEqual(results, [(200, {'n': i}) for i in range(BATCH_LIMIT)] + [(200, {'n': 0}), (200, {'n': 1})])
+
+    def test_recurrence_ends_at_local_midnight(self):
+        from playground.group_calendar import recurrence_until
+
+        self.assertEqual(recurrence_until(datetime.date(2024, 1, 31)), '20240201T045959Z')
+        self.assertEqual(recurrence_until(datetime.date(2024, 7, 31)), '20240801T035959Z')
+
+
+class GeocodeQueueTests(TestCase):
+    """Saving a tutor or parent queues one geocode per real address change."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.tutor = make_user('tutor', 'tutor')
+        delay = mock.patch('playground.tasks.geocode_user_async.delay')
+        self.delay = delay.start()
+        self.addCleanup(delay.stop)
+
+    def save(self, **fields):
+        for name, value in fields.items():
+            setattr(self.tutor, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor.save()
+
+    def test_one_job_per_address(self):
+        from playground.mapulus_service import address_hash
+
+        self.save(address='123 Main Street, Unit 4', city='Toronto')
+        self.save(firstName='Tam')
+        expected = address_hash('123 Main Street, Unit 4', 'Toronto')
+        self.delay.assert_called_once_with(self.tutor.id, expected)
+
+        # Once geocoded, the same address spelled differently isn't redone
+        User.objects.filter(pk=self.tutor.pk).update(geocode_address_hash=expected)
+        self.tutor.refresh_from_db()
+        self.save(address='123 main st')
+        self.assertEqual(self.delay.call_count, 1)
+
+        self.save(address='9 Queen St W')
+        self.assertEqual(self.delay.call_count, 2)
+
+    def test_partial_saves_and_students_are_skipped(self):
+        self.tutor.address, self.tutor.city = '123 Main St', 'Toronto'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tutor.save(update_fields=['firstName'])
+        student = make_user('student', 'student', parent=make_user('parent', 'parent'))
+        student.address, student.city = '1 Yonge St', 'Toronto'
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+        self.delay.assert_not_called()
+
+    def test_task_skips_an_address_changed_since_queueing(self):
+        from playground.tasks import geocode_user_async
+
+        User.objects.filter(pk=self.tutor.pk).update(address='9 Queen St W', city='Toronto')
+        with mock.patch('playground.mapulus_service.geocode_user_address') as geocode:
+            result = geocode_user_async(self.tutor.id, 'hash-of-an-older-address')
+        self.assertEqual(result['skipped'], 'address changed')
+        geocode.assert_not_called()
+
+
+@override_settings(MAPULUS_API_KEY='key', GEOCODE_CACHE_TTL_DAYS=30, GEOCODE_LRU_SIZE=2)
+class GeocodeCacheTests(TestCase):
+    """Geocodes are shared per normalized address through the table and a TTL-bound LRU."""
+
+    def setUp(self):
+        from playground import geocode_cache
+        geocode_cache.clear_lru()
+        self.addCleanup(geocode_cache.clear_lru)
+        self.result = {'latitude': 43.65, 'longitude': -79.38, 'formatted_address': '123 Main St, Toronto'}
+
+    def test_same_building_is_geocoded_once(self):
+        from playground.mapulus_service import MapulusGeocoder
+
+        reply = {'status': 'OK', 'results': [{
+            'geometry': {'location': {'lat': 43.65, 'lng': -79.38}}, 'formatted_address': '123 Main St, Toronto',
+        }]}
+        with mock.patch('playground.mapulus_service.requests.get') as get:
+            get.return_value.json.return_value = reply
+            first = MapulusGeocoder().geocode_address('123 Main Street, Unit 4', 'Toronto')
+            second = MapulusGeocoder().geocode_address('123 MAIN ST. #9', 'toronto')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_table_hit_fills_the_lru(self):
+        from playground import geocode_cache
+
+        geocode_cache.store('123 main st, toronto', self.result)
+        geocode_cache.clear_lru()
+        self.assertEqual(geocode_cache.lookup('123 main st, toronto'), self.result)
+        with self.assertNumQueries(0):
+            self.assertEqual(geocode_cache.lookup('123 main st, toronto'), self.result)
+
+    def test_lru_entries_expire_with_the_ttl(self):
+        from playground import geocode_cache
+
+        geocode_cache.store('123 main st, toronto', self.result)
+        later = timezone.now() + datetime.timedelta(days=31)
+        with mock.patch('playground.geocode_cache.timezone.now', return_value=later):
+            self.assertIsNone(geocode_cache.lookup('123 main st, toronto'))
+
+    def test_lru_evicts_least_recently_used(self):
+        from playground import geocode_cache
+
+        for key in ('a', 'b'):
+            geocode_cache.store(key, self.result)
+        geocode_cache.lookup('a')
+        geocode_cache.store('c', self.result)
+        with self.assertNumQueries(0):
+            geocode_cache.lookup('a')
+            geocode_cache.lookup('c')
+        self.assertEqual(geocode_cache.geocode_cache_stats()['process']['lru_size'], 2)
+        with self.assertNumQueries(2):
+            self.assertEqual(geocode_cache.lookup('b'), self.result)
+
+
+class BackfillGeocodesTests(TestCase):
+    """backfill_geocodes looks each distinct address up once and parks failures at the city centre."""
+
+    def setUp(self):
+        from playground import geocode_cache
+        geocode_cache.clear_lru()
+        self.addCleanup(geocode_cache.clear_lru)
+        self.neighbours = [
+            make_user(f'parent{i}', 'parent', address=f'12 King Street West, Unit {i}', city='Toronto')
+            for i in range(2)
+        ]
+        self.unknown = make_user('tutor', 'tutor', address='1 Nowhere Lane', city='Toronto')
+        placed = make_user('placed', 'parent', address='5 Bay St', city='Toronto')
+        User.objects.filter(pk=placed.pk).update(latitude=43.6, longitude=-79.3, location_is_approximate=False)
+
+    def backfill(self, **options):
+        def geocode(address, city):
+            if 'Nowhere' in address:
+                return None
+            return {'latitude': 43.648, 'longitude': -79.381, 'formatted_address': '12 King St W, Toronto'}
+
+        with mock.patch('playground.mapulus_service.MapulusGeocoder.geocode_address', side_effect=geocode) as lookup:
+            call_command('backfill_geocodes', workers=1, rps=0, stdout=io.StringIO(), **options)
+        return lookup
+
+    def test_backfill_shares_lookups_and_skips_known_failures(self):
+        lookup = self.backfill()
+        self.assertEqual(sorted(call.args[0] for call in lookup.call_args_list),
+                         ['1 Nowhere Lane', '12 King Street West, Unit 0'])
+        for user in self.neighbours:
+            user.refresh_from_db()
+            self.assertEqual((float(user.latitude), user.location_is_approximate), (43.648, False))
+        self.unknown.refresh_from_db()
+        self.assertTrue(self.unknown.location_is_approximate)
+        self.assertEqual(float(self.unknown.latitude), 43.6532)
+
+        self.assertEqual(self.backfill().call_count, 0)
+        self.assertEqual(self.backfill(retry_failed=True).call_count, 1)
+
+
+class ApproximateLocationTests(TestCase):
+    """New addresses are placed at the city centroid until the precise geocode replaces it."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_city_centroid_lookup(self):
+        from playground.city_centroids import city_centroid
+
+        self.assertEqual(city_centroid(' toronto ')['formatted_address'], 'Toronto, Ontario, Canada')
+        self.assertIsNone(city_centroid('Atlantis'))
+        self.assertIsNone(city_centroid(None))
+
+    def test_saved_address_is_placed_at_the_centroid_right_away(self):
+        parent = make_user('parent', 'parent', address='12 King St W', city='Waterloo')
+        parent.refresh_from_db()
+        self.assertEqual((float(parent.latitude), float(parent.longitude)), (43.4643, -80.5204))
+        self.assertTrue(parent.location_is_approximate)
+        self.assertTrue(parent.geohash)
+
+    def geocode(self, user, result):
+        from playground.mapulus_service import geocode_user_address
+        with mock.patch('playground.mapulus_service.MapulusGeocoder.geocode_address', return_value=result):
+            return geocode_user_address(user)
+
+    def test_precise_geocode_replaces_the_centroid(self):
+        from playground.mapulus_service import marker_payload
+
+        parent = make_user('parent', 'parent', address='12 King St W', city='Waterloo')
+        self.assertFalse(self.geocode(parent, None))
+        parent.refresh_from_db()
+        self.assertTrue(parent.location_is_approximate)
+        self.assertTrue(marker_payload(parent)['metadata']['approximate'])
+
+        result = {'latitude': 43.4651, 'longitude': -80.5226, 'formatted_address': '12 King St W, Waterloo'}
+        self.assertTrue(self.geocode(parent, result))
+        parent.refresh_from_db()
+        self.assertEqual((float(parent.latitude), parent.location_is_approximate), (43.4651, False))
+        self.assertFalse(marker_payload(parent)['metadata']['approximate'])
+
+    def test_failed_geocode_keeps_a_precise_location(self):
+        parent = make_user('parent', 'parent', address='12 King St W', city='Waterloo')
+        User.objects.filter(pk=parent.pk).update(latitude=43.4651, longitude=-80.5226, location_is_approximate=False)
+        parent.refresh_from_db()
+        parent.address = '14 King St W'
+        self.assertFalse(self.geocode(parent, None))
+        parent.refresh_from_db()
+        self.assertEqual((float(parent.latitude), parent.location_is_approximate), (43.4651, False))
+
+
+class MarkerReconcileTests(TestCase):
+    """plan_marker_sync diffs users against the map by stored marker ID and EGS user_id."""
+
+    def user(self, user_id, roles='tutor', marker_id='', latitude=43.65, **extra):
+        return User(id=user_id, roles=roles, firstName='T', lastName=str(user_id), email=f'u{user_id}@example.com',
+                    city='Toronto', latitude=latitude, longitude=-79.38, mapulus_marker_id=marker_id, **extra)
+
+    def marker(self, user, layer='tutors', user_id=None, latitude=None):
+        from playground.mapulus_service import marker_payload
+        payload = marker_payload(user) or {'latitude': 0, 'longitude': 0}
+        return (layer, {
+            'latitude': payload['latitude'] if latitude is None else latitude, 'longitude': payload['longitude'],
+            'metadata': {'user_id': user.id if user_id is None else user_id},
+        })
+
+    def plan(self, users, remote):
+        from playground.mapulus_sync import plan_marker_sync
+        return sorted((op['kind'], op['marker_id'], op['user'].id if op['user'] else None)
+                      for op in plan_marker_sync(users, remote))
+
+    def test_plan(self):
+        from playground.mapulus_service import marker_payload, payload_hash
+
+        synced = self.user(1, marker_id='m1')
+        synced.mapulus_marker_hash = payload_hash(marker_payload(synced))
+        moved = self.user(2, marker_id='m2', latitude=43.70)
+        unlinked = self.user(3)
+        new = self.user(4)
+        inactive = self.user(5, marker_id='m5', is_active=False)
+        gone_marker = self.user(6, marker_id='m6-deleted-remotely', is_active=False)
+        now_parent = self.user(7, roles='parent', marker_id='m7')
+        remote = {
+            'm1': self.marker(synced),
+            'm2': self.marker(moved, latitude=43.65),
+            'm3': self.marker(unlinked),
+            'm3-duplicate': self.marker(unlinked),
+            'm5': self.marker(inactive),
+            'm7': self.marker(now_parent, layer='tutors'),
+            'hand-placed': ('parents', {'latitude': 43.0, 'longitude': -79.0, 'metadata': {}}),
+            'departed': ('tutors', {'latitude': 43.0, 'longitude': -79.0, 'metadata': {'user_id': 99}}),
+        }
+        self.assertEqual(self.plan([synced, moved, unlinked, new, inactive, gone_marker, now_parent], remote), sorted([
+            ('update', 'm2', 2),
+            ('update', 'm3', 3),
+            ('delete', 'm3-duplicate', None),
+            ('create', None, 4),
+            ('delete', 'm5', 5),
+            ('forget', 'm6-deleted-remotely', 6),
+            ('delete', 'm7', None),
+            ('create', None, 7),
+            ('delete', 'departed', None),
+        ]))
+
+    def test_update_of_a_vanished_marker_recreates_it(self):
+        from playground.mapulus_service import MARKER_NOT_FOUND
+        from playground.mapulus_sync import apply_marker_operations, plan_marker_sync
+
+        tutor = make_user('tutor', 'tutor', city='Toronto', latitude=43.65, longitude=-79.38, mapulus_marker_id='old')
+        geocoder = mock.Mock()
+        geocoder.update_marker.return_value = MARKER_NOT_FOUND
+        geocoder.add_marker_to_layer.return_value = {'id': 42}
+        operations = plan_marker_sync([tutor], {'old': self.marker(tutor, latitude=40.0)})
+        counts = apply_marker_operations(geocoder, operations, batch_size=10)
+        self.assertEqual((counts['created'], counts['failed']), (1, 0))
+        tutor.refresh_from_db()
+        self.assertEqual(tutor.mapulus_marker_id, '42')
+        self.assertTrue(tutor.mapulus_marker_hash)
+
+
+class SpatialIndexTests(TestCase):
+    """The KD-tree and geohash covers agree with brute-force great-circle distances."""
+
+    def setUp(self):
+        rng = random.Random(37)
+        # Southern Ontario plus a few points across the antimeridian and near a pole
+        self.points = [(i, rng.uniform(42, 46), rng.uniform(-83, -76)) for i in range(300)]
+        self.points += [(1000 + i, rng.uniform(-10, 10), rng.choice([-1, 1]) * rng.uniform(178, 180)) for i in range(30)]
+        self.points += [(2000 + i, rng.uniform(88, 90), rng.uniform(-180, 180)) for i in range(30)]
+        self.targets = [(43.65, -79.38), (44.0, -80.5), (0.0, 179.9), (89.5, 10.0)]
+
+    def brute_force(self, latitude, longitude):
+        from playground.spatial_index import haversine_km
+        return sorted((haversine_km(latitude, longitude, lat, lng), key) for key, lat, lng in self.points)
+
+    def test_nearest_matches_brute_force(self):
+        from playground.spatial_index import KDTree
+
+        tree = KDTree(self.points)
+        for latitude, longitude in self.targets:
+            expected = self.brute_force(latitude, longitude)
+            found = tree.nearest(latitude, longitude, 10)
+            self.assertEqual([key for _, key in found], [key for _, key in expected[:10]])
+            for (km, _), (expected_km, _) in zip(found, expected):
+                self.assertAlmostEqual(km, expected_km, places=6)
+            capped = tree.nearest(latitude, longitude, 50, max_km=150)
+            self.assertEqual([key for _, key in capped], [key for km, key in expected[:50] if km <= 150])
+
+    def test_within_matches_brute_force(self):
+        from playground.spatial_index import KDTree
+
+        tree = KDTree(self.points)
+        for latitude, longitude in self.targets:
+            for radius in (5, 60, 400):
+                expected = [key for km, key in self.brute_force(latitude, longitude) if km <= radius]
+                self.assertEqual([key for _, key in tree.within(latitude, longitude, radius)], expected)
+
+    def test_geohash_cover_contains_every_point_in_range(self):
+        from playground.spatial_index import covering_geohashes, geohash_encode, haversine_km
+
+        self.assertEqual(geohash_encode(57.64911, 10.40744), 'u4pruydqq')
+        for latitude, longitude in self.targets[:2]:
+            for radius in (5, 60):
+                prefixes = tuple(covering_geohashes(latitude, longitude, radius))
+                self.assertLessEqual(len(prefixes), 16)
+                for _, lat, lng in self.points:
+                    if haversine_km(latitude, longitude, lat, lng) <= radius:
+                        self.assertTrue(geohash_encode(lat, lng).startswith(prefixes))
+
+    def test_tutor_index_rebuilds_after_invalidation(self):
+        from playground.spatial_index import invalidate_tutor_index, tutor_index
+
+        near = make_user('near', 'tutor')
+        User.objects.filter(pk=near.pk).update(latitude=43.66, longitude=-79.39)
+        invalidate_tutor_index()
+        self.assertEqual([key for _, key in tutor_index().nearest(43.65, -79.38, 5)], [near.id])
+        with self.assertNumQueries(0):
+            tutor_index()
+
+        far = make_user('far', 'tutor')
+        User.objects.filter(pk=far.pk).update(latitude=45.42, longitude=-75.69, location_is_approximate=True)
+        invalidate_tutor_index()
+        index = tutor_index()
+        self.assertEqual([key for _, key in index.nearest(43.65, -79.38, 5)], [near.id, far.id])
+        self.assertTrue(index.approximate[far.id])
+
+
+class TutorRankingTests(TestCase):
+    """rank_tutors scores tutors from TutorMatchFeatures; refresh_match_features builds those rows."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent')
+        User.objects.filter(pk=self.parent.pk).update(latitude=43.65, longitude=-79.38)
+        self.parent.refresh_from_db()
+        self.student = make_user('student', 'student', parent=self.parent)
+
+    def tutor(self, username, latitude=43.66, longitude=-79.39, **features):
+        tutor = make_user(username, 'tutor')
+        User.objects.filter(pk=tutor.pk).update(latitude=latitude, longitude=longitude)
+        TutorMatchFeatures.objects.create(tutor=tutor, stale=False, **features)
+        return tutor
+
+    def request(self, **fields):
+        return TutoringRequest.objects.create(parent=self.parent, student=self.student, description='Help',
+                                              **{'subject': 'Gr. 11 Maths', 'grade': '11', 'service': 'Online', **fields})
+
+    def test_subject_keywords(self):
+        from playground.tutor_ranking import subject_keywords
+        self.assertEqual(subject_keywords('Gr. 11 Maths & Physics help'), {'math', 'physics'})
+
+    def test_blank_tutor_scores_the_neutral_components(self):
+        from playground.tutor_ranking import rank_tutors
+
+        tutor = self.tutor('blank')
+        [ranked] = rank_tutors(self.request())
+        self.assertEqual(ranked['tutor_id'], tutor.id)
+        self.assertEqual(ranked['components'], {
+            'subject': 0.0, 'grade': 0.0, 'mode': 0.5, 'distance': 1.0, 'load': 1.0, 'reliability': 1.0,
+        })
+        # 0.20 distance + 0.10 * 0.5 mode + 0.10 load + 0.10 reliability
+        self.assertEqual(ranked['score'], 0.45)
+
+    def test_experience_outranks_and_distance_excludes(self):
+        from playground.tutor_ranking import rank_tutors
+
+        expert = self.tutor('expert', subject_hours={'math': 40}, grade_matches=[0] * 11 + [3, 0, 0, 0],
+                            online_hours=40, in_person_hours=40, sessions=40)
+        novice = self.tutor('novice', subject_hours={'english': 40}, sessions=40)
+        disputed = self.tutor('disputed', subject_hours={'math': 40}, grade_matches=[0] * 11 + [3, 0, 0, 0],
+                              online_hours=40, in_person_hours=40, sessions=10, disputes=5, complaints=3)
+        ottawa = self.tutor('ottawa', latitude=45.42, longitude=-75.69, subject_hours={'math': 400})
+
+        # Online requests ignore distance
+        online = [row['tutor_id'] for row in rank_tutors(self.request())]
+        self.assertEqual(online, [expert.id, disputed.id, ottawa.id, novice.id])
+
+        in_person = rank_tutors(self.request(service='In-Person'))
+        self.assertNotIn(ottawa.id, [row['tutor_id'] for row in in_person])
+        self.assertEqual(in_person[0]['tutor_id'], expert.id)
+        self.assertEqual(in_person[0]['distance_km'], 1.4)
+
+    def test_refresh_aggregates_and_clears_stale(self):
+        from playground.tutor_ranking import GRADE_ORDER, refresh_match_features
+
+        tutor = make_user('tutor', 'tutor')
+        for location, total in (('Online', 2), ('In-Person', 1.5)):
+            Hours.objects.create(tutor=tutor, student=self.student, parent=self.parent, date=datetime.date(2024, 1, 1),
+                                 startTime=datetime.time(10), endTime=datetime.time(11), totalTime=total,
+                                 location=location, subject='Maths and Physics')
+        AcceptedTutor.objects.create(request=self.request(), parent=self.parent, student=self.student, tutor=tutor)
+
+        self.assertEqual(refresh_match_features(), 1)
+        features = TutorMatchFeatures.objects.get(tutor=tutor)
+        self.assertFalse(features.stale)
+        self.assertEqual(features.subject_hours, {'math': 3.5, 'physics': 3.5})
+        self.assertEqual((features.online_hours, features.in_person_hours, features.sessions), (2.0, 1.5, 2))
+        self.assertEqual(features.grade_matches[GRADE_ORDER.index('11')], 1)
+        self.assertEqual(refresh_match_features(), 0)
+
+
+class PersonalRequestListTests(TestCase):
+    """PersonalRequestListView hides requests whose latest tutor referral is still pending."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent')
+        self.tutor = make_user('tutor', 'tutor')
+        self.client = APIClient()
+
+    def add_request(self, *referral_statuses):
+        student = make_user(f'student{TutoringRequest.objects.count()}', 'student', parent=self.parent)
+        tutoring_request = TutoringRequest.objects.create(
+            parent=self.parent, student=student, subject='Math', description='Help',
+        )
+        sent = timezone.now() - datetime.timedelta(days=len(referral_statuses))
+        for i, status in enumerate(referral_statuses):
+            referral = TutorReferralRequest.objects.create(
+                parent=self.parent, student=student, tutor=self.tutor, subject='Math', grade='5', service='Online',
+                city='Toronto', description='Help', referral_code_used='ABC123', status=status,
+                token=f'{tutoring_request.id}-{i}', tutoring_request=tutoring_request,
+            )
+            TutorReferralRequest.objects.filter(pk=referral.pk).update(created_at=sent + datetime.timedelta(days=i))
+        return tutoring_request.id
+
+    def listed(self):
+        response = self.client.get('/api/requests/PersonalList/', {'id': self.parent.id})
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data}
+
+    def test_only_the_latest_referral_decides(self):
+        shown = {
+            self.add_request(),
+            self.add_request('declined'),
+            self.add_request('accepted'),
+            self.add_request('pending', 'declined'),
+        }
+        self.add_request('pending')
+        self.add_request('declined', 'pending')
+        self.assertEqual(self.listed(), shown)
+
+    def test_query_count_does_not_grow_with_requests(self):
+        for status in ('declined', 'pending', None):
+            self.add_request(*([status] if status else []))
+        with CaptureQueriesContext(connection) as few:
+            self.listed()
+        for _ in range(5):
+            self.add_request('accepted')
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.listed()), 7)
+        self.assertEqual(len(few), len(many))
+
+
+class UserLookupTests(IndexUsageMixin, TestCase):
+    """Role, parent and case-insensitive email lookups on User use its indexes."""
+
+    def setUp(self):
+        self.parent = make_user('parent', 'parent', email='Parent@Example.com')
+        for i in range(20):
+            make_user(f'student{i}', 'student', parent=self.parent)
+        make_user('tutor', 'tutor')
+
+    def test_role_queries_use_indexes(self):
+        self.assertUsesIndex(User.objects.filter(roles='tutor').order_by('-date_joined')[:10], 'user_roles_joined_idx')
+        self.assertUsesIndex(User.objects.filter(parent=self.parent, roles='student'), 'user_parent_roles_idx')
+
+    def test_email_iexact_uses_upper_index(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('iexact compiles to UPPER() only on PostgreSQL')
+        self.assertUsesIndex(User.objects.filter(email__iexact='parent@example.com'), 'user_email_upper_idx')
+
+    def test_registration_rejects_an_email_in_another_case(self):
+        from playground.serializers import UserRegistrationSerializer
+
+        serializer = UserRegistrationSerializer(data={
+            'username': 'newparent', 'password': 'long-enough-password', 'firstName': 'New', 'lastName': 'Parent',
+            'address': '1 Main St', 'city': 'Toronto', 'roles': 'parent', 'email': 'PARENT@example.COM',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['email'], ['E-mail already in use.'])
+
+    def test_referral_to_an_existing_email_in_another_case_is_refused(self):
+        client = APIClient()
+        client.force_authenticate(self.parent)
+        response = client.post('/api/referral/create/', {
+            'sender_id': self.parent.id, 'receiver_email': 'parent@EXAMPLE.com',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'This user already exists.')
@@ -0,0 +1,245 @@
+# playground/tutor_ranking.py
+import logging
+import re
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from playground.spatial_index import EARTH_RADIUS_KM, request_location
+
+logger = logging.getLogger(__name__)
+
+GRADE_ORDER = ['Kindergarten', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12',
+               'College', 'University']
+
+# Relative weight of each component in the final score (they sum to 1)
+WEIGHTS = {
+    'subject': 0.35,
+    'grade': 0.15,
+    'distance': 0.20,
+    'mode': 0.10,
+    'load': 0.10,
+    'reliability': 0.10,
+}
+
+# Subject experience stops adding to the score past this many hours
+SUBJECT_HOURS_SATURATION = 50.0
+# Distance score halves roughly every 10 km
+DISTANCE_SCALE_KM = 15.0
+# In-person requests never go to tutors known to be further away than this
+MAX_IN_PERSON_KM = 60.0
+# Score for tutors whose distance can't be computed
+UNKNOWN_DISTANCE_SCORE = 0.2
+# Load score halves at this many active students
+LOAD_SCALE = 4.0
+# Pseudo-sessions added to the dispute/complaint rate so new tutors aren't judged on one bad week
+RELIABILITY_PRIOR = 5.0
+
+SUBJECT_SYNONYMS = {
+    'maths': 'math', 'mathematics': 'math', 'calc': 'calculus', 'bio': 'biology',
+    'chem': 'chemistry', 'phys': 'physics', 'sci': 'science', 'eng': 'english',
+    'francais': 'french', 'cs': 'computer', 'programming': 'computer',
+    'coding': 'computer',
+}
+STOPWORDS = {'and', 'the', 'for', 'with', 'grade', 'level', 'help', 'tutoring', 'class', 'course'}
+
+REFRESH_CHUNK = 500
+
+
+def subject_keywords(text):
+    """Normalized keywords of a free-text subject ("Gr. 11 Maths & Physics" -> {'math', 'physics'})."""
+    words = re.findall(r"[a-z]+", (text or '').lower())
+    return {
+        SUBJECT_SYNONYMS.get(word, word)
+        for word in words
+        if (len(word) >= 3 or word in SUBJECT_SYNONYMS) and word not in STOPWORDS
+    }
+
+
+def _blank_features():
+    return {
+        'subject_hours': {},
+        'grade_matches': [0] * len(GRADE_ORDER),
+        'online_hours': 0.0,
+        'in_person_hours': 0.0,
+        'sessions': 0,
+        'active_students': 0,
+        'disputes': 0,
+        'complaints': 0,
+    }
+
+
+def _compute_features(tutor_ids):
+    from playground.models import AcceptedTutor, Hours, HourDispute, TutorComplaint
+
+    features = {tutor_id: _blank_features() for tutor_id in tutor_ids}
+
+    hours = (
+        Hours.objects.filter(tutor_id__in=tutor_ids).exclude(status='Void')
+        .values('tutor_id', 'subject', 'location')
+        .annotate(total=Sum('totalTime'), entries=Count('id'))
+    )
+    for row in hours:
+        f = features[row['tutor_id']]
+        total = float(row['total'] or 0)
+        for keyword in subject_keywords(row['subject']):
+            f['subject_hours'][keyword] = round(f['subject_hours'].get(keyword, 0) + total, 2)
+        if row['location'] == 'Online':
+            f['online_hours'] += total
+        elif row['location'] == 'In-Person':
+            f['in_person_hours'] += total
+        f['sessions'] += row['entries']
+
+    matches = (
+        AcceptedTutor.objects.filter(tutor_id__in=tutor_ids).exclude(status='Void')
+        .values('tutor_id', 'request__grade')
+        .annotate(matches=Count('id'), active=Count('id', filter=Q(status='Accepted')))
+    )
+    for row in matches:
+        f = features[row['tutor_id']]
+        if row['request__grade'] in GRADE_ORDER:
+            f['grade_matches'][GRADE_ORDER.index(row['request__grade'])] += row['matches']
+        f['active_students'] += row['active']
+
+    disputes = (
+        HourDispute.objects.filter(hour__tutor_id__in=tutor_ids).exclude(status='dismissed')
+        .values('hour__tutor_id').annotate(n=Count('id'))
+    )
+    for row in disputes:
+        features[row['hour__tutor_id']]['disputes'] = row['n']
+
+    complaints = TutorComplaint.objects.filter(tutor_id__in=tutor_ids).values('tutor_id').annotate(n=Count('id'))
+    for row in complaints:
+        features[row['tutor_id']]['complaints'] = row['n']
+
+    return features
+
+
+def refresh_match_features(tutor_ids=None):
+    """
+    Recompute TutorMatchFeatures for the given tutors, or by default for
+    every stale row and every tutor that has no row yet. Aggregates are a
+    handful of grouped queries per REFRESH_CHUNK tutors.
+
+    Returns the number of tutors refreshed.
+    """
+    from playground.models import TutorMatchFeatures, User
+
+    if tutor_ids is None:
+        missing = User.objects.filter(roles='tutor', match_features__isnull=True).values_list('id', flat=True)
+        stale = TutorMatchFeatures.objects.filter(stale=True).values_list('tutor_id', flat=True)
+        tutor_ids = set(missing) | set(stale)
+    tutor_ids = sorted(tutor_ids)
+
+    fields = list(_blank_features()) + ['refreshed_at']
+    for offset in range(0, len(tutor_ids), REFRESH_CHUNK):
+        chunk = tutor_ids[offset:offset + REFRESH_CHUNK]
+        # Cleared before reading, so a change landing mid-refresh marks the row stale again
+        TutorMatchFeatures.objects.filter(tutor_id__in=chunk).update(stale=False)
+        existing = set(TutorMatchFeatures.objects.filter(tutor_id__in=chunk).values_list('tutor_id', flat=True))
+        now = timezone.now()
+
+        to_update, to_create = [], []
+        for tutor_id, values in _compute_features(chunk).items():
+            row = TutorMatchFeatures(tutor_id=tutor_id, stale=False, refreshed_at=now, **values)
+            (to_update if tutor_id in existing else to_create).append(row)
+        TutorMatchFeatures.objects.bulk_update(to_update, fields)
+        TutorMatchFeatures.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    if tutor_ids:
+        logger.info(f"Refreshed match features for {len(tutor_ids)} tutors")
+    return len(tutor_ids)
+
+
+def mark_features_stale(tutor_ids):
+    from playground.models import TutorMatchFeatures
+
+    TutorMatchFeatures.objects.filter(tutor_id__in=tutor_ids, stale=False).update(stale=True)
+
+
+def _haversine_km(lat, lng, lats, lngs):
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lngs - lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def rank_tutors(tutoring_request, limit=20):
+    """
+    Score every active tutor with a features row against a request and
+    return the best `limit` as dicts with tutor_id, score, distance_km and
+    the per-component scores. One query loads the feature table; the
+    scoring itself is vectorized over all tutors at once.
+    """
+    from playground.models import TutorMatchFeatures
+
+    rows = list(
+        TutorMatchFeatures.objects.filter(tutor__roles='tutor', tutor__is_active=True)
+        .values_list('tutor_id', 'subject_hours', 'grade_matches', 'online_hours', 'in_person_hours',
+                     'sessions', 'active_students', 'disputes', 'complaints',
+                     'tutor__latitude', 'tutor__longitude')
+    )
+    if not rows:
+        return []
+
+    n = len(rows)
+    columns = list(zip(*rows))
+    tutor_ids = np.array(columns[0])
+    keywords = subject_keywords(tutoring_request.subject)
+    subject_hours = np.fromiter(
+        (sum(hours.get(keyword, 0) for keyword in keywords) for hours in columns[1]), dtype=float, count=n
+    )
+    grades = np.array([(list(g) + [0] * len(GRADE_ORDER))[:len(GRADE_ORDER)] for g in columns[2]], dtype=float)
+    online, in_person, sessions, active, disputes, complaints = (np.array(c, dtype=float) for c in columns[3:9])
+    lats = np.array([float(v) if v is not None else np.nan for v in columns[9]])
+    lngs = np.array([float(v) if v is not None else np.nan for v in columns[10]])
+
+    components = {}
+    components['subject'] = np.minimum(np.log1p(subject_hours) / np.log1p(SUBJECT_HOURS_SATURATION), 1.0)
+
+    if tutoring_request.grade in GRADE_ORDER:
+        # Neighbouring grades count too, half as much per step away
+        target = GRADE_ORDER.index(tutoring_request.grade)
+        kernel = 0.5 ** np.abs(np.arange(len(GRADE_ORDER)) - target)
+        components['grade'] = 1 - np.exp(-(grades @ kernel) / 2)
+    else:
+        components['grade'] = np.zeros(n)
+
+    service = tutoring_request.service
+    total_hours = online + in_person
+    if service == 'Online':
+        components['mode'] = (online + 1) / (total_hours + 2)
+    elif service == 'In-Person':
+        components['mode'] = (in_person + 1) / (total_hours + 2)
+    else:
+        components['mode'] = np.ones(n)
+
+    distance = np.full(n, np.nan)
+    location = request_location(tutoring_request)
+    if location is not None:
+        distance = _haversine_km(location[0], location[1], lats, lngs)
+    if service == 'Online':
+        components['distance'] = np.ones(n)
+    else:
+        components['distance'] = np.where(np.isnan(distance), UNKNOWN_DISTANCE_SCORE,
+                                          np.exp(-np.nan_to_num(distance) / DISTANCE_SCALE_KM))
+
+    components['load'] = 1 / (1 + active / LOAD_SCALE)
+    components['reliability'] = 1 - (disputes + complaints) / (sessions + complaints + RELIABILITY_PRIOR)
+
+    score = sum(WEIGHTS[name] * values for name, values in components.items())
+    if service == 'In-Person':
+        score = np.where(distance > MAX_IN_PERSON_KM, -np.inf, score)
+
+    order = np.argsort(-score, kind='stable')[:limit]
+    return [
+        {
+            'tutor_id': int(tutor_ids[i]),
+            'score': round(float(score[i]), 4),
+            'distance_km': None if np.isnan(distance[i]) else round(float(distance[i]), 1),
+            'components': {name: round(float(values[i]), 3) for name, values in components.items()},
+        }
+        for i in order
+        if np.isfinite(score[i])
+    ]
@@ -16,6 +16,8 @@ urlpatterns = [
     path('tutor/upload-document/', views.upload_tutor_document, name='tutor-upload-document'),
     path('user/', views.current_user_view, name='current-user'),
     path('user/mark-tour-complete/', views.mark_tour_complete, name='mark-tour-complete'),
+    path('events/ticket/', views.realtime_ticket, name='realtime-ticket'),
+    path('events/stream/', views.realtime_stream, name='realtime-stream'),
     path('profile/<int:pk>/', change_settings_parent, name='change-settings-parent'),
     path('homeParent/', views.ParentHomeCreateView.as_view(), name='parent-home'),
     path('students/', views.StudentsListView.as_view(), name='students-list'),
@@ -26,6 +28,10 @@ urlpatterns = [
     path('referral/admin/all/', views.AdminReferralListView.as_view(), name='admin-referral-list'),
     path("requests/create/", views.RequestListCreateView.as_view(), name="referral-create"),
     path("requests/list/", views.RequestListView.as_view(), name="request-list"),
+    path("requests/search/", views.RequestSearchView.as_view(), name="request-search"),
+    path("requests/<int:pk>/", views.RequestDetailView.as_view(), name="request-detail"),
+    path("requests/<int:pk>/nearest-tutors/", views.NearestTutorsView.as_view(), name="request-nearest-tutors"),
+    path("requests/<int:pk>/ranked-tutors/", views.RankedTutorsView.as_view(), name="request-ranked-tutors"),
     path('requests/RejectReply/', views.RejectUpdateView.as_view(), name='request-RejectReply'),
     path("requests/reply/", views.RequestResponseCreateView.as_view(), name="request-reply"),
     path("requests/ViewReply/", views.ReplyListView.as_view(), name="request-ViewReply"),
@@ -132,6 +138,8 @@ urlpatterns = [
 
     # Admin email logs
     path('admin/email-logs/', views.AdminEmailLogsView.as_view(), name='admin-email-logs'),
+    path('admin/email-logs/export/', views.AdminEmailLogArchiveExportView.as_view(), name='admin-email-logs-export'),
+    path('admin/exports/<str:dataset>/', views.AdminAccountingExportView.as_view(), name='admin-accounting-export'),
 
     # Admin bulk email endpoints
     path('admin/send-parent-emails/', views.AdminSendParentEmailsView.as_view(), name='admin-send-parent-emails'),
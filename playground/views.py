@@ -5,7 +5,7 @@ from .models import UserDocument
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db.models.signals import post_save
 from django.shortcuts import render
-from django.db.models import Exists, OuterRef, Q
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
 import requests, os, shutil
 from pathlib import Path
 from django.db import transaction
@@ -18,7 +18,7 @@ from .serializers import UserSerializer, UserRegistrationSerializer, TutorCompla
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponseRedirect, StreamingHttpResponse
 from .models import TutoringRequest, TutorResponse, AcceptedTutor, Hours, WeeklyHours, MonthlyHours, Announcements, StripePayout, Referral, HourDispute, TutorComplaint, Popup, PopupDismissal, TutorReferralRequest, EmailLog
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods, require_POST
@@ -32,10 +32,11 @@ from django.core.exceptions import ValidationError
 from rest_framework.views import APIView
 from django.views.generic.edit import UpdateView
 from rest_framework.response import Response
-from .serializers import RequestSerializer, AnnouncementSerializer, ReferralSerializer, ErrorSerializer, PopupSerializer, PopupDismissalSerializer
+from .serializers import RequestSerializer, RequestListItemSerializer, AnnouncementSerializer, ReferralSerializer, ErrorSerializer, PopupSerializer, PopupDismissalSerializer
 from .serializers import RequestReplySerializer, AcceptedTutorSerializer, HoursSerializer, WeeklyHoursSerializer, UserDocumentSerializer, HourDisputeSerializer
 from rest_framework.decorators import api_view, permission_classes
 from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils import timezone
 from django.db.models import Sum, Q
 from decimal import Decimal, InvalidOperation
@@ -52,6 +53,16 @@ from googleapiclient.errors import HttpError
 import googleapiclient.errors
 from google.oauth2.credentials import Credentials
 from django.db.models import F
+from playground.google_tokens import google_token_manager, RECONNECT_GOOGLE
+from playground.calendar_sync import get_sync_state, is_stale, local_events_response, schedule_calendar_sync
+from playground.calendar_cache import etag_response, fetch_events, invalidate_events_cache
+from playground.calendar_rsvp import STATUS_MAP, apply_rsvp, queue_rsvp_update
+from playground.city_centroids import city_centroid
+from playground.spatial_index import haversine_km, nearby_requests_q, request_location, tutor_index
+from playground.tutor_ranking import rank_tutors
+from playground.pagination import MAX_PAGE_SIZE, encode_cursor, keyset_page, keyset_queryset, page_size
+from playground.request_search import search_requests, search_terms
+from playground.realtime import channels_for, event_stream, issue_ticket, read_ticket
 
 
 import stripe
@@ -171,6 +182,49 @@ def mark_tour_complete(request):
     return Response({"error": "User is not authenticated"}, status=401)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def realtime_ticket(request):
+    """
+    Short-lived ticket for opening /api/events/stream/. EventSource can't
+    send the Authorization header, so the stream is authenticated with this
+    instead of putting the JWT itself in the URL.
+    """
+    return Response({
+        "ticket": issue_ticket(request.user),
+        "expires_in": settings.REALTIME_TICKET_MAX_AGE_SECONDS,
+    })
+
+
+async def realtime_stream(request):
+    """
+    Server-Sent Events feed of request, reply, match and dispute changes
+    relevant to the ticket's user. Served by the ASGI app; each connection
+    just waits on the broker, so clients no longer need to poll. The user is
+    re-checked every heartbeat, so deactivation ends the stream.
+    """
+    user_id = read_ticket(request.GET.get("ticket", ""))
+    if user_id is None:
+        return JsonResponse({"error": "Invalid or expired ticket"}, status=401)
+    account = User.objects.filter(pk=user_id, is_active=True).values("id", "roles", "is_superuser")
+    user = await account.afirst()
+    if user is None:
+        return JsonResponse({"error": "Invalid or expired ticket"}, status=401)
+
+    async def still_allowed():
+        # Deactivated, or roles changed so the channels are stale: the client
+        # reconnects with a new ticket if it is still allowed in
+        return await account.afirst() == user
+
+    response = StreamingHttpResponse(
+        event_stream(channels_for(user["id"], user["roles"], user["is_superuser"]), still_allowed),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 class CreateUserView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
@@ -492,6 +546,9 @@ class GoogleOAuthCallbackView(APIView):
         from datetime import timezone as dt_timezone
         profile.google_token_expiry = datetime.now(dt_timezone.utc) + timedelta(seconds=int(tokens.get("expires_in", 3600)))
         profile.save()
+        google_token_manager.invalidate(profile.id)
+        # The account may have changed, so rebuild the local calendar from scratch
+        schedule_calendar_sync(profile.id, full=True)
 
         return redirect(f"{settings.FRONTEND_URL}/events")
 
@@ -502,63 +559,19 @@ def google_status(request):
     profile = User.objects.get(id=user_id)
     return Response({"connected": bool(profile._encrypted_google_access_token)})
 
-def refresh_google_access_token(user):
-    import logging
-    logger = logging.getLogger(__name__)
-    refresh_token = user._encrypted_google_refresh_token
-    if not refresh_token:
-        logger.error("No Google refresh token found for user. User must reconnect Google account.")
-        return "RECONNECT_GOOGLE"
-    data = {
-        "client_id": GOOGLE_CLIENT_ID,
-        "client_secret": GOOGLE_CLIENT_SECRET,
-        "refresh_token": refresh_token,
-        "grant_type": "refresh_token",
-    }
-    response = requests.post("https://oauth2.googleapis.com/token", data=data)
-    logger.info(f"Google token refresh response status: {response.status_code}")
-    try:
-        tokens = response.json()
-        logger.debug(f"Google token refresh response: {tokens}")
-    except Exception as e:
-        logger.error(f"Failed to parse token refresh response: {e}")
-        return None
-
-    if response.status_code == 200 and "access_token" in tokens:
-        user._encrypted_google_access_token = tokens["access_token"]  # Use encrypted property to store
-        from datetime import timezone as dt_timezone
-        user.google_token_expiry = datetime.now(dt_timezone.utc) + timedelta(seconds=int(tokens.get("expires_in", 3600)))
-        user.save()
-        logger.info("Google access token refreshed and saved.")
-        return tokens["access_token"]
-    else:
-        logger.error(f"Google token refresh failed: {tokens}")
-        return None
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_event(request):
     user_id = request.data.get('id')
     profile = User.objects.get(id=user_id)
-    # Check if token is expired before API call
-    if hasattr(profile, 'google_token_expiry') and profile.google_token_expiry:
-        from datetime import timezone as dt_timezone
-        if profile.google_token_expiry < datetime.now(dt_timezone.utc):
-            refreshed_token = refresh_google_access_token(profile)
-            if refreshed_token == "RECONNECT_GOOGLE":
-                return Response({"error": "Google account needs to be reconnected."}, status=403)
-            if refreshed_token:
-                access_token = refreshed_token
-            else:
-                return Response({"error": "Google token expired and refresh failed."}, status=403)
-        else:
-            access_token = profile._encrypted_google_access_token
-    else:
-        access_token = profile._encrypted_google_access_token
+    if not profile._encrypted_google_access_token:
+        return Response({"error": "Google not connected for this user."}, status=403)
 
+    access_token = google_token_manager.get_access_token(profile)
+    if access_token == RECONNECT_GOOGLE:
+        return Response({"error": "Google account needs to be reconnected."}, status=403)
     if not access_token:
-        return Response({"error": "Google not connected for this user."}, status=403)
+        return Response({"error": "Google token expired and refresh failed."}, status=403)
 
     data = request.data
 
@@ -617,14 +630,18 @@ def create_event(request):
     response = post_event(access_token)
 
     if response.status_code == 401:
-        new_token = refresh_google_access_token(profile)
-        if new_token == "RECONNECT_GOOGLE":
+        new_token = google_token_manager.refresh(profile, force=True)
+        if new_token == RECONNECT_GOOGLE:
             return Response({"error": "Google account needs to be reconnected."}, status=403)
         if new_token:
             response = post_event(new_token)
         else:
             return Response({"error": "Google token expired and refresh failed."}, status=403)
 
+    if response.status_code in (200, 201):
+        invalidate_events_cache(profile.id)
+        schedule_calendar_sync(profile.id)
+
     return Response(response.json())
 
 logger = logging.getLogger(__name__)
@@ -639,26 +656,11 @@ def list_egs_tutoring_events(request):
 
     try:
         profile = User.objects.get(id=user_id)
-        # Check if token is expired before API call
-        access_token = None
-        if hasattr(profile, 'google_token_expiry') and profile.google_token_expiry:
-            from datetime import timezone as dt_timezone
-            if profile.google_token_expiry < datetime.now(dt_timezone.utc):
-                refresh_result = refresh_google_access_token(profile)
-                print(f"Google token refresh result: {refresh_result}")
-                if refresh_result == "RECONNECT_GOOGLE":
-                    return Response({"error": "Google account needs to be reconnected."}, status=403)
-                if refresh_result:
-                    access_token = refresh_result
-                else:
-                    return Response({"error": "Google token expired and refresh failed."}, status=403)
-            else:
-                access_token = profile._encrypted_google_access_token
-        else:
-            access_token = profile._encrypted_google_access_token
-
+        access_token = google_token_manager.get_access_token(profile)
+        if access_token is None:
+            return Response({"error": "Google token expired and refresh failed."}, status=403)
         # If no access token, force re-authentication
-        if not access_token:
+        if access_token == RECONNECT_GOOGLE:
             return Response({"error": "Google account needs to be reconnected."}, status=403)
 
     except User.DoesNotExist:
@@ -666,14 +668,30 @@ def list_egs_tutoring_events(request):
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
-    url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+    from datetime import timezone as dt_timezone
+
+    # Serve from the local store once the first sync has finished
+    sync_state = get_sync_state(profile)
+    if sync_state is None or is_stale(sync_state):
+        schedule_calendar_sync(profile.id)
+    if sync_state is not None:
+        private_props = ['disputed=false'] if profile.roles in ('parent', 'student') else None
+        return etag_response(request, local_events_response(
+            profile,
+            time_min=datetime.now(dt_timezone.utc),
+            max_results=50,
+            private_props=private_props,
+        ))
+
+    # Minute precision so repeat visits share a cache entry
+    time_min = datetime.now(dt_timezone.utc).replace(second=0, microsecond=0).isoformat()
 
     if(profile.roles == 'parent' or profile.roles == 'student'):
         params = {
             "sharedExtendedProperty": "egs_tutoring=true",
             "privateExtendedProperty": "cant_attend=false",
             "privateExtendedProperty": "disputed=false", 
-            "timeMin": datetime.now(dt_timezone.utc).isoformat(),
+            "timeMin": time_min,
             "singleEvents": True,
             "ordserBy": "startTime",
             "maxResults": 50
@@ -681,48 +699,29 @@ def list_egs_tutoring_events(request):
     else:
         params = {
             "sharedExtendedProperty": "egs_tutoring=true",
-            "timeMin": datetime.now(dt_timezone.utc).isoformat(),
+            "timeMin": time_min,
             "singleEvents": True,
             "orderBy": "startTime",
             "maxResults": 50
         }
 
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        status_code, json_response, etag = fetch_events(profile.id, access_token, params)
     except requests.exceptions.RequestException as req_err:
         return Response({"error": "Google API request failed", "details": str(req_err)}, status=502)
-    try:
-        json_response = response.json()
-    except Exception as parse_error:
+    except ValueError:
         return Response({"error": "Invalid JSON from Google"}, status=500)
 
-    if response.status_code in [200, 201]:
-        # Defensive: always return an 'items' array
-        if 'items' not in json_response:
-            json_response['items'] = []
-        return Response(json_response)
+    if status_code in [200, 201]:
+        return etag_response(request, json_response, etag)
     else:
         logger.warning("[EGS EVENTS] Google API returned an error")
         error_message = json_response.get('error', {}).get('message', 'Failed to retrieve events')
         return Response(
             {"error": error_message, "details": json_response},
-            status=response.status_code
+            status=status_code
         )
 
-STATUS_MAP = {
-    "accept": "accepted",
-    "accepted": "accepted",
-    "cant_attend": "declined",
-    "decline": "declined",
-    "disputed": "declined",        # custom => decline on GCal
-    "tentative": "tentative",
-    "needs_action": "needsAction",
-}
-
 ALLOWED_PASSTHRU = {
     "timeMin", "timeMax", "maxResults", "q", "orderBy", "pageToken",
     "privateExtendedProperty", "sharedExtendedProperty", "singleEvents"
@@ -744,23 +743,10 @@ def list_egs_tutoring_events_unfiltered(request):
         profile = User.objects.get(id=user_id)
 
         # ensure we have a valid access token
-        access_token = None
-        if getattr(profile, "google_token_expiry", None):
-            from datetime import timezone as dt_timezone
-            if profile.google_token_expiry < datetime.now(dt_timezone.utc):
-                refresh_result = refresh_google_access_token(profile)
-                if refresh_result == "RECONNECT_GOOGLE":
-                    return Response({"error": "Google account needs to be reconnected."}, status=403)
-                if refresh_result:
-                    access_token = refresh_result
-                else:
-                    return Response({"error": "Google token expired and refresh failed."}, status=403)
-            else:
-                access_token = getattr(profile, "access_token", None)
-        else:
-            access_token = getattr(profile, "access_token", None)
-
-        if not access_token:
+        access_token = google_token_manager.get_access_token(profile)
+        if access_token is None:
+            return Response({"error": "Google token expired and refresh failed."}, status=403)
+        if access_token == RECONNECT_GOOGLE:
             return Response({"error": "Google account needs to be reconnected."}, status=403)
 
     except User.DoesNotExist:
@@ -768,6 +754,39 @@ def list_egs_tutoring_events_unfiltered(request):
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
+    # Serve from the local store once the first sync has finished. Free-text
+    # search, paging and unexpanded recurrences still go to Google.
+    sync_state = get_sync_state(profile)
+    if sync_state is None or is_stale(sync_state):
+        schedule_calendar_sync(profile.id)
+    query = request.query_params
+    if (
+        sync_state is not None
+        and "q" not in query
+        and "pageToken" not in query
+        and query.get("singleEvents", "true").lower() != "false"
+    ):
+        from datetime import timezone as dt_timezone
+        time_min = parse_datetime(query["timeMin"]) if query.get("timeMin") else datetime.now(dt_timezone.utc)
+        time_max = parse_datetime(query["timeMax"]) if query.get("timeMax") else None
+        try:
+            max_results = int(query.get("maxResults", 250))
+        except ValueError:
+            max_results = 250
+        try:
+            local_events = local_events_response(
+                profile,
+                time_min=time_min,
+                time_max=time_max,
+                max_results=max_results,
+                order_by=query.get("orderBy", "startTime"),
+                shared_props=["egs_tutoring=true"] + query.getlist("sharedExtendedProperty"),
+                private_props=query.getlist("privateExtendedProperty"),
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return etag_response(request, local_events)
+
     params = {
         "sharedExtendedProperty": "egs_tutoring=true",
         "singleEvents": True,
@@ -776,7 +795,8 @@ def list_egs_tutoring_events_unfiltered(request):
     }
 
     from datetime import timezone as dt_timezone
-    default_time_min = datetime.now(dt_timezone.utc).isoformat()
+    # Minute precision so repeat visits share a cache entry
+    default_time_min = datetime.now(dt_timezone.utc).replace(second=0, microsecond=0).isoformat()
     params["timeMin"] = default_time_min
 
     # Allow caller to override/extend certain Google params
@@ -787,28 +807,20 @@ def list_egs_tutoring_events_unfiltered(request):
             # if single value, let it be a string; requests will handle both
             params[key] = values if len(values) > 1 else values[0]
 
-    url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
-    headers = {"Authorization": f"Bearer {access_token}"}
-
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        status_code, json_response, etag = fetch_events(profile.id, access_token, params)
     except requests.exceptions.RequestException as req_err:
         return Response({"error": "Google API request failed", "details": str(req_err)}, status=502)
-
-    try:
-        json_response = response.json()
-    except Exception:
+    except ValueError:
         return Response({"error": "Invalid JSON from Google"}, status=500)
 
-    if response.status_code in (200, 201):
-        if "items" not in json_response:
-            json_response["items"] = []
-        return Response(json_response)
+    if status_code in (200, 201):
+        return etag_response(request, json_response, etag)
     else:
         error_message = json_response.get("error", {}).get("message", "Failed to retrieve events")
         return Response(
             {"error": error_message, "details": json_response},
-            status=response.status_code
+            status=status_code
         )
 
 class UpdateEventRsvpView(APIView):
@@ -816,249 +828,73 @@ class UpdateEventRsvpView(APIView):
     GET /api/google/update-rsvp/?event_id=xyz&status=disputed
     POST /api/google/update-rsvp/ with JSON body
     Optional: ?calendar_id=primary  (defaults to 'primary')
+
+    The change is queued and applied by a background task after
+    GOOGLE_RSVP_COALESCE_SECONDS, so repeated clicks on the same event send
+    one Google update with the last choice. Returns 202 once queued.
     """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        event_id   = request.query_params.get("event_id")
-        status_str = request.query_params.get("status", "").lower()
-        calendar_id = request.query_params.get("calendar_id", "primary")
-        user_id = request.query_params.get("user_id")
-
-
-        if not event_id or not status_str:
-            return Response({"detail": "event_id and status are required"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if status_str not in STATUS_MAP:
-            return Response({"detail": f"Unsupported status '{status_str}'"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Build the calendar service for this user (you must implement this)
-        try:
-            user = User.objects.get(id=user_id)
-            service = self.build_service_for_user(user)  # returns googleapiclient.discovery.Resource
-        except Exception as e:
-            return Response({"detail": f"Auth error: {e}"}, status=status.HTTP_401_UNAUTHORIZED)
-
-        try:
-            event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
-        except googleapiclient.errors.HttpError as e:
-            return Response({"detail": f"Fetch failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Update attendee RSVP for the current user
-        me = user.email.lower()
-        g_status = STATUS_MAP[status_str]
-
-        attendees = event.get("attendees", [])
-        found = False
-        for a in attendees:
-            if a.get("email", "").lower() == me:
-                a["responseStatus"] = g_status
-                found = True
-                break
-
-        if not found:
-            # add self as attendee with the new status if missing
-            attendees.append({"email": me, "responseStatus": g_status})
-        event["attendees"] = attendees
-
-        # Optionally mark with extendedProperties / color when “disputed”
-        if status_str == "disputed":
-            event.setdefault("extendedProperties", {}).setdefault("private", {})["disputed"] = "true"
-            event["colorId"] = "11"  # red-ish
-
-        # Patch event
-        try:
-            updated = service.events().patch(
-                calendarId=calendar_id,
-                eventId=event_id,
-                body=event,
-                sendUpdates="all"  # notify others
-            ).execute()
-        except googleapiclient.errors.HttpError as e:
-            return Response({"detail": f"Update failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({
-            "detail": "RSVP updated",
-            "event_id": updated.get("id"),
-            "status_set": g_status
-        }, status=status.HTTP_200_OK)
+        return self.queue(
+            user_id=request.query_params.get("user_id"),
+            event_id=request.query_params.get("event_id"),
+            status_str=request.query_params.get("status", "").lower(),
+            calendar_id=request.query_params.get("calendar_id", "primary"),
+            cancellation=False,
+        )
 
     def post(self, request):
         """Handle POST requests with cancellation reasons and email notifications"""
-        event_id = request.data.get("event_id")
-        status_str = request.data.get("status", "").lower()
-        calendar_id = request.data.get("calendar_id", "primary")
-        user_id = request.data.get("user_id")
-        cancel_reason = request.data.get("cancel_reason", "")
-        send_emails = request.data.get("send_emails", False)
+        return self.queue(
+            user_id=request.data.get("user_id"),
+            event_id=request.data.get("event_id"),
+            status_str=request.data.get("status", "").lower(),
+            calendar_id=request.data.get("calendar_id", "primary"),
+            cancel_reason=request.data.get("cancel_reason", ""),
+            send_emails=bool(request.data.get("send_emails", False)),
+            cancellation=True,
+        )
 
+    def queue(self, user_id, event_id, status_str, calendar_id, cancel_reason="", send_emails=False,
+              cancellation=False):
         if not event_id or not status_str:
             return Response({"detail": "event_id and status are required"}, status=status.HTTP_400_BAD_REQUEST)
 
         if status_str not in STATUS_MAP:
             return Response({"detail": f"Unsupported status '{status_str}'"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Build the calendar service for this user
         try:
             user = User.objects.get(id=user_id)
-            service = self.build_service_for_user(user)
         except Exception as e:
             return Response({"detail": f"Auth error: {e}"}, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.refresh_token:
+            return Response({"detail": "Auth error: Google account needs to be reconnected"},
+                            status=status.HTTP_401_UNAUTHORIZED)
 
+        options = {"calendar_id": calendar_id, "cancel_reason": cancel_reason, "send_emails": send_emails,
+                   "cancellation": cancellation}
+        if queue_rsvp_update(user.id, event_id, status_str, **options):
+            return Response({
+                "detail": "RSVP update queued",
+                "event_id": event_id,
+                "status_set": STATUS_MAP[status_str]
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # No broker: apply it now, as before
         try:
-            event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
-        except googleapiclient.errors.HttpError as e:
-            return Response({"detail": f"Fetch failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Update attendee RSVP for the current user
-        me = user.email.lower()
-        g_status = STATUS_MAP[status_str]
-
-        attendees = event.get("attendees", [])
-        found = False
-        for a in attendees:
-            if a.get("email", "").lower() == me:
-                a["responseStatus"] = g_status
-                found = True
-                break
-
-        if not found:
-            attendees.append({"email": me, "responseStatus": g_status})
-        event["attendees"] = attendees
-
-        # Store cancellation details in extendedProperties
-        if status_str == "cant_attend":
-            event.setdefault("extendedProperties", {}).setdefault("private", {})
-            event["extendedProperties"]["private"]["cant_attend"] = "true"
-            event["extendedProperties"]["private"]["cancelled_by"] = user.email
-            if cancel_reason:
-                event["extendedProperties"]["private"]["cancel_reason"] = cancel_reason
-            event["colorId"] = "11"  # red color for cancelled
-        elif status_str == "accepted":
-            # Clear cancellation data when re-accepting
-            if event.get("extendedProperties", {}).get("private"):
-                event["extendedProperties"]["private"].pop("cant_attend", None)
-                event["extendedProperties"]["private"].pop("cancelled_by", None)
-                event["extendedProperties"]["private"].pop("cancel_reason", None)
-            event.pop("colorId", None)  # remove color
-
-        # Patch event
-        try:
-            # Use sendUpdates="none" for cancellations since we send custom emails
-            # Use sendUpdates="all" for acceptances so Google notifies attendees
-            send_updates = "none" if status_str == "cant_attend" else "all"
-
-            updated = service.events().patch(
-                calendarId=calendar_id,
-                eventId=event_id,
-                body=event,
-                sendUpdates=send_updates
-            ).execute()
+            updated = apply_rsvp(user, event_id, status_str, **options)
+        except ValueError as e:
+            return Response({"detail": f"Auth error: {e}"}, status=status.HTTP_401_UNAUTHORIZED)
         except googleapiclient.errors.HttpError as e:
             return Response({"detail": f"Update failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Send email notifications if requested
-        if send_emails and status_str == "cant_attend":
-            self.send_cancellation_emails(user, event, cancel_reason, attendees)
-
         return Response({
             "detail": "RSVP updated",
             "event_id": updated.get("id"),
-            "status_set": g_status
+            "status_set": STATUS_MAP[status_str]
         }, status=status.HTTP_200_OK)
 
-    def send_cancellation_emails(self, cancelling_user, event, cancel_reason, attendees):
-        """Send email notifications for cancellations"""
-        try:
-            from playground.email_utils import send_mailgun_email
-            from django.conf import settings
-
-            event_title = event.get("summary", "Tutoring Session")
-            event_start = event.get("start", {}).get("dateTime", event.get("start", {}).get("date", ""))
-
-            # Format date nicely
-            if event_start:
-                try:
-                    if "T" in event_start:  # datetime format
-                        event_datetime = datetime.fromisoformat(event_start.replace('Z', '+00:00'))
-                        formatted_date = event_datetime.strftime("%B %d, %Y at %I:%M %p")
-                    else:  # date only format
-                        event_date = datetime.fromisoformat(event_start).date()
-                        formatted_date = event_date.strftime("%B %d, %Y")
-                except:
-                    formatted_date = event_start
-            else:
-                formatted_date = "Unknown date"
-
-            # Send confirmation email to cancelling user
-            confirmation_subject = f"Cancellation Confirmation - {event_title}"
-            confirmation_message = f"""
-Hello,
-
-You have successfully cancelled the following tutoring session:
-
-Session: {event_title}
-Date: {formatted_date}
-Reason: {cancel_reason}
-
-Both you and the other participant have been notified of this cancellation.
-
-Best regards,
-EGS Tutoring Team
-            """
-
-            send_mailgun_email(
-                [cancelling_user.email],
-                confirmation_subject,
-                confirmation_message.strip()
-            )
-
-            # Send notification emails to other attendees
-            for attendee in attendees:
-                attendee_email = attendee.get("email", "").lower()
-                if attendee_email != cancelling_user.email.lower():
-                    # Determine role for better messaging
-                    canceller_role = "tutor" if cancelling_user.roles == "tutor" else "student"
-
-                    notification_subject = f"Session Cancelled - {event_title}"
-                    notification_message = f"""
-Hello,
-
-The {canceller_role} has cancelled the following tutoring session:
-
-Session: {event_title}
-Date: {formatted_date}
-Cancelled by: {cancelling_user.first_name} {cancelling_user.last_name} ({cancelling_user.email})
-Reason: {cancel_reason}
-
-Please contact the {canceller_role} if you need to reschedule or have any questions.
-
-Best regards,
-EGS Tutoring Team
-                    """
-
-                    send_mailgun_email(
-                        [attendee_email],
-                        notification_subject,
-                        notification_message.strip()
-                    )
 
-        except Exception as e:
-            # Log error but don't fail the request
-            print(f"Error sending cancellation emails: {e}")
-
-    def build_service_for_user(self, user):
-    # Pull decrypted tokens from your user model
-        creds = Credentials(
-            token=user._encrypted_google_access_token,
-            refresh_token=user._encrypted_google_refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=GOOGLE_CLIENT_ID,
-            client_secret=GOOGLE_CLIENT_SECRET,
-            scopes=["https://www.googleapis.com/auth/calendar"]
-        )
-        return build("calendar", "v3", credentials=creds, cache_discovery=False)
-    
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def stripe_reauth_token(request, uidb64, token):
@@ -1530,7 +1366,7 @@ class ReferralCreateView(APIView):
     def post(self, request):
         sender_user = User.objects.get(id=request.data.get('sender_id'))
         receiver_email = request.data.get('receiver_email')
-        if User.objects.filter(email=receiver_email).exists():
+        if User.objects.filter(email__iexact=receiver_email).exists():
             return Response({"error": "This user already exists."}, status=status.HTTP_400_BAD_REQUEST)
         if sender_user == receiver_email:
             return Response({"error": "You cannot refer yourself."}, status=status.HTTP_400_BAD_REQUEST)
@@ -2170,31 +2006,22 @@ class PersonalRequestListView(APIView):
         if not parent_id:
             return Response({"error": "Missing 'parent_id' or 'parent' query parameter."}, status=400)
 
-        # Get all requests for this parent
-        request_qs = TutoringRequest.objects.filter(
-            parent=parent_id
-        ).order_by('-created_at')
-
-        # Filter out tutor-specific requests that are still pending
-        # (waiting for tutor to accept/decline via email)
-        # Only show if: no referral_request OR referral_request status is 'declined' or 'accepted'
-        filtered_requests = []
-        for tutoring_request in request_qs:
-            # Check if this request has a related tutor referral request
-            referral_request = TutorReferralRequest.objects.filter(
-                tutoring_request=tutoring_request
-            ).first()
-
-            if referral_request is None:
-                # Regular request (not tutor-specific) - always show
-                filtered_requests.append(tutoring_request)
-            elif referral_request.status != 'pending':
-                # Tutor-specific request where tutor has responded - show it
-                # (Either 'declined' so parent can see rejection, or 'accepted' meaning it's linked)
-                filtered_requests.append(tutoring_request)
-            # If status is 'pending', don't add to filtered_requests (hide from parent)
+        # Hide tutor-specific requests that are still pending (waiting for the
+        # tutor to accept/decline via email). Only the latest referral request
+        # counts: show if there is none, or it is 'declined' or 'accepted'.
+        latest_referral_status = Subquery(
+            TutorReferralRequest.objects.filter(tutoring_request=OuterRef('pk'))
+            .order_by('-created_at')
+            .values('status')[:1]
+        )
+        request_qs = (
+            TutoringRequest.objects.filter(parent=parent_id)
+            .annotate(referral_status=latest_referral_status)
+            .filter(Q(referral_status__isnull=True) | ~Q(referral_status='pending'))
+            .order_by('-created_at')
+        )
 
-        serializer = RequestSerializer(filtered_requests, many=True)
+        serializer = RequestSerializer(RequestSerializer.setup_eager_loading(request_qs), many=True)
         return Response(serializer.data)
     
     def delete(self, request):
@@ -2259,33 +2086,254 @@ class ReplyListView(APIView):
 
 
 class RequestListView(APIView):
+    """
+    Open tutoring requests (all of them for superusers).
+
+    Optional filters: city, grade, service (exact), subject (contains),
+    created_after / created_before (YYYY-MM-DD). With ?limit= or ?cursor=
+    the response is a page of compact items, {"results": [...],
+    "next_cursor": ...}; without them it stays the full list.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
         user = request.user
+        params = request.query_params
 
-        # base queryset
-        qs = TutoringRequest.objects.all().order_by("-created_at")
-
-        # superuser: return ALL, no filters
-        if user.is_authenticated and user.is_superuser:
-            serializer = RequestSerializer(qs, many=True, context={"request": request})
-            return Response(serializer.data)
+        try:
+            qs = self.filter_requests(TutoringRequest.objects.all(), params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        # everyone else: only "not accepted"
-        qs = qs.filter(Q(is_accepted=False) | Q(is_accepted="Not Accepted"))
+        # everyone but superusers: only "not accepted"
+        if not (user.is_authenticated and user.is_superuser):
+            qs = qs.filter(Q(is_accepted=False) | Q(is_accepted="Not Accepted"))
 
         # tutor: exclude requests already replied to by THIS tutor
-        if user.is_authenticated and getattr(user, "roles", None) == "tutor":
+        if user.is_authenticated and not user.is_superuser and getattr(user, "roles", None) == "tutor":
             replies_by_me = TutorResponse.objects.filter(
                 request=OuterRef("pk"),
                 tutor=user,
             )
             qs = qs.annotate(already_replied=Exists(replies_by_me)).filter(already_replied=False)
 
+            # ?radius_km= limits in-person requests to those near the tutor;
+            # online and hybrid requests are kept wherever they are
+            if params.get("radius_km"):
+                return self.nearby(request, RequestSerializer.setup_eager_loading(qs).order_by("-created_at"))
+
+        if "limit" in params or "cursor" in params:
+            try:
+                rows, next_cursor = keyset_page(qs, params.get("cursor"), page_size(params))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            return Response({
+                "results": RequestListItemSerializer(rows, many=True).data,
+                "next_cursor": next_cursor,
+            })
+
+        qs = RequestSerializer.setup_eager_loading(qs).order_by("-created_at")
         serializer = RequestSerializer(qs, many=True, context={"request": request})
         return Response(serializer.data)
 
+    @staticmethod
+    def filter_requests(qs, params):
+        for field in ("city", "grade", "service"):
+            if params.get(field):
+                qs = qs.filter(**{field: params[field]})
+        if params.get("subject"):
+            qs = qs.filter(subject__icontains=params["subject"])
+        for param, lookup in (("created_after", "created_at__date__gte"), ("created_before", "created_at__date__lte")):
+            if params.get(param):
+                day = parse_date(params[param])
+                if day is None:
+                    raise ValueError(f"{param} must be a date (YYYY-MM-DD)")
+                qs = qs.filter(**{lookup: day})
+        return qs
+
+    def nearby(self, request, qs):
+        user = request.user
+        try:
+            radius_km = float(request.query_params["radius_km"])
+        except ValueError:
+            return Response({"error": "radius_km must be a number"}, status=400)
+        if radius_km <= 0:
+            return Response({"error": "radius_km must be positive"}, status=400)
+
+        if user.latitude is not None and user.longitude is not None:
+            origin = (float(user.latitude), float(user.longitude))
+        else:
+            centroid = city_centroid(user.city)
+            if centroid is None:
+                return Response({"error": "Add your address to filter requests by distance"}, status=400)
+            origin = (centroid["latitude"], centroid["longitude"])
+
+        qs = qs.filter(~Q(service="In-Person") | nearby_requests_q(*origin, radius_km)).select_related("parent")
+
+        requests_in_range = []
+        distances = {}
+        for tutoring_request in qs:
+            location = request_location(tutoring_request)
+            distance = haversine_km(*origin, location[0], location[1]) if location else None
+            if tutoring_request.service == "In-Person" and (distance is None or distance > radius_km):
+                continue
+            requests_in_range.append(tutoring_request)
+            distances[tutoring_request.id] = round(distance, 1) if distance is not None else None
+
+        data = RequestSerializer(requests_in_range, many=True, context={"request": request}).data
+        for item in data:
+            item["distance_km"] = distances[item["id"]]
+        return Response(data)
+
+
+class RequestSearchView(APIView):
+    """
+    Keyword search over request subjects and descriptions, best matches
+    first. Takes the same filters as RequestListView plus ?limit=; admins
+    may also pass status=accepted|open|all (tutors only ever see open ones).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+        is_admin = user.is_superuser or user.roles == 'admin'
+        if not is_admin and user.roles != 'tutor':
+            return Response({"error": "Only tutors and admins can search requests"}, status=403)
+
+        if not search_terms(params.get("q")):
+            return Response({"error": "Missing search query 'q'"}, status=400)
+
+        try:
+            qs = RequestListView.filter_requests(TutoringRequest.objects.all(), params)
+            limit = page_size(params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        status_filter = params.get("status", "all" if is_admin else "open")
+        if status_filter == "open" or not is_admin:
+            qs = qs.filter(Q(is_accepted=False) | Q(is_accepted="Not Accepted"))
+        elif status_filter == "accepted":
+            qs = qs.filter(is_accepted="Accepted")
+
+        results = list(search_requests(qs, params["q"]).order_by("-search_rank", "-created_at", "-id")[:limit])
+        data = RequestListItemSerializer(results, many=True).data
+        for item, row in zip(data, results):
+            item["search_rank"] = round(row.search_rank or 0, 4)
+        return Response({"results": data})
+
+
+class RequestDetailView(APIView):
+    """
+    One tutoring request in full. Superusers and admins see any request,
+    parents their own, everyone else only requests that are still open.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        user = request.user
+        qs = RequestSerializer.setup_eager_loading(TutoringRequest.objects.all())
+        try:
+            tutoring_request = qs.get(pk=pk)
+        except TutoringRequest.DoesNotExist:
+            return Response({"error": "Request not found"}, status=404)
+
+        is_admin = user.is_superuser or user.roles == 'admin'
+        is_open = tutoring_request.is_accepted == "Not Accepted"
+        if not (is_admin or tutoring_request.parent_id == user.id or is_open):
+            return Response({"error": "Request not found"}, status=404)
+
+        return Response(RequestSerializer(tutoring_request, context={"request": request}).data)
+
+
+def get_request_for_matching(request, pk):
+    """The TutoringRequest if the user is an admin or its parent, else an error Response."""
+    user = request.user
+    is_admin = user.is_superuser or user.roles == 'admin'
+
+    try:
+        tutoring_request = TutoringRequest.objects.select_related("parent").get(pk=pk)
+    except TutoringRequest.DoesNotExist:
+        return None, Response({"error": "Request not found"}, status=404)
+    if not is_admin and tutoring_request.parent_id != user.id:
+        return None, Response({"error": "You don't have permission to view this request"}, status=403)
+    return tutoring_request, None
+
+
+class NearestTutorsView(APIView):
+    """
+    Tutors closest to a tutoring request, from the in-memory spatial index.
+    ?k= caps the count (default 10, max 50); ?radius_km= caps the distance.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        tutoring_request, error = get_request_for_matching(request, pk)
+        if error:
+            return error
+
+        try:
+            k = min(int(request.query_params.get("k", 10)), 50)
+            radius_km = request.query_params.get("radius_km")
+            radius_km = float(radius_km) if radius_km else None
+        except ValueError:
+            return Response({"error": "k and radius_km must be numbers"}, status=400)
+
+        location = request_location(tutoring_request)
+        if location is None:
+            return Response({"error": "This request has no known location"}, status=400)
+        latitude, longitude, approximate = location
+
+        index = tutor_index()
+        matches = index.nearest(latitude, longitude, k, max_km=radius_km)
+        tutors = User.objects.only("id", "firstName", "lastName", "city").in_bulk([tutor_id for _, tutor_id in matches])
+
+        return Response({
+            "request_id": tutoring_request.id,
+            "origin": {"latitude": latitude, "longitude": longitude, "approximate": approximate},
+            "tutors": [
+                {
+                    "id": tutor_id,
+                    "firstName": tutors[tutor_id].firstName,
+                    "lastName": tutors[tutor_id].lastName,
+                    "city": tutors[tutor_id].city,
+                    "distance_km": round(distance, 1),
+                    "location_is_approximate": index.approximate.get(tutor_id, False),
+                }
+                for distance, tutor_id in matches
+                if tutor_id in tutors
+            ],
+        })
+
+
+class RankedTutorsView(APIView):
+    """
+    Tutors ranked for a request by subject and grade history, distance,
+    online/in-person fit, current load and dispute/complaint rate, scored
+    from the precomputed TutorMatchFeatures table. ?limit= (default 20, max 100).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        tutoring_request, error = get_request_for_matching(request, pk)
+        if error:
+            return error
+
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), 100)
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=400)
+
+        ranked = rank_tutors(tutoring_request, limit=limit)
+        tutors = User.objects.only("id", "firstName", "lastName", "city").in_bulk([r["tutor_id"] for r in ranked])
+        for entry in ranked:
+            tutor = tutors.get(entry["tutor_id"])
+            entry["firstName"] = tutor.firstName if tutor else None
+            entry["lastName"] = tutor.lastName if tutor else None
+            entry["city"] = tutor.city if tutor else None
+
+        return Response({"request_id": tutoring_request.id, "tutors": ranked})
+
 
 
 class AcceptReplyCreateView(generics.CreateAPIView):
@@ -2463,39 +2511,43 @@ class LogHoursCreateView(APIView):
         serializer.save()
         return Response(serializer.data, status=201)
     
-@receiver(post_save, sender=Hours)
-def maybe_issue_referral_credit(sender, instance, created, **kwargs):
-    if instance.status not in ("Accepted", "accepted"):
-        return                              
-    try:
-        ref = (Referral.objects
-               .select_for_update()         # lock row, prevent races
-               .get(referred=instance.student.parent,
-                    reward_applied=False))
-    except Referral.DoesNotExist:
+def issue_referral_credit(student):
+    """
+    Give the referrer of this student's parent their $65 credit once the
+    student has 4+ Accepted hours. Runs at most once per referral.
+    """
+    parent = student.parent
+    if parent is None:
         return
-    total = (Hours.objects
-             .filter(student=instance.student,
-                     status__in=("Accepted"))
-             .aggregate(Sum("totalTime"))
-             .get("totalTime__sum") or 0)
-
-    if total < 4:
-        return                              # threshold not met yet
-
-    # ---- issue $65 credit exactly once ----
-    stripe.Customer.create_balance_transaction(
-        customer   = ref.referrer.stripe_account_id,
-        amount     = -6500,                 # –$65 CAD credit
-        currency   = "cad",
-        description= "Referral reward – $65",
-        idempotency_key=f"referral-{ref.id}"
-    )
+    with transaction.atomic():
+        try:
+            ref = (Referral.objects
+                   .select_for_update()         # lock row, prevent races
+                   .get(referred=parent,
+                        reward_applied=False))
+        except Referral.DoesNotExist:
+            return
+        total = (Hours.objects
+                 .filter(student=student,
+                         status__in=("Accepted"))
+                 .aggregate(Sum("totalTime"))
+                 .get("totalTime__sum") or 0)
+
+        if total < 4:
+            return                              # threshold not met yet
+
+        # ---- issue $65 credit exactly once ----
+        stripe.Customer.create_balance_transaction(
+            customer   = ref.referrer.stripe_account_id,
+            amount     = -6500,                 # –$65 CAD credit
+            currency   = "cad",
+            description= "Referral reward – $65",
+            idempotency_key=f"referral-{ref.id}"
+        )
 
-    ref.reward_applied = True
-    ref.reward_date  = now()
-    ref.credit_amount = 65.00
-    ref.save(update_fields=["reward_applied", "reward_date", "credit_amount"])
+        ref.reward_applied = True
+        ref.credit_amount = 65.00
+        ref.save(update_fields=["reward_applied", "credit_amount"])
 
     # Send congratulations email
     try:
@@ -2506,10 +2558,15 @@ def maybe_issue_referral_credit(sender, instance, created, **kwargs):
             referral_amount=65.00
         )
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"Failed to send referral congratulations email: {e}")
 
+
+@receiver(post_save, sender=Hours)
+def maybe_issue_referral_credit(sender, instance, created, **kwargs):
+    if instance.status not in ("Accepted", "accepted"):
+        return
+    issue_referral_credit(instance.student)
+
     
 class ParentHoursListView(APIView):
     permission_classes = [AllowAny]
@@ -2705,8 +2762,7 @@ class WeeklyHoursListView(APIView):
             eligible__in=['Eligible', 'Late'],
             invoice_status='pending'
         ).order_by('date')
-        serializer = HoursSerializer(weekly_hours, many=True, context={'request': request})
-        return Response(serializer.data)
+        return Response(HoursSerializer.serialize_values(weekly_hours, context={'request': request}))
 
     def post(self, request):
         print(f"WeeklyHoursListView.post called with data: {request.data}")
@@ -3313,10 +3369,9 @@ class MonthlyHoursListView(APIView):
             date__range=(start_date, end_date),
             eligible__in=['Eligible', 'Late']
         ).order_by('date')
-        print(f"MonthlyHoursListView found {monthly_hours.count()} hours")
-        serializer = HoursSerializer(monthly_hours, many=True, context={'request': request})
-        print(f"MonthlyHoursListView serialized {len(serializer.data)} hours")
-        return Response(serializer.data)
+        data = HoursSerializer.serialize_values(monthly_hours, context={'request': request})
+        print(f"MonthlyHoursListView serialized {len(data)} hours")
+        return Response(data)
 
     def post(self, request):
         print(f"MonthlyHoursListView.post called with data: {request.data}")
@@ -4584,16 +4639,79 @@ class AdminUserSearchView(APIView):
         return Response({'users': user_list}, status=200)
 
 class AdminUserHoursView(APIView):
-    """Admin endpoint to get all hours for a specific user"""
+    """
+    Admin endpoint to get everything about a specific user: profile, hour
+    stats, the first page of their hours, relationships, documents and
+    current requests. ?cursor= (the hours_next_cursor it returned) fetches
+    just the next page of hours; ?limit= sets the page size.
+    """
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def _hours_page(hours, params, request):
+        """(page of serialized hours, next cursor), latest date and start time first"""
+        limit = page_size(params, default=MAX_PAGE_SIZE)
+        page = keyset_queryset(hours, params.get("cursor"), field=("date", "startTime"))[:limit + 1]
+        data = HoursSerializer.serialize_values(page, context={'request': request})
+        next_cursor = None
+        if len(data) > limit:
+            data = data[:limit]
+            next_cursor = encode_cursor((data[-1]['date'], data[-1]['startTime']), data[-1]['id'])
+        return data, next_cursor
+
+    @staticmethod
+    def _replies_by_request(request_ids):
+        """Non-rejected replies of each request, newest first, in one query"""
+        replies = {}
+        rows = (
+            TutorResponse.objects.filter(request_id__in=request_ids, rejected=False)
+            .select_related('tutor').order_by('-created_at')
+        )
+        for reply in rows:
+            replies.setdefault(reply.request_id, []).append({
+                'id': reply.id,
+                'tutor_name': f"{reply.tutor.firstName} {reply.tutor.lastName}",
+                'tutor_id': reply.tutor.id,
+                'message': reply.message,
+                'created_at': reply.created_at
+            })
+        return replies
+
+    @staticmethod
+    def _accepted_by_request(request_ids):
+        """Accepted tutor info of each request (the latest if there are several), in one query"""
+        accepted_info = {}
+        rows = (
+            AcceptedTutor.objects.filter(request_id__in=request_ids)
+            .select_related('tutor').order_by('accepted_at', 'id')
+        )
+        for accepted in rows:
+            accepted_info[accepted.request_id] = {
+                'id': accepted.tutor.id,
+                'name': f"{accepted.tutor.firstName} {accepted.tutor.lastName}",
+                'email': accepted.tutor.email,
+                'accepted_at': accepted.accepted_at
+            }
+        return accepted_info
+
     def get(self, request, user_id):
         # Check if user is admin
         if not request.user.is_superuser and request.user.roles != 'admin':
             return Response({'error': 'Admin access required'}, status=403)
 
+        # Get all hours where user is involved (as student, parent, or tutor)
+        involved = Q(student_id=user_id) | Q(parent_id=user_id) | Q(tutor_id=user_id)
+        hours = Hours.objects.filter(involved)
+
+        if request.query_params.get("cursor"):
+            try:
+                hours_data, next_cursor = self._hours_page(hours, request.query_params, request)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            return Response({'hours': hours_data, 'hours_next_cursor': next_cursor}, status=200)
+
         try:
-            user = User.objects.get(id=user_id)
+            user = User.objects.select_related('parent').get(id=user_id)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=404)
 
@@ -4629,32 +4747,25 @@ class AdminUserHoursView(APIView):
 
         user_info['google_calendar_connected'] = google_connected
 
-        # Get all hours where user is involved (as student, parent, or tutor)
-        hours = Hours.objects.filter(
-            Q(student=user) | Q(parent=user) | Q(tutor=user)
-        ).order_by('-date', '-startTime')
-
-        # Use the existing HoursSerializer to get formatted data with names
-        serializer = HoursSerializer(hours, many=True, context={'request': request})
-
-        # Calculate total hours and stats
-        total_sessions = hours.count()
-        total_time = sum([
-            float(hour.totalTime) if hour.totalTime else 0
-            for hour in hours
-        ])
-
-        # Count by role
-        as_student = hours.filter(student=user).count()
-        as_parent = hours.filter(parent=user).count()
-        as_tutor = hours.filter(tutor=user).count()
-
+        try:
+            hours_data, next_cursor = self._hours_page(hours, request.query_params, request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        # Totals and per-role counts in one pass
+        totals = hours.aggregate(
+            sessions=Count('id'),
+            time=Sum('totalTime'),
+            student_sessions=Count('id', filter=Q(student_id=user_id)),
+            parent_sessions=Count('id', filter=Q(parent_id=user_id)),
+            tutor_sessions=Count('id', filter=Q(tutor_id=user_id)),
+        )
         stats = {
-            'total_sessions': total_sessions,
-            'total_hours': round(total_time, 2),
-            'as_student': as_student,
-            'as_parent': as_parent,
-            'as_tutor': as_tutor
+            'total_sessions': totals['sessions'],
+            'total_hours': round(float(totals['time'] or 0), 2),
+            'as_student': totals['student_sessions'],
+            'as_parent': totals['parent_sessions'],
+            'as_tutor': totals['tutor_sessions']
         }
 
         # Get relationships based on role
@@ -4718,58 +4829,39 @@ class AdminUserHoursView(APIView):
             for doc in documents
         ]
 
-        # Get current tutoring requests based on role
+        # Get current tutoring requests based on role. Replies and accepted
+        # tutors for all of them are loaded up front, one query each.
         current_requests = []
         seen_request_ids = set()  # Track all request IDs to avoid duplicates
 
         # For parents: get their tutoring requests + referral requests
         if user.roles == 'parent':
             # Regular tutoring requests
-            parent_requests = TutoringRequest.objects.filter(parent=user).order_by('-created_at')
-            for request in parent_requests:
-                if request.id not in seen_request_ids:
-                    seen_request_ids.add(request.id)
-
-                    # Get all replies for this specific request
-                    tutor_replies = TutorResponse.objects.filter(request=request, rejected=False).select_related('tutor').order_by('-created_at')
-                    replies_list = [
-                        {
-                            'id': reply.id,
-                            'tutor_name': f"{reply.tutor.firstName} {reply.tutor.lastName}",
-                            'tutor_id': reply.tutor.id,
-                            'message': reply.message,
-                            'created_at': reply.created_at
-                        }
-                        for reply in tutor_replies
-                    ]
-
-                    # Get accepted tutor if exists
-                    accepted_tutor_info = None
-                    try:
-                        accepted = AcceptedTutor.objects.get(request=request)
-                        accepted_tutor_info = {
-                            'id': accepted.tutor.id,
-                            'name': f"{accepted.tutor.firstName} {accepted.tutor.lastName}",
-                            'email': accepted.tutor.email,
-                            'accepted_at': accepted.accepted_at
-                        }
-                    except AcceptedTutor.DoesNotExist:
-                        pass
+            parent_requests = list(
+                TutoringRequest.objects.filter(parent=user).select_related('student').order_by('-created_at')
+            )
+            request_ids = [r.id for r in parent_requests]
+            replies = self._replies_by_request(request_ids)
+            accepted_info = self._accepted_by_request(request_ids)
+            for tutoring_request in parent_requests:
+                if tutoring_request.id not in seen_request_ids:
+                    seen_request_ids.add(tutoring_request.id)
+                    replies_list = replies.get(tutoring_request.id, [])
 
                     current_requests.append({
-                        'id': request.id,
+                        'id': tutoring_request.id,
                         'type': 'regular',
-                        'student_name': f"{request.student.firstName} {request.student.lastName}",
-                        'subject': request.subject,
-                        'grade': request.grade,
-                        'service': request.service,
-                        'city': request.city,
-                        'status': request.is_accepted,
+                        'student_name': f"{tutoring_request.student.firstName} {tutoring_request.student.lastName}",
+                        'subject': tutoring_request.subject,
+                        'grade': tutoring_request.grade,
+                        'service': tutoring_request.service,
+                        'city': tutoring_request.city,
+                        'status': tutoring_request.is_accepted,
                         'reply_count': len(replies_list),
                         'replies': replies_list,
-                        'accepted_tutor': accepted_tutor_info,
-                        'created_at': request.created_at,
-                        'description': request.description
+                        'accepted_tutor': accepted_info.get(tutoring_request.id),
+                        'created_at': tutoring_request.created_at,
+                        'description': tutoring_request.description
                     })
 
             # Referral requests sent by this parent
@@ -4793,54 +4885,40 @@ class AdminUserHoursView(APIView):
 
         # For tutors: get requests they've responded to, referral requests, and accepted requests
         elif user.roles == 'tutor':
-            # 1. Get requests the tutor has responded to
-            tutor_responses = TutorResponse.objects.filter(tutor=user).select_related('request')
+            tutor_responses = list(
+                TutorResponse.objects.filter(tutor=user)
+                .select_related('request', 'request__student', 'request__parent')
+            )
+            accepted_tutors = list(
+                AcceptedTutor.objects.filter(tutor=user)
+                .select_related('request', 'request__student', 'request__parent', 'tutor')
+            )
+            request_ids = {r.request_id for r in tutor_responses} | {a.request_id for a in accepted_tutors}
+            replies = self._replies_by_request(request_ids)
+            accepted_info = self._accepted_by_request(request_ids)
+
+            # 1. Requests the tutor has responded to
             for response in tutor_responses:
-                request = response.request
-                if request.id not in seen_request_ids:
-                    seen_request_ids.add(request.id)
-
-                    # Get all replies for this specific request
-                    tutor_replies = TutorResponse.objects.filter(request=request, rejected=False).select_related('tutor').order_by('-created_at')
-                    replies_list = [
-                        {
-                            'id': reply.id,
-                            'tutor_name': f"{reply.tutor.firstName} {reply.tutor.lastName}",
-                            'tutor_id': reply.tutor.id,
-                            'message': reply.message,
-                            'created_at': reply.created_at
-                        }
-                        for reply in tutor_replies
-                    ]
-
-                    # Get accepted tutor if exists
-                    accepted_tutor_info = None
-                    try:
-                        accepted = AcceptedTutor.objects.get(request=request)
-                        accepted_tutor_info = {
-                            'id': accepted.tutor.id,
-                            'name': f"{accepted.tutor.firstName} {accepted.tutor.lastName}",
-                            'email': accepted.tutor.email,
-                            'accepted_at': accepted.accepted_at
-                        }
-                    except AcceptedTutor.DoesNotExist:
-                        pass
+                tutoring_request = response.request
+                if tutoring_request.id not in seen_request_ids:
+                    seen_request_ids.add(tutoring_request.id)
+                    replies_list = replies.get(tutoring_request.id, [])
 
                     current_requests.append({
-                        'id': request.id,
+                        'id': tutoring_request.id,
                         'type': 'response',
-                        'student_name': f"{request.student.firstName} {request.student.lastName}",
-                        'parent_name': f"{request.parent.firstName} {request.parent.lastName}",
-                        'subject': request.subject,
-                        'grade': request.grade,
-                        'service': request.service,
-                        'city': request.city,
-                        'status': request.is_accepted,
+                        'student_name': f"{tutoring_request.student.firstName} {tutoring_request.student.lastName}",
+                        'parent_name': f"{tutoring_request.parent.firstName} {tutoring_request.parent.lastName}",
+                        'subject': tutoring_request.subject,
+                        'grade': tutoring_request.grade,
+                        'service': tutoring_request.service,
+                        'city': tutoring_request.city,
+                        'status': tutoring_request.is_accepted,
                         'reply_count': len(replies_list),
                         'replies': replies_list,
-                        'accepted_tutor': accepted_tutor_info,
-                        'created_at': request.created_at,
-                        'description': request.description,
+                        'accepted_tutor': accepted_info.get(tutoring_request.id),
+                        'created_at': tutoring_request.created_at,
+                        'description': tutoring_request.description,
                         'tutor_response': response.message,
                         'response_date': response.created_at,
                         'response_rejected': response.rejected
@@ -4865,25 +4943,12 @@ class AdminUserHoursView(APIView):
                     'description': ref_req.description
                 })
 
-            # 3. Get accepted tutoring relationships (requests that were accepted)
-            accepted_tutors = AcceptedTutor.objects.filter(tutor=user).select_related('request', 'student', 'parent')
+            # 3. Accepted tutoring relationships (requests that were accepted)
             for accepted in accepted_tutors:
-                request = accepted.request
-                if request.id not in seen_request_ids:
-                    seen_request_ids.add(request.id)
-
-                    # Get all replies for this specific request
-                    tutor_replies = TutorResponse.objects.filter(request=request, rejected=False).select_related('tutor').order_by('-created_at')
-                    replies_list = [
-                        {
-                            'id': reply.id,
-                            'tutor_name': f"{reply.tutor.firstName} {reply.tutor.lastName}",
-                            'tutor_id': reply.tutor.id,
-                            'message': reply.message,
-                            'created_at': reply.created_at
-                        }
-                        for reply in tutor_replies
-                    ]
+                tutoring_request = accepted.request
+                if tutoring_request.id not in seen_request_ids:
+                    seen_request_ids.add(tutoring_request.id)
+                    replies_list = replies.get(tutoring_request.id, [])
 
                     # Accepted tutor info (this tutor)
                     accepted_tutor_info = {
@@ -4894,73 +4959,55 @@ class AdminUserHoursView(APIView):
                     }
 
                     current_requests.append({
-                        'id': request.id,
+                        'id': tutoring_request.id,
                         'type': 'accepted',
-                        'student_name': f"{request.student.firstName} {request.student.lastName}",
-                        'parent_name': f"{request.parent.firstName} {request.parent.lastName}",
-                        'subject': request.subject,
-                        'grade': request.grade,
-                        'service': request.service,
-                        'city': request.city,
+                        'student_name': f"{tutoring_request.student.firstName} {tutoring_request.student.lastName}",
+                        'parent_name': f"{tutoring_request.parent.firstName} {tutoring_request.parent.lastName}",
+                        'subject': tutoring_request.subject,
+                        'grade': tutoring_request.grade,
+                        'service': tutoring_request.service,
+                        'city': tutoring_request.city,
                         'status': 'Accepted',
                         'accepted_status': accepted.status,
                         'reply_count': len(replies_list),
                         'replies': replies_list,
                         'accepted_tutor': accepted_tutor_info,
-                        'created_at': request.created_at,
+                        'created_at': tutoring_request.created_at,
                         'accepted_at': accepted.accepted_at,
-                        'description': request.description
+                        'description': tutoring_request.description
                     })
 
         # For students: get requests made for them
         elif user.roles == 'student':
-            student_requests = TutoringRequest.objects.filter(student=user).order_by('-created_at')
-            for request in student_requests:
-                # Get all replies for this specific request
-                tutor_replies = TutorResponse.objects.filter(request=request, rejected=False).select_related('tutor').order_by('-created_at')
-                replies_list = [
-                    {
-                        'id': reply.id,
-                        'tutor_name': f"{reply.tutor.firstName} {reply.tutor.lastName}",
-                        'tutor_id': reply.tutor.id,
-                        'message': reply.message,
-                        'created_at': reply.created_at
-                    }
-                    for reply in tutor_replies
-                ]
-
-                # Get accepted tutor if exists
-                accepted_tutor_info = None
-                try:
-                    accepted = AcceptedTutor.objects.get(request=request)
-                    accepted_tutor_info = {
-                        'id': accepted.tutor.id,
-                        'name': f"{accepted.tutor.firstName} {accepted.tutor.lastName}",
-                        'email': accepted.tutor.email,
-                        'accepted_at': accepted.accepted_at
-                    }
-                except AcceptedTutor.DoesNotExist:
-                    pass
+            student_requests = list(
+                TutoringRequest.objects.filter(student=user).select_related('parent').order_by('-created_at')
+            )
+            request_ids = [r.id for r in student_requests]
+            replies = self._replies_by_request(request_ids)
+            accepted_info = self._accepted_by_request(request_ids)
+            for tutoring_request in student_requests:
+                replies_list = replies.get(tutoring_request.id, [])
 
                 current_requests.append({
-                    'id': request.id,
-                    'parent_name': f"{request.parent.firstName} {request.parent.lastName}",
-                    'subject': request.subject,
-                    'grade': request.grade,
-                    'service': request.service,
-                    'city': request.city,
-                    'status': request.is_accepted,
+                    'id': tutoring_request.id,
+                    'parent_name': f"{tutoring_request.parent.firstName} {tutoring_request.parent.lastName}",
+                    'subject': tutoring_request.subject,
+                    'grade': tutoring_request.grade,
+                    'service': tutoring_request.service,
+                    'city': tutoring_request.city,
+                    'status': tutoring_request.is_accepted,
                     'reply_count': len(replies_list),
                     'replies': replies_list,
-                    'accepted_tutor': accepted_tutor_info,
-                    'created_at': request.created_at,
-                    'description': request.description
+                    'accepted_tutor': accepted_info.get(tutoring_request.id),
+                    'created_at': tutoring_request.created_at,
+                    'description': tutoring_request.description
                 })
 
         return Response({
             'user_info': user_info,
             'stats': stats,
-            'hours': serializer.data,
+            'hours': hours_data,
+            'hours_next_cursor': next_cursor,
             'relationships': relationships,
             'documents': user_documents,
             'current_requests': current_requests
@@ -4982,8 +5029,8 @@ class AdminRecentUsersView(APIView):
         if role not in ['tutor', 'parent', 'student']:
             return Response({'error': 'Invalid role. Must be tutor, parent, or student.'}, status=400)
 
-        # Get recent users by role - check both lowercase and as-is
-        users = User.objects.filter(roles__iexact=role).order_by('-date_joined')[:limit]
+        # Roles are stored lowercase; an exact match can use the (roles, date_joined) index
+        users = User.objects.filter(roles=role).order_by('-date_joined')[:limit]
 
         print(f"Searching for role: {role}, found {users.count()} users")
 
@@ -5252,197 +5299,60 @@ EGS Tutoring Team
 
 
 class AdminBatchAddHoursView(APIView):
-    """Admin endpoint to batch add hours for tutors, bypassing current week restriction"""
+    """
+    Admin endpoint to batch add hours for tutors, bypassing current week restriction.
+    Takes JSON {"hours": [...]} or a CSV upload in "file" with the same columns.
+    With dry_run=true nothing is saved and the report shows what would be added.
+    """
     permission_classes = [IsAuthenticated]
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
 
-    @transaction.atomic
     def post(self, request):
         # Only allow superusers/admins to use this endpoint
         if not request.user.is_superuser and request.user.roles != 'admin':
             return Response({"error": "Admin access required"}, status=403)
 
-        hours_entries = request.data.get('hours', [])
+        from playground.hours_import import import_hours, parse_hours_csv
+
+        upload = request.FILES.get('file')
+        if upload is not None:
+            try:
+                hours_entries = parse_hours_csv(upload)
+            except ValueError as e:
+                return Response({'error': f'Could not read CSV: {str(e)}'}, status=400)
+        else:
+            hours_entries = request.data.get('hours', [])
 
         if not hours_entries or not isinstance(hours_entries, list):
             return Response({
-                'error': 'Invalid request. Expected "hours" array in request body'
+                'error': 'Invalid request. Expected "hours" array in request body or a CSV "file"'
+            }, status=400)
+        if len(hours_entries) > settings.HOURS_IMPORT_MAX_ROWS:
+            return Response({
+                'error': f'Too many rows ({len(hours_entries)}), the limit is {settings.HOURS_IMPORT_MAX_ROWS} per upload'
             }, status=400)
 
-        results = {
-            'successful': [],
-            'failed': [],
-            'total_submitted': len(hours_entries)
-        }
-
-        for idx, entry in enumerate(hours_entries):
-            try:
-                # Validate required fields
-                tutor_id = entry.get('tutor_id')
-                student_id = entry.get('student_id')
-                date_str = entry.get('date')
-                start_time_str = entry.get('start_time')
-                end_time_str = entry.get('end_time')
-                total_time = entry.get('total_time')
-                location = entry.get('location')
-                subject = entry.get('subject', '')
-                notes = entry.get('notes', '')
-
-                # Check for required fields
-                if not all([tutor_id, student_id, date_str, start_time_str, end_time_str, total_time, location]):
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': 'Missing required fields (tutor_id, student_id, date, start_time, end_time, total_time, location)'
-                    })
-                    continue
-
-                # Validate users exist
-                try:
-                    tutor = User.objects.get(pk=tutor_id)
-                    if tutor.roles != 'tutor':
-                        results['failed'].append({
-                            'index': idx,
-                            'entry': entry,
-                            'error': f'User {tutor_id} is not a tutor'
-                        })
-                        continue
-                except User.DoesNotExist:
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': f'Tutor with id {tutor_id} not found'
-                    })
-                    continue
-
-                try:
-                    student = User.objects.get(pk=student_id)
-                    parent = student.parent
-                    if not parent:
-                        results['failed'].append({
-                            'index': idx,
-                            'entry': entry,
-                            'error': f'Student {student_id} has no parent associated'
-                        })
-                        continue
-                except User.DoesNotExist:
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': f'Student with id {student_id} not found'
-                    })
-                    continue
-
-                # Parse and validate date/time
-                try:
-                    from datetime import datetime
-                    session_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                    start_time = datetime.strptime(start_time_str, "%H:%M").time()
-                    end_time = datetime.strptime(end_time_str, "%H:%M").time()
-                except ValueError as e:
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': f'Invalid date/time format: {str(e)}'
-                    })
-                    continue
-
-                # Validate total_time
-                try:
-                    total_time_decimal = Decimal(str(total_time))
-                    if total_time_decimal <= 0 or total_time_decimal > 8:
-                        results['failed'].append({
-                            'index': idx,
-                            'entry': entry,
-                            'error': 'Total time must be between 0 and 8 hours'
-                        })
-                        continue
-                except (ValueError, InvalidOperation):
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': 'Invalid total_time value'
-                    })
-                    continue
-
-                # Validate location
-                if location not in ['Online', 'In-Person']:
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': 'Location must be "Online" or "In-Person"'
-                    })
-                    continue
-
-                # Check for duplicate hours
-                existing_hours = Hours.objects.filter(
-                    tutor=tutor,
-                    student=student,
-                    date=session_date,
-                    startTime=start_time,
-                    endTime=end_time
-                )
-
-                if existing_hours.exists():
-                    results['failed'].append({
-                        'index': idx,
-                        'entry': entry,
-                        'error': 'Hours already logged for this tutor, student, date, and time slot'
-                    })
-                    continue
-
-                # Admin bypass: Set eligibility based on whether it's past or not
-                # Admin can add hours for any date, but we still mark them appropriately
-                now_local = now().astimezone(TZ)
-                current_date = now_local.date()
-                cur_ws = week_start(current_date)
-                cur_we = cur_ws + timedelta(days=6)
-
-                # If within current week, mark as Eligible, otherwise as Late
-                is_within_current_week = cur_ws <= session_date <= cur_we
-                eligible_status = "Eligible" if is_within_current_week else "Late"
-
-                # Create the hours entry
-                hours_obj = Hours.objects.create(
-                    tutor=tutor,
-                    student=student,
-                    parent=parent,
-                    date=session_date,
-                    startTime=start_time,
-                    endTime=end_time,
-                    totalTime=total_time_decimal,
-                    location=location,
-                    subject=subject,
-                    notes=notes,
-                    status='Accepted',  # Admin-added hours are auto-accepted
-                    eligible=eligible_status
-                )
-
-                results['successful'].append({
-                    'index': idx,
-                    'hour_id': hours_obj.id,
-                    'tutor': f"{tutor.firstName} {tutor.lastName}",
-                    'student': f"{student.firstName} {student.lastName}",
-                    'date': date_str,
-                    'total_time': str(total_time_decimal),
-                    'eligible': eligible_status
-                })
+        dry_run = str(request.data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('true', '1')
 
-            except Exception as e:
-                results['failed'].append({
-                    'index': idx,
-                    'entry': entry,
-                    'error': f'Unexpected error: {str(e)}'
-                })
-                logger.error(f"Error adding hours for entry {idx}: {e}")
+        # Admin bypass: hours within the current week are Eligible, anything else Late
+        results = import_hours(hours_entries, week_start(now().astimezone(TZ).date()), dry_run=dry_run)
 
+        verb = 'would be added' if dry_run else 'successful'
         return Response({
-            'detail': f'Batch processing complete. {len(results["successful"])} successful, {len(results["failed"])} failed',
+            'detail': f'Batch {"dry run" if dry_run else "processing"} complete. {len(results["successful"])} {verb}, {len(results["failed"])} failed',
             'results': results
         }, status=status.HTTP_200_OK if results['successful'] else status.HTTP_400_BAD_REQUEST)
 
 
 class AdminAllHoursView(APIView):
-    """Admin endpoint to view all hours with filtering options"""
+    """
+    Admin endpoint to page through all hours, newest first.
+
+    Filters: start/end (YYYY-MM-DD, either or both), eligible, invoice_status.
+    Ordered by date then created_at, newest first; ?limit= sets the page size
+    and ?cursor= (from next_cursor) fetches the next page. Stats cover the
+    whole date range, whatever the other filters.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -5450,46 +5360,53 @@ class AdminAllHoursView(APIView):
         if not request.user.is_superuser and request.user.roles != 'admin':
             return Response({'error': 'Admin access required'}, status=403)
 
-        # Get date range parameters (optional)
-        start_date_raw = request.query_params.get("start")
-        end_date_raw = request.query_params.get("end")
-
-        # Start with all hours
+        params = request.query_params
         hours_query = Hours.objects.all()
 
         # Apply date filter if provided
-        if start_date_raw and end_date_raw:
-            try:
-                start_date = make_aware(datetime.strptime(start_date_raw, "%Y-%m-%d"))
-                end_date = make_aware(datetime.strptime(end_date_raw, "%Y-%m-%d"))
-                start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-                end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                hours_query = hours_query.filter(date__range=(start_date, end_date))
-            except ValueError:
-                return Response({"error": "Invalid date format, expected YYYY-MM-DD"}, status=400)
+        for param, lookup in (("start", "date__gte"), ("end", "date__lte")):
+            if params.get(param):
+                try:
+                    value = parse_date(params[param])
+                except ValueError:
+                    value = None
+                if value is None:
+                    return Response({"error": "Invalid date format, expected YYYY-MM-DD"}, status=400)
+                hours_query = hours_query.filter(**{lookup: value})
+
+        # One pass over the range for every count (aliases can't reuse the
+        # field names the filters refer to)
+        counts = hours_query.aggregate(
+            n_total=Count('id'),
+            n_eligible=Count('id', filter=Q(eligible='Eligible')),
+            n_late=Count('id', filter=Q(eligible='Late')),
+            n_pending=Count('id', filter=Q(invoice_status='pending')),
+            n_invoiced=Count('id', filter=Q(invoice_status='invoiced')),
+        )
+        stats = {key.removeprefix('n_'): value for key, value in counts.items()}
 
-        # Order by most recent first
-        hours = hours_query.order_by('-date', '-created_at')
+        if params.get("eligible"):
+            hours_query = hours_query.filter(eligible=params["eligible"])
+        if params.get("invoice_status"):
+            hours_query = hours_query.filter(invoice_status=params["invoice_status"])
 
-        # Serialize the hours
-        serializer = HoursSerializer(hours, many=True, context={'request': request})
+        try:
+            limit = page_size(params, default=MAX_PAGE_SIZE)
+            page = keyset_queryset(hours_query, params.get("cursor"), field=("date", "created_at"))[:limit + 1]
+            hours_data = HoursSerializer.serialize_values(page, context={'request': request})
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-        # Calculate statistics
-        total_hours = hours.count()
-        eligible_hours = hours.filter(eligible='Eligible').count()
-        late_hours = hours.filter(eligible='Late').count()
-        pending_hours = hours.filter(invoice_status='pending').count()
-        invoiced_hours = hours.filter(invoice_status='invoiced').count()
+        next_cursor = None
+        if len(hours_data) > limit:
+            hours_data = hours_data[:limit]
+            last = hours_data[-1]
+            next_cursor = encode_cursor((last['date'], last['created_at']), last['id'])
 
         return Response({
-            'hours': serializer.data,
-            'stats': {
-                'total': total_hours,
-                'eligible': eligible_hours,
-                'late': late_hours,
-                'pending': pending_hours,
-                'invoiced': invoiced_hours
-            }
+            'hours': hours_data,
+            'next_cursor': next_cursor,
+            'stats': stats,
         })
 
 
@@ -6541,3 +6458,117 @@ class AdminEmailLogsView(APIView):
             'results': serializer.data,
         })
 
+
+
+class AdminEmailLogArchiveExportView(APIView):
+    """
+    Stream archived email logs (rows moved out of EmailLog by the retention job)
+    as NDJSON or CSV. Accepts the same filters as AdminEmailLogsView; pass
+    include_live=true to append matching rows still in the hot table.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_superuser and request.user.roles != 'admin':
+            return Response({'error': 'Admin access required'}, status=403)
+
+        from django.core.serializers.json import DjangoJSONEncoder
+        from playground.email_archive import ARCHIVE_FIELDS, iter_archived_email_logs
+        from playground.exports import stream_export
+
+        email_type = request.query_params.get('email_type') or None
+        status_filter = request.query_params.get('status') or None
+        search = request.query_params.get('search', '').strip()
+        export_format = request.query_params.get('export_format', 'ndjson').lower()
+        include_live = request.query_params.get('include_live', '').lower() == 'true'
+
+        if export_format not in ('ndjson', 'csv'):
+            return Response({'error': "export_format must be 'ndjson' or 'csv'"}, status=400)
+
+        try:
+            date_from = request.query_params.get('date_from')
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+            date_to = request.query_params.get('date_to')
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        except ValueError:
+            return Response({'error': 'Invalid date format, expected YYYY-MM-DD'}, status=400)
+
+        def rows():
+            yield from iter_archived_email_logs(
+                date_from=date_from, date_to=date_to,
+                email_type=email_type, status=status_filter, search=search,
+            )
+            if include_live:
+                qs = EmailLog.objects.order_by('sent_at', 'id')
+                if email_type:
+                    qs = qs.filter(email_type=email_type)
+                if status_filter:
+                    qs = qs.filter(status=status_filter)
+                if search:
+                    qs = qs.filter(
+                        Q(recipient_email__icontains=search) |
+                        Q(recipient_name__icontains=search) |
+                        Q(subject__icontains=search)
+                    )
+                if date_from:
+                    qs = qs.filter(sent_at__date__gte=date_from)
+                if date_to:
+                    qs = qs.filter(sent_at__date__lte=date_to)
+                encoder = DjangoJSONEncoder()
+                for row in qs.values(*ARCHIVE_FIELDS).iterator(chunk_size=2000):
+                    # Match the timestamp format stored in archive files
+                    row['sent_at'] = encoder.default(row['sent_at'])
+                    yield row
+
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(stream_export(rows(), ARCHIVE_FIELDS, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="email-logs.{export_format}"'
+        return response
+
+
+class AdminAccountingExportView(APIView):
+    """
+    Stream an accounting export (hours, monthly-hours, payouts or invoices) as
+    CSV or NDJSON. Filters: date_from/date_to (YYYY-MM-DD), user_id and role
+    (which of the user's roles to match, e.g. tutor).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset):
+        if not request.user.is_superuser and request.user.roles != 'admin':
+            return Response({'error': 'Admin access required'}, status=403)
+
+        from playground.exports import EXPORT_FORMATS, EXPORTS, export_rows, stream_export
+
+        if dataset not in EXPORTS:
+            return Response({'error': f"Unknown export '{dataset}', expected one of: {', '.join(EXPORTS)}"}, status=404)
+
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': "export_format must be 'csv' or 'ndjson'"}, status=400)
+
+        try:
+            date_from = request.query_params.get('date_from')
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+            date_to = request.query_params.get('date_to')
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+        except ValueError:
+            return Response({'error': 'Invalid date format, expected YYYY-MM-DD'}, status=400)
+
+        user_id = request.query_params.get('user_id')
+        if user_id is not None and not user_id.isdigit():
+            return Response({'error': 'user_id must be an integer'}, status=400)
+
+        try:
+            rows, columns = export_rows(
+                dataset, date_from=date_from, date_to=date_to,
+                user_id=int(user_id) if user_id else None,
+                role=request.query_params.get('role') or None,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(stream_export(rows, columns, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{export_format}"'
+        return response